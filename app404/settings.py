@@ -48,6 +48,8 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
+if "team5" in TEAM_APPS:
+    MIDDLEWARE.append("team5.middleware.provider_scope_middleware")
 
 ROOT_URLCONF = "app404.urls"
 
@@ -79,6 +81,24 @@ for t in TEAM_APPS:
     default_url = f"sqlite:///{BASE_DIR / t / (t + '.sqlite3')}"
     DATABASES[t] = env.db(key, default=default_url)
 
+# Hash-partitioned models: "app_label.modelname" -> {"key": shard key field, "aliases": [database aliases]}.
+TEAM_SHARDS = {}
+
+TEAM5_RATING_SHARDS = env.int("TEAM5_RATING_SHARDS", default=0)
+if TEAM5_RATING_SHARDS > 0:
+    for i in range(TEAM5_RATING_SHARDS):
+        alias = f"team5_ratings_{i}"
+        DATABASES[alias] = env.db(
+            f"{alias.upper()}_DATABASE_URL", default=f"sqlite:///{BASE_DIR / 'team5' / (alias + '.sqlite3')}"
+        )
+    TEAM_SHARDS["team5.team5mediarating"] = {
+        "key": "user_id",
+        "aliases": [f"team5_ratings_{i}" for i in range(TEAM5_RATING_SHARDS)],
+    }
+
+# Opt in to asking ipapi.co over HTTP when the offline IP database (TEAM5_IP_DATABASE_PATH) has no match.
+TEAM5_GEOIP_HTTP_FALLBACK = env.bool("TEAM5_GEOIP_HTTP_FALLBACK", default=False)
+
 DATABASE_ROUTERS = ["core.db_router.TeamPerAppRouter"]
 
 
@@ -1,17 +1,54 @@
+import zlib
+
 from django.conf import settings
 
+
+def shard_aliases(model) -> list[str]:
+    """Aliases a sharded model is hash-partitioned across; empty when it is not sharded."""
+    config = getattr(settings, "TEAM_SHARDS", {}).get(model._meta.label_lower)
+    return list(config["aliases"]) if config else []
+
+
+def shard_for_key(model, key) -> str | None:
+    """Alias holding the rows of `key` (the model's shard key value), or None when the model is not sharded."""
+    aliases = shard_aliases(model)
+    if not aliases:
+        return None
+    # crc32 rather than hash(): placement must agree across processes and restarts.
+    return aliases[zlib.crc32(str(key).encode("utf-8")) % len(aliases)]
+
+
 class TeamPerAppRouter:
     def db_for_read(self, model, **hints):
+        shard = self._shard_for_instance(model, hints)
+        if shard is not None:
+            return shard
         if model._meta.app_label in settings.TEAM_APPS:
             return model._meta.app_label
         return None
 
     def db_for_write(self, model, **hints):
+        shard = self._shard_for_instance(model, hints)
+        if shard is not None:
+            return shard
         if model._meta.app_label in settings.TEAM_APPS:
             return model._meta.app_label
         return None
 
     def allow_migrate(self, db, app_label, model_name=None, **hints):
+        sharded = {
+            label for label, config in getattr(settings, "TEAM_SHARDS", {}).items() if db in config["aliases"]
+        }
+        if sharded and db not in settings.TEAM_APPS:
+            return model_name is not None and f"{app_label}.{model_name}" in sharded
         if app_label in settings.TEAM_APPS:
             return db == app_label
         return db == "default"
+
+    def _shard_for_instance(self, model, hints):
+        """Route single-row saves and deletes by the instance's shard key; querysets choose their shard explicitly."""
+        instance = hints.get("instance")
+        config = getattr(settings, "TEAM_SHARDS", {}).get(model._meta.label_lower)
+        if not config or not isinstance(instance, model):
+            return None
+        return shard_for_key(model, getattr(instance, config["key"]))
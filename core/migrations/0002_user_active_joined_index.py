@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-19 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_active', '-date_joined', '-id'], name='core_user_active_joined_idx'),
+        ),
+    ]
@@ -48,5 +48,11 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of active users, newest first (team5 users listing).
+            models.Index(fields=["is_active", "-date_joined", "-id"], name="core_user_active_joined_idx"),
+        ]
+
     def __str__(self):
         return self.email
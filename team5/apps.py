@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class Team5Config(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'team5'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,78 @@
+"""Conditional GET and in-process response caching for version-stable Team5 endpoints."""
+
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import condition
+
+from .services import data_versions
+
+VERSION_TOKEN_ATTR = "_team5_version_token"
+
+
+class ResponseCache:
+    """Small thread-safe LRU of serialised response bodies."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[bytes, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> tuple[bytes, str] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: tuple, body: bytes, content_type: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (body, content_type)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache(getattr(settings, "TEAM5_RESPONSE_CACHE_SIZE", 512))
+
+
+def versioned_response(*version_names: str):
+    """
+    Tag a GET view with an ETag built from `version_names` and cache its body.
+
+    A matching If-None-Match gets 304 without running the view. Otherwise the
+    serialised body is served from `response_cache` while the versions are
+    unchanged, keyed by the full request path. Streaming responses are tagged
+    but never cached.
+    """
+
+    def etag(request, *args, **kwargs):
+        token = data_versions.get_version_token(*version_names)
+        setattr(request, VERSION_TOKEN_ATTR, token)
+        return f"t5-{token}"
+
+    def decorator(view):
+        @wraps(view)
+        def cached_view(request, *args, **kwargs):
+            key = (view.__name__, request.get_full_path(), getattr(request, VERSION_TOKEN_ATTR))
+            cached = response_cache.get(key)
+            if cached is not None:
+                body, content_type = cached
+                return HttpResponse(body, content_type=content_type)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                response_cache.set(key, response.content, response["Content-Type"])
+            return response
+
+        return condition(etag_func=etag)(cached_view)
+
+    return decorator
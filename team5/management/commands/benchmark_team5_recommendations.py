@@ -0,0 +1,125 @@
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from team5.services.benchmark import SCALES, build_operations, check_budget, pick_benchmark_inputs, run_benchmarks
+from team5.services.data_provider import DataProvider
+from team5.services.db_provider import DatabaseProvider
+from team5.services.mock_provider import MockProvider
+from team5.services.rating_shards import rating_aliases
+from team5.services.recommendation_service import RecommendationService
+from team5.services.synthetic_data import clear_dataset, generate_dataset
+
+DEFAULT_BUDGET_PATH = Path(__file__).resolve().parents[2] / "benchmark_budget.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark Team5 recommendation flows on generated datasets, write latency/query/memory "
+        "results as JSON and fail when a regression budget is exceeded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales",
+            default="tiny,small",
+            help=f"Comma-separated dataset scales ({', '.join(SCALES)}).",
+        )
+        parser.add_argument("--iterations", type=int, default=20, help="Timed calls per operation.")
+        parser.add_argument("--output", default="team5_benchmark.json", help="Path of the JSON results file.")
+        parser.add_argument(
+            "--budget",
+            default=str(DEFAULT_BUDGET_PATH),
+            help=(
+                "JSON file of {scale: {operation: {p50_ms|p95_ms|p99_ms|queries|peak_kib: limit}}}; "
+                "defaults to team5/benchmark_budget.json."
+            ),
+        )
+        parser.add_argument("--no-budget", action="store_true", help="Report results without enforcing a budget.")
+        parser.add_argument(
+            "--provider",
+            choices=("database", "mock"),
+            default="database",
+            help="Catalog source for the recommendation service; ratings always come from the database.",
+        )
+        parser.add_argument(
+            "--mock-data",
+            default=None,
+            help="Fixture directory for --provider mock (compile it with compile_team5_mock_data to skip JSON parsing).",
+        )
+        parser.add_argument(
+            "--use-existing",
+            action="store_true",
+            help="Benchmark the configured team5 database as-is instead of generated test databases.",
+        )
+
+    def handle(self, *args, **options):
+        budget = None
+        if not options["no_budget"]:
+            try:
+                budget = json.loads(Path(options["budget"]).read_text(encoding="utf-8"))
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Could not read budget file: {exc}") from exc
+
+        if options["use_existing"]:
+            results = {"existing": self._run_scale(options, dataset=None)}
+        else:
+            scales = [scale.strip() for scale in options["scales"].split(",") if scale.strip()]
+            unknown = [scale for scale in scales if scale not in SCALES]
+            if unknown:
+                raise CommandError(f"Unknown scales: {', '.join(unknown)}")
+            results = {}
+            old_config = setup_databases(
+                verbosity=0,
+                interactive=False,
+                # Shard aliases too, so generated ratings never touch the real shard databases.
+                aliases={"default", "team5", *rating_aliases()},
+                serialized_aliases=set(),
+            )
+            try:
+                for scale in scales:
+                    self.stdout.write(f"Generating {scale} dataset...")
+                    clear_dataset()
+                    dataset = generate_dataset(SCALES[scale])
+                    results[scale] = self._run_scale(options, dataset=dataset)
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+        report = {
+            "generatedAt": datetime.now(timezone.utc).isoformat(),
+            "iterations": options["iterations"],
+            "provider": options["provider"],
+            "scales": results,
+        }
+        Path(options["output"]).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if budget is not None:
+            violations = check_budget(
+                {scale: data["operations"] for scale, data in results.items()},
+                budget,
+            )
+            if violations:
+                for violation in violations:
+                    self.stdout.write(self.style.ERROR(violation))
+                raise CommandError(f"{len(violations)} benchmark budget violation(s).")
+            self.stdout.write(self.style.SUCCESS("All benchmarks within budget."))
+
+    def _run_scale(self, options: dict, *, dataset: dict | None) -> dict:
+        service = RecommendationService(self._provider(options))
+        user_ids, city_id = pick_benchmark_inputs()
+        operations = run_benchmarks(build_operations(service, user_ids, city_id), iterations=options["iterations"])
+        for name, metrics in operations.items():
+            self.stdout.write(
+                f"  {name}: p50 {metrics['p50_ms']}ms p95 {metrics['p95_ms']}ms "
+                f"queries {metrics['queries']} peak {metrics['peak_kib']}KiB"
+            )
+        return {"dataset": dataset, "operations": operations}
+
+    def _provider(self, options: dict) -> DataProvider:
+        if options["provider"] == "mock":
+            return MockProvider(Path(options["mock_data"]) if options["mock_data"] else None)
+        return DatabaseProvider()
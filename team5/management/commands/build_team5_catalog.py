@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from team5.services.db_provider import DatabaseProvider
+from team5.services.shared_catalog_provider import SharedCatalogProvider, default_catalog_path
+
+
+class Command(BaseCommand):
+    help = "Write the memory-mapped Team5 catalog file that workers share."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            type=Path,
+            default=None,
+            help="Catalog file path. Defaults to TEAM5_CATALOG_PATH.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["output"] or default_catalog_path()
+        generation = SharedCatalogProvider(DatabaseProvider(), path).rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Catalog generation {generation} written to {path} ({path.stat().st_size} bytes)")
+        )
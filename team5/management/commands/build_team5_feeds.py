@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from team5.models import Team5MediaRating
+from team5.services.rating_events import get_feed_service
+from team5.services.rating_shards import scatter
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized personalized feeds for Team5 users."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user-id",
+            action="append",
+            dest="user_ids",
+            help="Rebuild only this user's feed (repeatable). Defaults to every user with ratings.",
+        )
+        parser.add_argument(
+            "--stale-only",
+            action="store_true",
+            help="Skip users whose stored feed is still fresh.",
+        )
+
+    def handle(self, *args, **options):
+        feed_service = get_feed_service()
+        version = feed_service.current_version()
+        user_ids = options["user_ids"] or sorted(
+            set().union(
+                *scatter(
+                    lambda alias: set(Team5MediaRating.objects.using(alias).values_list("user_id", flat=True))
+                )
+            )
+        )
+
+        rebuilt = 0
+        skipped = 0
+        for user_id in user_ids:
+            if options["stale_only"] and feed_service.get_fresh_feed(str(user_id)) is not None:
+                skipped += 1
+                continue
+            if feed_service.rebuild(str(user_id), version=version) is not None:
+                rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Feeds rebuilt: {rebuilt}"))
+        if skipped:
+            self.stdout.write(f"Fresh feeds skipped: {skipped}")
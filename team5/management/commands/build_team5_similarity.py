@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from team5.models import Team5MediaNeighbor
+from team5.services import data_versions
+from team5.services.contracts import SIMILAR_TOP_N
+from team5.services.rating_shards import iter_all_ratings
+from team5.services.similarity_service import ADJUSTED_COSINE, COSINE, compute_item_neighbors
+
+
+class Command(BaseCommand):
+    help = "Compute item-item similarity from Team5 ratings and store the top-N neighbours per media."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-n",
+            type=int,
+            default=SIMILAR_TOP_N,
+            help="Number of neighbours kept per media.",
+        )
+        parser.add_argument(
+            "--method",
+            choices=[ADJUSTED_COSINE, COSINE],
+            default=ADJUSTED_COSINE,
+            help="Similarity measure over the user x media rating matrix.",
+        )
+        parser.add_argument(
+            "--min-score",
+            type=float,
+            default=0.0,
+            help="Drop neighbours whose similarity is not above this value.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows per read chunk and per bulk insert.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        ratings = iter_all_ratings("user_id", "media_id", "rate", chunk_size=batch_size)
+        neighbors = compute_item_neighbors(
+            ratings,
+            top_n=options["top_n"],
+            method=options["method"],
+            min_score=options["min_score"],
+        )
+
+        rows = [
+            Team5MediaNeighbor(media_id=media_id, neighbor_media_id=neighbor_id, score=score, rank=rank)
+            for media_id, entries in neighbors.items()
+            for rank, (neighbor_id, score) in enumerate(entries)
+        ]
+        with transaction.atomic(using="team5"):
+            Team5MediaNeighbor.objects.all().delete()
+            Team5MediaNeighbor.objects.bulk_create(rows, batch_size=batch_size)
+            data_versions.bump_version(data_versions.MODELS)
+
+        self.stdout.write(self.style.SUCCESS(f"Media with neighbours: {len(neighbors)}"))
+        self.stdout.write(self.style.SUCCESS(f"Neighbour rows stored: {len(rows)}"))
@@ -0,0 +1,22 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from team5.services.mock_provider import compile_mock_catalog, default_mock_data_dir
+
+
+class Command(BaseCommand):
+    help = "Compile Team5 mock JSON fixtures into a memory-mappable sidecar for fast loading."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            type=Path,
+            default=None,
+            help="Fixture directory. Defaults to team5/mock_data.",
+        )
+
+    def handle(self, *args, **options):
+        path = compile_mock_catalog(options["path"] or default_mock_data_dir())
+        self.stdout.write(self.style.SUCCESS(f"Compiled mock catalog written to {path} ({path.stat().st_size} bytes)"))
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from team5.services.synthetic_data import DatasetSpec, clear_dataset, dataset_exists, generate_dataset
+
+
+class Command(BaseCommand):
+    help = "Generate a reproducible, skewed synthetic Team5 catalog and rating set for benchmarking."
+
+    def add_arguments(self, parser):
+        defaults = DatasetSpec()
+        parser.add_argument("--cities", type=int, default=defaults.cities)
+        parser.add_argument("--places", type=int, default=defaults.places)
+        parser.add_argument("--media", type=int, default=defaults.media)
+        parser.add_argument("--users", type=int, default=defaults.users)
+        parser.add_argument("--ratings", type=int, default=defaults.ratings)
+        parser.add_argument(
+            "--zipf-exponent",
+            type=float,
+            default=defaults.zipf_exponent,
+            help="Skew of city/place/media popularity and user activity.",
+        )
+        parser.add_argument("--seed", type=int, default=defaults.seed, help="Random seed; same seed, same data.")
+        parser.add_argument("--chunk-size", type=int, default=10_000, help="Rows per bulk insert.")
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete previously generated rows before generating.",
+        )
+
+    def handle(self, *args, **options):
+        spec = DatasetSpec(
+            cities=options["cities"],
+            places=options["places"],
+            media=options["media"],
+            users=options["users"],
+            ratings=options["ratings"],
+            zipf_exponent=options["zipf_exponent"],
+            seed=options["seed"],
+        )
+        if min(spec.cities, spec.places, spec.media, spec.users) < 1 or spec.ratings < 0:
+            raise CommandError("cities, places, media and users must be positive; ratings must not be negative.")
+
+        if options["clear"]:
+            clear_dataset()
+            self.stdout.write(self.style.WARNING("Deleted previously generated benchmark rows."))
+        elif dataset_exists():
+            raise CommandError("Generated benchmark rows already exist; pass --clear to replace them.")
+
+        started = time.perf_counter()
+        last_report = {}
+
+        def progress(stage, done, total):
+            percent = int(done * 100 / total) if total else 100
+            if percent // 10 != last_report.get(stage) or done == total:
+                last_report[stage] = percent // 10
+                self.stdout.write(f"{stage}: {done}/{total} ({percent}%)")
+
+        counts = generate_dataset(spec, chunk_size=options["chunk_size"], progress=progress)
+        elapsed = time.perf_counter() - started
+        for name, count in counts.items():
+            self.stdout.write(self.style.SUCCESS(f"{name}: {count}"))
+        self.stdout.write(f"Generated in {elapsed:.1f}s")
@@ -0,0 +1,61 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from team5.services.rating_ingestion import DEFAULT_BATCH_SIZE, upsert_ratings
+
+
+class Command(BaseCommand):
+    help = "Stream NDJSON ratings ({userId, mediaId, rate, userEmail?} per line) into Team5 with batched upserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file path, or - to read from stdin.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Ratings upserted per transaction.",
+        )
+        parser.add_argument(
+            "--refresh-feeds",
+            action="store_true",
+            help=(
+                "Rebuild affected users' materialized feeds after each batch. By default they are only "
+                "dropped; run build_team5_feeds --stale-only afterwards."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+        except OSError as exc:
+            raise CommandError(f"Could not open {path}: {exc}") from exc
+
+        def on_batch(progress):
+            self.stdout.write(f"Batch {progress.batches}: {progress.upserted}/{progress.received} upserted")
+
+        try:
+            result = upsert_ratings(
+                (_parse_line(line) for line in stream if line.strip()),
+                batch_size=options["batch_size"],
+                refresh_feeds=options["refresh_feeds"],
+                on_batch=on_batch,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in result.errors[:20]:
+            self.stdout.write(self.style.WARNING(f"Row {error['index']}: {error['detail']}"))
+        self.stdout.write(self.style.SUCCESS(f"Ratings upserted: {result.upserted}"))
+        if result.errors:
+            self.stdout.write(self.style.WARNING(f"Rows skipped: {len(result.errors)}"))
+
+
+def _parse_line(line: str):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from team5.services.interest_service import rebuild_user_interests
+
+
+class Command(BaseCommand):
+    help = "Recount Team5 per-user city and place interest counters from stored ratings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user-id",
+            action="append",
+            dest="user_ids",
+            help="Rebuild only this user's counters (repeatable). Defaults to every user.",
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild_user_interests(options["user_ids"])
+        self.stdout.write(self.style.SUCCESS(f"Interest counters written: {rows}"))
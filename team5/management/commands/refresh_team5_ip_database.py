@@ -0,0 +1,51 @@
+from pathlib import Path
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from team5.services.geo_cache import get_geo_cache
+from team5.services.ip_database import default_database_path, parse_csv_text
+
+
+class Command(BaseCommand):
+    help = "Load an IP-range CSV (file path or URL), validate it and install it as the Team5 geolocation database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "source",
+            help=(
+                "CSV file path or http(s) URL with start_ip,end_ip (or network) and "
+                "city,country,latitude,longitude columns."
+            ),
+        )
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="Target CSV path (defaults to TEAM5_IP_DATABASE_PATH).",
+        )
+        parser.add_argument("--timeout", type=float, default=30.0, help="Download timeout in seconds.")
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        try:
+            if source.startswith(("http://", "https://")):
+                with urlopen(source, timeout=options["timeout"]) as response:
+                    text = response.read().decode("utf-8")
+            else:
+                text = Path(source).read_text(encoding="utf-8")
+        except (OSError, URLError, UnicodeDecodeError) as exc:
+            raise CommandError(f"Could not read {source}: {exc}") from exc
+
+        try:
+            database = parse_csv_text(text)
+        except (KeyError, ValueError) as exc:
+            raise CommandError(f"Invalid IP database: {exc}") from exc
+        if not len(database):
+            raise CommandError("IP database source contains no ranges.")
+
+        output = Path(options["output"]) if options["output"] else default_database_path()
+        database.write_csv(output)
+        get_geo_cache().clear()
+        self.stdout.write(self.style.SUCCESS(f"IP ranges installed: {len(database)}"))
+        self.stdout.write(f"Database written to {output}")
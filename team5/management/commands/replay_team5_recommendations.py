@@ -0,0 +1,121 @@
+import json
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router
+
+from team5.services.db_provider import DatabaseProvider
+from team5.services.embedding_store import EmbeddingStore
+from team5.services.recommendation_service import RecommendationService
+from team5.models import Team5MediaRating
+from team5.services.replay_evaluation import STRATEGIES, replay, sqlite_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay Team5 ratings in time order, hold out the newest ones and report precision/recall@k, "
+        "latency and throughput per recommendation strategy. Runs on a snapshot or a copy of the "
+        "database, and all changes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--k", type=int, default=10, help="Cut-off rank for precision and recall.")
+        parser.add_argument(
+            "--holdout-fraction",
+            type=float,
+            default=0.2,
+            help="Newest share of ratings held out when --cutoff is not given.",
+        )
+        parser.add_argument(
+            "--cutoff",
+            default=None,
+            help="ISO timestamp; ratings created at or after it are held out.",
+        )
+        parser.add_argument(
+            "--strategies",
+            default=",".join(STRATEGIES),
+            help=f"Comma-separated strategies ({', '.join(STRATEGIES)}).",
+        )
+        parser.add_argument("--max-users", type=int, default=None, help="Evaluate at most this many holdout users.")
+        parser.add_argument(
+            "--keep-neighbors",
+            action="store_true",
+            help="Use the stored neighbour lists instead of recomputing them from pre-cutoff ratings.",
+        )
+        parser.add_argument(
+            "--embeddings-dir",
+            default=None,
+            help="Score personalized results with these embeddings; train them on pre-cutoff ratings only.",
+        )
+        parser.add_argument("--output", default=None, help="Also write the report as JSON to this path.")
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument(
+            "--snapshot",
+            action="store_true",
+            help="Copy the SQLite team5 database to a temporary file and replay against the copy.",
+        )
+        target.add_argument(
+            "--on-copy",
+            action="store_true",
+            help=(
+                "Replay against the configured team5 database, which must be a copy (e.g. TEAM5_DATABASE_URL "
+                "pointing at a restored backup): it is write-locked for the whole run."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["k"] < 1:
+            raise CommandError("--k must be at least 1.")
+        if not 0.0 < options["holdout_fraction"] < 1.0:
+            raise CommandError("--holdout-fraction must be between 0 and 1.")
+        cutoff = None
+        if options["cutoff"]:
+            try:
+                cutoff = datetime.fromisoformat(options["cutoff"])
+            except ValueError as exc:
+                raise CommandError(f"Invalid --cutoff: {exc}") from exc
+            if cutoff.tzinfo is None:
+                cutoff = cutoff.replace(tzinfo=timezone.utc)
+        strategies = tuple(name.strip() for name in options["strategies"].split(",") if name.strip())
+        unknown = [name for name in strategies if name not in STRATEGIES]
+        if unknown:
+            raise CommandError(f"Unknown strategies: {', '.join(unknown)}")
+
+        embeddings_dir = options["embeddings_dir"]
+
+        def service_factory():
+            store = EmbeddingStore(Path(embeddings_dir)) if embeddings_dir else None
+            return RecommendationService(DatabaseProvider(), embedding_store=store)
+
+        try:
+            snapshot = sqlite_snapshot(router.db_for_write(Team5MediaRating)) if options["snapshot"] else nullcontext()
+            with snapshot:
+                report = replay(
+                    service_factory,
+                    k=options["k"],
+                    holdout_fraction=options["holdout_fraction"],
+                    cutoff=cutoff,
+                    strategies=strategies,
+                    max_users=options["max_users"],
+                    rebuild_neighbors=not options["keep_neighbors"],
+                    on_copy=True,
+                )
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        self.stdout.write(
+            f"Cutoff {report['cutoff']}: {report['trainingRatings']} training, "
+            f"{report['holdoutRatings']} held-out ratings"
+        )
+        for name, metrics in report["strategies"].items():
+            self.stdout.write(
+                f"  {name}: precision@{report['k']} {metrics['precision_at_k']} "
+                f"recall@{report['k']} {metrics['recall_at_k']} users {metrics['users']} "
+                f"p50 {metrics['p50_ms']}ms p95 {metrics['p95_ms']}ms "
+                f"{metrics['throughput_per_s']} calls/s"
+            )
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2), encoding="utf-8")
+            self.stdout.write(f"Results written to {options['output']}")
@@ -3,9 +3,13 @@ from dataclasses import dataclass
 
 from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand
+from django.db import router, transaction
 
 from team5.models import Team5City, Team5Media, Team5MediaRating, Team5Place
+from team5.services import data_versions
 from team5.services.mock_provider import MockProvider
+from team5.services.rating_ingestion import upsert_ratings
+from team5.services.rating_shards import rating_aliases
 
 
 User = get_user_model()
@@ -75,14 +79,18 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING("Deleted existing Team5 catalog records."))
 
         if options["clear_ratings"]:
-            deleted_count, _ = Team5MediaRating.objects.all().delete()
+            deleted_count = sum(
+                Team5MediaRating.objects.using(alias).all().delete()[0] for alias in rating_aliases()
+            )
             self.stdout.write(self.style.WARNING(f"Deleted existing ratings: {deleted_count}"))
 
-        self._seed_catalog(provider)
+        # One catalog version bump for the whole seed instead of one per saved row.
+        with data_versions.deferred_bumps(), transaction.atomic(using=router.db_for_write(Team5Media)):
+            self._seed_catalog(provider)
         media_ids = list(Team5Media.objects.values_list("media_id", flat=True))
 
         created_users = 0
-        total_ratings = 0
+        ratings = []
 
         for profile in DEMO_USERS:
             user, created = User.objects.get_or_create(
@@ -105,16 +113,11 @@ class Command(BaseCommand):
 
             for media_id in selected_media_ids:
                 rate = random.choice([2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0])
-                Team5MediaRating.objects.update_or_create(
-                    user_id=user.id,
-                    media_id=media_id,
-                    defaults={
-                        "user_email": user.email,
-                        "rate": rate,
-                        "liked": rate >= 4.0,
-                    },
+                ratings.append(
+                    {"userId": str(user.id), "userEmail": user.email, "mediaId": media_id, "rate": rate}
                 )
-                total_ratings += 1
+
+        total_ratings = upsert_ratings(ratings).upserted
 
         self.stdout.write(self.style.SUCCESS(f"Users created: {created_users}"))
         self.stdout.write(self.style.SUCCESS(f"Ratings upserted: {total_ratings}"))
@@ -0,0 +1,55 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from team5.services import data_versions
+from team5.services.embedding_store import default_embeddings_dir, write_embeddings
+from team5.services.factorization import train_implicit_als
+from team5.services.rating_shards import iter_all_ratings
+
+
+class Command(BaseCommand):
+    help = "Train implicit ALS embeddings on Team5 ratings and write memory-mappable factor files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--factors", type=int, default=32, help="Embedding dimension.")
+        parser.add_argument("--iterations", type=int, default=10, help="ALS sweeps over users and media.")
+        parser.add_argument("--regularization", type=float, default=0.05, help="L2 penalty on factors.")
+        parser.add_argument("--alpha", type=float, default=10.0, help="Confidence scale per rate step.")
+        parser.add_argument(
+            "--positive-rate",
+            type=float,
+            default=3.0,
+            help="Rates at or above this value count as positive feedback.",
+        )
+        parser.add_argument("--seed", type=int, default=1404, help="Random seed for factor initialisation.")
+        parser.add_argument(
+            "--output-dir",
+            default=None,
+            help="Directory for the factor files (defaults to TEAM5_EMBEDDINGS_DIR).",
+        )
+
+    def handle(self, *args, **options):
+        ratings = iter_all_ratings("user_id", "media_id", "rate")
+        user_ids, media_ids, user_factors, item_factors = train_implicit_als(
+            ratings,
+            factors=options["factors"],
+            iterations=options["iterations"],
+            regularization=options["regularization"],
+            alpha=options["alpha"],
+            positive_rate=options["positive_rate"],
+            seed=options["seed"],
+        )
+
+        output_dir = Path(options["output_dir"]) if options["output_dir"] else default_embeddings_dir()
+        write_embeddings(
+            output_dir,
+            user_ids=user_ids,
+            media_ids=media_ids,
+            user_factors=user_factors,
+            item_factors=item_factors,
+        )
+        data_versions.bump_version(data_versions.MODELS)
+        self.stdout.write(self.style.SUCCESS(f"Users embedded: {len(user_ids)}"))
+        self.stdout.write(self.style.SUCCESS(f"Media embedded: {len(media_ids)}"))
+        self.stdout.write(f"Embeddings written to {output_dir}")
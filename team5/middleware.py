@@ -0,0 +1,48 @@
+"""Middleware that gives each request its own Team5 provider scope."""
+
+import logging
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from .services.provider_scope import provider_scope
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_CALLS_HEADER = "X-Team5-Provider-Calls"
+
+
+@sync_and_async_middleware
+def provider_scope_middleware(get_response):
+    """
+    Memoize scoped provider reads for the lifetime of one request.
+
+    With TEAM5_PROVIDER_CALLS_HEADER (default: DEBUG) the response carries the
+    scope's loads/calls per provider method; they are always logged at debug.
+    Streaming bodies are produced after the scope closes and read uncached.
+    """
+
+    def finish(request, response, scope):
+        if scope.calls:
+            summary = scope.summary()
+            logger.debug("team5 provider calls for %s: %s", request.path, summary)
+            if getattr(settings, "TEAM5_PROVIDER_CALLS_HEADER", settings.DEBUG):
+                response[PROVIDER_CALLS_HEADER] = summary
+        return response
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            with provider_scope() as scope:
+                response = await get_response(request)
+            return finish(request, response, scope)
+
+    else:
+
+        def middleware(request):
+            with provider_scope() as scope:
+                response = get_response(request)
+            return finish(request, response, scope)
+
+    return middleware
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("team5", "0002_catalog_models"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Team5MediaNeighbor",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("media_id", models.CharField(max_length=128)),
+                ("neighbor_media_id", models.CharField(max_length=128)),
+                ("score", models.FloatField()),
+                ("rank", models.PositiveSmallIntegerField()),
+            ],
+            options={
+                "indexes": [models.Index(fields=["media_id", "rank"], name="team5_team5_media_i_f4d4b9_idx")],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="team5medianeighbor",
+            constraint=models.UniqueConstraint(
+                fields=("media_id", "neighbor_media_id"), name="team5_unique_media_neighbor"
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("team5", "0003_media_neighbors"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Team5DataVersion",
+            fields=[
+                ("name", models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ("version", models.PositiveBigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Team5UserFeed",
+            fields=[
+                ("user_id", models.UUIDField(primary_key=True, serialize=False)),
+                ("items", models.JSONField(default=list)),
+                ("version", models.CharField(max_length=64)),
+                ("built_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
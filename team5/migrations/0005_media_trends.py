@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("team5", "0004_data_versions_user_feeds"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Team5MediaTrend",
+            fields=[
+                ("media_id", models.CharField(max_length=128, primary_key=True, serialize=False)),
+                ("log_score", models.FloatField()),
+                ("events", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["-log_score"], name="team5_trend_log_score_idx")],
+            },
+        ),
+    ]
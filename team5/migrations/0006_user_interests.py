@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("team5", "0005_media_trends"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Team5UserInterest",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("user_id", models.UUIDField()),
+                ("kind", models.CharField(max_length=8)),
+                ("target_id", models.CharField(max_length=128)),
+                ("count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user_id", "kind", "target_id"), name="team5_unique_user_interest"
+                    )
+                ],
+                "indexes": [
+                    models.Index(fields=["user_id", "kind", "-count"], name="team5_user_interest_top_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,14 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("team5", "0006_user_interests"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="team5mediarating",
+            index=models.Index(fields=["updated_at", "id"], name="team5_rating_updated_idx"),
+        ),
+    ]
@@ -0,0 +1,67 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+from core.db_router import shard_aliases
+
+# PERSONALIZED_MIN_USER_RATE and RATINGS_QUERY_CHUNK when the counters were introduced.
+INTEREST_MIN_RATE = 4.0
+USER_CHUNK = 500
+
+
+def backfill_user_interests(apps, schema_editor):
+    """Count existing liked ratings so interest reads are complete right after deploy, USER_CHUNK users at a time."""
+    alias = schema_editor.connection.alias
+    rating_model = apps.get_model("team5", "Team5MediaRating")
+    if shard_aliases(rating_model):
+        # Ratings live on the shard databases; run rebuild_team5_interests once they are migrated.
+        return
+    media_model = apps.get_model("team5", "Team5Media")
+    interest_model = apps.get_model("team5", "Team5UserInterest")
+
+    locations = {
+        media_id: (place_id, city_id)
+        for media_id, place_id, city_id in media_model.objects.using(alias).values_list(
+            "media_id", "place_id", "place__city_id"
+        )
+    }
+    liked = rating_model.objects.using(alias).filter(rate__gte=INTEREST_MIN_RATE)
+    interest_model.objects.using(alias).all().delete()
+    last = None
+    while True:
+        page = liked.order_by("user_id") if last is None else liked.filter(user_id__gt=last).order_by("user_id")
+        chunk = list(page.values_list("user_id", flat=True).distinct()[:USER_CHUNK])
+        if not chunk:
+            return
+        last = chunk[-1]
+
+        counts = defaultdict(int)
+        for user_id, media_id in liked.filter(user_id__in=chunk).values_list("user_id", "media_id").iterator(
+            chunk_size=2000
+        ):
+            location = locations.get(media_id)
+            if location is None:
+                continue
+            counts[(user_id, "place", location[0])] += 1
+            counts[(user_id, "city", location[1])] += 1
+        interest_model.objects.using(alias).bulk_create(
+            (
+                interest_model(user_id=user_id, kind=kind, target_id=target_id, count=count)
+                for (user_id, kind, target_id), count in counts.items()
+            ),
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("team5", "0007_rating_updated_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_user_interests,
+            migrations.RunPython.noop,
+            hints={"model_name": "team5userinterest"},
+        ),
+    ]
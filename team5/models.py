@@ -57,6 +57,7 @@ class Team5MediaRating(models.Model):
         indexes = [
             models.Index(fields=["user_id", "liked"]),
             models.Index(fields=["media_id"]),
+            models.Index(fields=["updated_at", "id"], name="team5_rating_updated_idx"),
         ]
 
     def save(self, *args, **kwargs):
@@ -65,3 +66,70 @@ class Team5MediaRating(models.Model):
 
     def __str__(self):
         return f"{self.user_email or self.user_id} -> {self.media_id}: {self.rate}"
+
+
+class Team5MediaNeighbor(models.Model):
+    media_id = models.CharField(max_length=128)
+    neighbor_media_id = models.CharField(max_length=128)
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["media_id", "neighbor_media_id"], name="team5_unique_media_neighbor")
+        ]
+        indexes = [models.Index(fields=["media_id", "rank"])]
+
+    def __str__(self):
+        return f"{self.media_id} ~ {self.neighbor_media_id}: {self.score:.3f}"
+
+
+class Team5DataVersion(models.Model):
+    name = models.CharField(max_length=32, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}@{self.version}"
+
+
+class Team5UserFeed(models.Model):
+    user_id = models.UUIDField(primary_key=True)
+    items = models.JSONField(default=list)
+    version = models.CharField(max_length=64)
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"feed {self.user_id} ({self.version})"
+
+
+class Team5MediaTrend(models.Model):
+    media_id = models.CharField(max_length=128, primary_key=True)
+    log_score = models.FloatField()
+    events = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["-log_score"], name="team5_trend_log_score_idx")]
+
+    def __str__(self):
+        return f"trend {self.media_id}: {self.log_score:.3f}"
+
+
+class Team5UserInterest(models.Model):
+    KIND_CITY = "city"
+    KIND_PLACE = "place"
+
+    user_id = models.UUIDField()
+    kind = models.CharField(max_length=8)
+    target_id = models.CharField(max_length=128)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user_id", "kind", "target_id"], name="team5_unique_user_interest")
+        ]
+        indexes = [models.Index(fields=["user_id", "kind", "-count"], name="team5_user_interest_top_idx")]
+
+    def __str__(self):
+        return f"{self.user_id} {self.kind}:{self.target_id} x{self.count}"
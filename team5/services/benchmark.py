@@ -0,0 +1,167 @@
+"""Latency, query-count and memory benchmarks for Team5 recommendation flows."""
+
+import math
+import threading
+import time
+import tracemalloc
+from typing import Callable
+
+from django.db import connections, router
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+
+from team5.models import Team5Media, Team5MediaRating, Team5Place
+
+from .rating_shards import rating_aliases, scatter
+from .recommendation_service import RecommendationService
+from .synthetic_data import DatasetSpec
+
+SCALES = {
+    "tiny": DatasetSpec(cities=5, places=50, media=500, users=200, ratings=5_000),
+    "small": DatasetSpec(cities=50, places=1_000, media=10_000, users=2_000, ratings=100_000),
+    "medium": DatasetSpec(cities=200, places=10_000, media=100_000, users=20_000, ratings=1_000_000),
+    "large": DatasetSpec(cities=1_000, places=100_000, media=1_000_000, users=200_000, ratings=10_000_000),
+}
+BUDGET_METRICS = ("p50_ms", "p95_ms", "p99_ms", "queries", "peak_kib")
+
+
+def pick_benchmark_inputs(sample_users: int = 20) -> tuple[list[str], str | None]:
+    """Return the most active user ids and the city with the most places."""
+    per_shard = scatter(
+        lambda alias: list(
+            Team5MediaRating.objects.using(alias)
+            .values_list("user_id")
+            .annotate(total=Count("id"))
+            .order_by("-total")[:sample_users]
+        )
+    )
+    ranked = sorted((row for rows in per_shard for row in rows), key=lambda row: -row[1])
+    user_ids = [str(user_id) for user_id, _ in ranked[:sample_users]]
+    city = Team5Place.objects.values("city_id").annotate(total=Count("place_id")).order_by("-total").first()
+    return user_ids, city["city_id"] if city else None
+
+
+def build_operations(
+    service: RecommendationService,
+    user_ids: list[str],
+    city_id: str | None,
+) -> dict[str, Callable[[int], object]]:
+    """Map operation names to callables taking the iteration number."""
+    users = user_ids or [""]
+
+    def user(iteration: int) -> str:
+        return users[iteration % len(users)]
+
+    return {
+        "get_popular": lambda i: service.get_popular(),
+        "get_nearest_by_city": lambda i: service.get_nearest_by_city(city_id or ""),
+        "get_personalized": lambda i: service.get_personalized(user(i)),
+        "get_user_interest_distribution": lambda i: service.get_user_interest_distribution(user(i)),
+        "get_media_feed": lambda i: service.get_media_feed(user(i)),
+    }
+
+
+def run_benchmarks(operations: dict[str, Callable[[int], object]], *, iterations: int = 20) -> dict[str, dict]:
+    """
+    Time each operation `iterations` times after one warm-up call.
+
+    Latency and query counts come from the timed calls; queries are counted on
+    the catalog alias and every rating shard. Peak memory is measured in one
+    extra traced call so tracemalloc overhead does not skew latency.
+    """
+    aliases = list(dict.fromkeys([router.db_for_read(Team5Media), *rating_aliases()]))
+    results = {}
+    for name, operation in operations.items():
+        operation(0)
+        latencies = []
+        with QueryCounter(aliases) as counter:
+            for iteration in range(iterations):
+                started = time.perf_counter()
+                operation(iteration)
+                latencies.append((time.perf_counter() - started) * 1000.0)
+        queries = counter.count
+
+        tracemalloc.start()
+        try:
+            operation(0)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        results[name] = {
+            "iterations": iterations,
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "queries": round(queries / iterations, 2),
+            "peak_kib": round(peak / 1024.0, 1),
+        }
+    return results
+
+
+def check_budget(results: dict[str, dict], budget: dict[str, dict]) -> list[str]:
+    """
+    Compare {scale: {operation: metrics}} results with a budget of the same shape.
+
+    Returns one message per metric above its budget; missing scales or operations
+    in the results are ignored.
+    """
+    violations = []
+    for scale, operations in budget.items():
+        for name, limits in operations.items():
+            measured = results.get(scale, {}).get(name)
+            if measured is None:
+                continue
+            for metric, limit in limits.items():
+                if metric in BUDGET_METRICS and measured.get(metric, 0) > limit:
+                    violations.append(f"{scale}/{name}: {metric} {measured[metric]} > budget {limit}")
+    return violations
+
+
+class QueryCounter:
+    """
+    Count queries run on `aliases` while the block is active, from any thread.
+
+    Shard reads fan out to worker threads with their own connections, so the
+    counter also attaches to connections opened while it is active.
+    """
+
+    def __init__(self, aliases: list[str]):
+        self.aliases = set(aliases)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "QueryCounter":
+        for alias in self.aliases:
+            self._attach(connections[alias])
+        connection_created.connect(self._on_connection_created)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        connection_created.disconnect(self._on_connection_created)
+        for alias in self.aliases:
+            if self in connections[alias].execute_wrappers:
+                connections[alias].execute_wrappers.remove(self)
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def _on_connection_created(self, sender, connection, **kwargs) -> None:
+        if connection.alias in self.aliases:
+            self._attach(connection)
+
+    def _attach(self, connection) -> None:
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
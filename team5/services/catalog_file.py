@@ -0,0 +1,243 @@
+"""Compact columnar catalog file that worker processes memory-map read-only."""
+
+import json
+import mmap
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .contracts import CityRecord, MediaRecord, PlaceRecord
+from .media_columns import MediaColumns
+
+MAGIC = b"T5CAT001"
+_PREFIX_SIZE = len(MAGIC) + 8
+_ALIGN = 8
+
+
+def write_catalog_file(
+    path: Path,
+    *,
+    cities: list[CityRecord],
+    places: list[PlaceRecord],
+    media: list[MediaRecord],
+    versions: dict[str, int],
+    sources: dict[str, list[int]] | None = None,
+) -> int:
+    """
+    Serialise the catalog column by column and atomically replace `path`.
+
+    Strings are stored as one UTF-8 blob plus int64 offsets per column, and
+    place/city references as int32 row numbers. Each media's `userRatings` are
+    flattened into user and rate columns with int64 row offsets. Records keep
+    the order they are given in. `sources` records stamps of the files the catalog was built
+    from. Returns the new generation, one above the replaced file's.
+    """
+    city_rows = {city["cityId"]: row for row, city in enumerate(cities)}
+    place_rows = {place["placeId"]: row for row, place in enumerate(places)}
+    columns: dict[str, np.ndarray] = {}
+    _add_strings(columns, "cities.id", [city["cityId"] for city in cities])
+    _add_strings(columns, "cities.name", [city["cityName"] for city in cities])
+    columns["cities.coordinates"] = np.array([city["coordinates"] for city in cities], dtype=np.float64).reshape(-1)
+    _add_strings(columns, "places.id", [place["placeId"] for place in places])
+    _add_strings(columns, "places.name", [place["placeName"] for place in places])
+    columns["places.city"] = np.array([city_rows.get(place["cityId"], -1) for place in places], dtype=np.int32)
+    columns["places.coordinates"] = np.array([place["coordinates"] for place in places], dtype=np.float64).reshape(-1)
+    _add_strings(columns, "media.id", [item["mediaId"] for item in media])
+    _add_strings(columns, "media.title", [item["title"] for item in media])
+    _add_strings(columns, "media.caption", [item["caption"] for item in media])
+    columns["media.place"] = np.array([place_rows.get(item["placeId"], -1) for item in media], dtype=np.int32)
+    columns["media.overall_rate"] = np.array([item["overallRate"] for item in media], dtype=np.float64)
+    columns["media.ratings_count"] = np.array([item["ratingsCount"] for item in media], dtype=np.int64)
+    user_ratings = [item.get("userRatings") or [] for item in media]
+    rating_offsets = np.zeros(len(user_ratings) + 1, dtype=np.int64)
+    np.cumsum(np.array([len(ratings) for ratings in user_ratings], dtype=np.int64), out=rating_offsets[1:])
+    columns["media.user_ratings.offsets"] = rating_offsets
+    flat_ratings = [rating for ratings in user_ratings for rating in ratings]
+    _add_strings(columns, "media.user_ratings.user", [str(rating["userId"]) for rating in flat_ratings])
+    columns["media.user_ratings.rate"] = np.array([rating["rate"] for rating in flat_ratings], dtype=np.float64)
+
+    generation = _read_generation(path) + 1
+    layout = {}
+    offset = 0
+    for name, values in columns.items():
+        layout[name] = {"dtype": values.dtype.str, "offset": offset, "length": int(values.size)}
+        offset = _aligned(offset + values.nbytes)
+    header = json.dumps(
+        {
+            "generation": generation,
+            "versions": versions,
+            "sources": sources or {},
+            "counts": {"cities": len(cities), "places": len(places), "media": len(media)},
+            "columns": layout,
+        }
+    ).encode("utf-8")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        data_start = _aligned(_PREFIX_SIZE + len(header))
+        f.write(b"\0" * (data_start - _PREFIX_SIZE - len(header)))
+        for name, values in columns.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(values).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return generation
+
+
+class CatalogFile:
+    """
+    Read-only view over one catalog file generation.
+
+    The file is mapped once; numeric columns are numpy views onto the mapping,
+    so every process that opens the same generation shares its pages.
+    """
+
+    __slots__ = ("path", "generation", "versions", "sources", "counts", "_map", "_columns")
+
+    def __init__(self, path: Path):
+        self.path = path
+        with path.open("rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a Team5 catalog file: {path}")
+        header_size = int.from_bytes(self._map[len(MAGIC) : _PREFIX_SIZE], "little")
+        header = json.loads(self._map[_PREFIX_SIZE : _PREFIX_SIZE + header_size])
+        data_start = _aligned(_PREFIX_SIZE + header_size)
+        self.generation = int(header["generation"])
+        self.versions = {name: int(value) for name, value in header["versions"].items()}
+        self.sources = header.get("sources", {})
+        self.counts = header["counts"]
+        self._columns = {
+            name: np.frombuffer(
+                self._map,
+                dtype=np.dtype(spec["dtype"]),
+                count=spec["length"],
+                offset=data_start + spec["offset"],
+            )
+            for name, spec in header["columns"].items()
+        }
+
+    def cities(self) -> list[CityRecord]:
+        ids = self._strings("cities.id")
+        names = self._strings("cities.name")
+        coordinates = self._columns["cities.coordinates"].reshape(-1, 2).tolist()
+        return [
+            {"cityId": city_id, "cityName": name, "coordinates": coords}
+            for city_id, name, coords in zip(ids, names, coordinates)
+        ]
+
+    def places(self, city_id: str | None = None) -> list[PlaceRecord]:
+        city_ids = self._strings("cities.id")
+        city_refs = self._columns["places.city"]
+        if city_id is None:
+            rows = np.arange(self.counts["places"])
+        else:
+            if city_id not in city_ids:
+                return []
+            rows = np.flatnonzero(city_refs == city_ids.index(city_id))
+        ids = self._strings("places.id")
+        names = self._strings("places.name")
+        coordinates = self._columns["places.coordinates"].reshape(-1, 2)
+        return [
+            {
+                "placeId": ids[row],
+                "cityId": city_ids[city_refs[row]] if city_refs[row] >= 0 else "",
+                "placeName": names[row],
+                "coordinates": coordinates[row].tolist(),
+            }
+            for row in rows.tolist()
+        ]
+
+    def media(self) -> list[MediaRecord]:
+        return self.media_records(range(self.counts["media"]))
+
+    def media_records(self, rows, *, stats: tuple[np.ndarray, np.ndarray] | None = None) -> list[MediaRecord]:
+        """Build record dicts for the given media rows only; `stats` replaces the stored (rates, counts)."""
+        place_ids = self._strings("places.id")
+        place_refs = self._columns["media.place"]
+        rates, counts = stats or (self._columns["media.overall_rate"], self._columns["media.ratings_count"])
+        return [
+            {
+                "mediaId": self._string("media.id", row),
+                "placeId": place_ids[place_refs[row]] if place_refs[row] >= 0 else "",
+                "title": self._string("media.title", row),
+                "caption": self._string("media.caption", row),
+                "overallRate": float(rates[row]),
+                "ratingsCount": int(counts[row]),
+                "userRatings": self._user_ratings(row),
+            }
+            for row in rows
+        ]
+
+    def has_user_ratings(self) -> bool:
+        """Whether the file stores per-media `userRatings`; files written before they were added do not."""
+        return "media.user_ratings.offsets" in self._columns
+
+    def media_ids(self) -> list[str]:
+        return self._strings("media.id")
+
+    def media_columns(self, *, stats: tuple[np.ndarray, np.ndarray] | None = None) -> MediaColumns:
+        """Columns over the mapping; only media ids are decoded up front. `stats` replaces the stored columns."""
+        place_ids = self._strings("places.id")
+        place_refs = self._columns["media.place"]
+        if (place_refs < 0).any():
+            place_ids = [*place_ids, ""]
+            place_refs = np.where(place_refs < 0, len(place_ids) - 1, place_refs)
+        rates, counts = stats or (self._columns["media.overall_rate"], self._columns["media.ratings_count"])
+        return MediaColumns(
+            media_ids=self.media_ids(),
+            place_ids=place_ids,
+            place_index=place_refs,
+            overall_rate=rates,
+            ratings_count=counts,
+            load=lambda rows: self.media_records(rows, stats=stats),
+        )
+
+    def _user_ratings(self, row: int) -> list[dict]:
+        if not self.has_user_ratings():
+            return []
+        offsets = self._columns["media.user_ratings.offsets"]
+        rates = self._columns["media.user_ratings.rate"]
+        return [
+            {"userId": self._string("media.user_ratings.user", index), "rate": float(rates[index])}
+            for index in range(int(offsets[row]), int(offsets[row + 1]))
+        ]
+
+    def _string(self, name: str, row: int) -> str:
+        offsets = self._columns[f"{name}.offsets"]
+        return self._columns[f"{name}.data"][offsets[row] : offsets[row + 1]].tobytes().decode("utf-8")
+
+    def _strings(self, name: str) -> list[str]:
+        offsets = self._columns[f"{name}.offsets"].tolist()
+        blob = self._columns[f"{name}.data"].tobytes()
+        return [blob[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+
+
+def _add_strings(columns: dict[str, np.ndarray], name: str, values: list[str]) -> None:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.array([len(value) for value in encoded], dtype=np.int64), out=offsets[1:])
+    columns[f"{name}.offsets"] = offsets
+    columns[f"{name}.data"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _read_generation(path: Path) -> int:
+    """Generation recorded in the header of `path`, read without mapping the file; 0 when there is none."""
+    try:
+        with path.open("rb") as f:
+            prefix = f.read(_PREFIX_SIZE)
+            if len(prefix) < _PREFIX_SIZE or prefix[: len(MAGIC)] != MAGIC:
+                return 0
+            header = json.loads(f.read(int.from_bytes(prefix[len(MAGIC) :], "little")))
+    except (FileNotFoundError, ValueError):
+        return 0
+    return int(header["generation"])
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
@@ -7,6 +7,18 @@ DEFAULT_LIMIT = 20
 POPULAR_MIN_OVERALL_RATE = 4.0
 POPULAR_MIN_VOTES = 5
 PERSONALIZED_MIN_USER_RATE = 4.0
+LIKED_MIN_RATE = 4.0
+RATE_MIN = 0.0
+RATE_MAX = 5.0
+BULK_RATINGS_MAX_ROWS = 10_000
+BATCH_PERSONALIZED_MAX_USERS = 5_000
+RATINGS_QUERY_CHUNK = 500
+TRENDING_HALF_LIFE_HOURS = 24.0
+SIMILAR_TOP_N = 20
+FEED_SIZE = 100
+NEAREST_PLACES_K = 5
+FEED_MAX_AGE_SECONDS = 24 * 60 * 60
+PIPELINE_TOTAL_BUDGET_MS = 200.0
 
 
 class CityRecord(TypedDict):
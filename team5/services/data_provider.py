@@ -1,25 +1,81 @@
 """Provider abstraction for Team5 data sources."""
 
 from abc import ABC, abstractmethod
+from collections.abc import Sequence
+
+from asgiref.sync import sync_to_async
 
 from .contracts import CityRecord, MediaRecord, PlaceRecord
+from .media_columns import MediaColumns
 
 
 class DataProvider(ABC):
-    """Abstract source of recommendation input data."""
+    """
+    Abstract source of recommendation input data.
+
+    Getters may return shared, read-only sequences; callers copy records before mutating them.
+    """
 
     @abstractmethod
-    def get_cities(self) -> list[CityRecord]:
+    def get_cities(self) -> Sequence[CityRecord]:
         raise NotImplementedError
 
     @abstractmethod
-    def get_city_places(self, city_id: str) -> list[PlaceRecord]:
+    def get_city_places(self, city_id: str) -> Sequence[PlaceRecord]:
         raise NotImplementedError
 
     @abstractmethod
-    def get_all_places(self) -> list[PlaceRecord]:
+    def get_all_places(self) -> Sequence[PlaceRecord]:
         raise NotImplementedError
 
     @abstractmethod
-    def get_media(self) -> list[MediaRecord]:
+    def get_media(self) -> Sequence[MediaRecord]:
         raise NotImplementedError
+
+    def get_media_columns(self) -> MediaColumns:
+        """Array-backed catalog for ranking; providers with columnar storage override this."""
+        return MediaColumns.from_records(self.get_media())
+
+    def get_media_by_ids(self, media_ids: list[str]) -> list[MediaRecord]:
+        """Records for `media_ids` in the given order, skipping unknown ids; override to avoid a full catalog read."""
+        media_by_id = {item["mediaId"]: item for item in self.get_media()}
+        return [dict(media_by_id[media_id]) for media_id in dict.fromkeys(media_ids) if media_id in media_by_id]
+
+
+class AsyncDataProvider(ABC):
+    """Awaitable counterpart of `DataProvider` for async views."""
+
+    @abstractmethod
+    async def get_cities(self) -> Sequence[CityRecord]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_city_places(self, city_id: str) -> Sequence[PlaceRecord]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_all_places(self) -> Sequence[PlaceRecord]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_media(self) -> Sequence[MediaRecord]:
+        raise NotImplementedError
+
+
+class SyncProviderAdapter(AsyncDataProvider):
+    """Expose a synchronous provider to async code, one worker-thread call per read."""
+
+    def __init__(self, provider: DataProvider):
+        self.provider = provider
+
+    async def get_cities(self) -> Sequence[CityRecord]:
+        return await sync_to_async(self.provider.get_cities)()
+
+    async def get_city_places(self, city_id: str) -> Sequence[PlaceRecord]:
+        return await sync_to_async(self.provider.get_city_places)(city_id)
+
+    async def get_all_places(self) -> Sequence[PlaceRecord]:
+        return await sync_to_async(self.provider.get_all_places)()
+
+    async def get_media(self) -> Sequence[MediaRecord]:
+        return await sync_to_async(self.provider.get_media)()
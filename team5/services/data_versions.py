@@ -0,0 +1,81 @@
+"""Monotonic version counters for Team5 data that derived state depends on."""
+
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from django.db.models import F
+from django.utils import timezone
+
+from team5.models import Team5DataVersion
+
+CATALOG = "catalog"
+RATINGS = "ratings"
+MODELS = "models"
+
+_deferred: ContextVar[set[str] | None] = ContextVar("team5_deferred_versions", default=None)
+
+
+def get_versions(*names: str) -> dict[str, int]:
+    versions = dict(Team5DataVersion.objects.filter(name__in=names).values_list("name", "version"))
+    return {name: int(versions.get(name, 0)) for name in names}
+
+
+def get_version_token(*names: str) -> str:
+    """
+    Opaque token that changes whenever any of the named versions is bumped.
+
+    The bump time is mixed in with the counter, so a counter that returns to an
+    earlier value (a restored database, a rolled-back transaction) still yields
+    a new token.
+    """
+    rows = {
+        name: (version, updated_at)
+        for name, version, updated_at in Team5DataVersion.objects.filter(name__in=names).values_list(
+            "name", "version", "updated_at"
+        )
+    }
+    parts = []
+    for name in names:
+        version, updated_at = rows.get(name, (0, None))
+        parts.append(f"{name}={version}@{updated_at.timestamp() if updated_at else 0}")
+    return hashlib.sha1(";".join(parts).encode("utf-8")).hexdigest()[:20]
+
+
+def get_version(name: str) -> int:
+    return get_versions(name)[name]
+
+
+def bump_version(name: str) -> None:
+    deferred = _deferred.get()
+    if deferred is not None:
+        deferred.add(name)
+        return
+    versions = Team5DataVersion.objects.filter(name=name)
+    updated = versions.update(version=F("version") + 1, updated_at=timezone.now())
+    if not updated:
+        _, created = Team5DataVersion.objects.get_or_create(name=name, defaults={"version": 1})
+        if not created:
+            versions.update(version=F("version") + 1, updated_at=timezone.now())
+
+
+@contextmanager
+def deferred_bumps() -> Iterator[None]:
+    """
+    Collect bumps made inside the block and apply each named version once on exit.
+
+    Bulk writers wrap row-by-row saves in this so caches are invalidated once
+    per batch rather than once per row. Nested blocks join the outer one.
+    """
+    if _deferred.get() is not None:
+        yield
+        return
+    names: set[str] = set()
+    token = _deferred.set(names)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+        for name in sorted(names):
+            bump_version(name)
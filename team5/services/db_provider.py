@@ -1,11 +1,16 @@
 """Database-backed provider for Team5 recommendation data."""
 
-from django.db.models import Avg, Count
+from collections import defaultdict
+
+import numpy as np
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum
 
 from team5.models import Team5City, Team5Media, Team5MediaRating, Team5Place
 
 from .contracts import CityRecord, MediaRecord, PlaceRecord
-from .data_provider import DataProvider
+from .data_provider import AsyncDataProvider, DataProvider
+from .media_columns import MediaColumns
+from .rating_shards import is_sharded, rating_aliases, scatter
 
 
 class DatabaseProvider(DataProvider):
@@ -22,47 +27,197 @@ class DatabaseProvider(DataProvider):
 
     def get_city_places(self, city_id: str) -> list[PlaceRecord]:
         rows = Team5Place.objects.filter(city_id=city_id).order_by("place_name")
-        return [self._place_to_record(row) for row in rows]
+        return [_place_to_record(row) for row in rows]
 
     def get_all_places(self) -> list[PlaceRecord]:
         rows = Team5Place.objects.select_related("city").all().order_by("place_name")
-        return [self._place_to_record(row) for row in rows]
+        return [_place_to_record(row) for row in rows]
 
     def get_media(self) -> list[MediaRecord]:
-        stats = (
-            Team5MediaRating.objects.values("media_id")
-            .annotate(avg_rate=Avg("rate"), count_rate=Count("id"))
-            .order_by()
-        )
-        stats_by_media = {
-            row["media_id"]: {
-                "overallRate": round(float(row["avg_rate"]), 2),
-                "ratingsCount": int(row["count_rate"]),
-            }
-            for row in stats
-        }
-
+        stats_by_media = self._get_media_stats()
         rows = Team5Media.objects.select_related("place").all().order_by("media_id")
         output: list[MediaRecord] = []
         for row in rows:
-            item_stats = stats_by_media.get(row.media_id, {"overallRate": 0.0, "ratingsCount": 0})
+            overall_rate, ratings_count = stats_by_media.get(row.media_id, (0.0, 0))
             output.append(
                 {
                     "mediaId": row.media_id,
                     "placeId": row.place_id,
                     "title": row.title,
                     "caption": row.caption,
-                    "overallRate": item_stats["overallRate"],
-                    "ratingsCount": item_stats["ratingsCount"],
+                    "overallRate": overall_rate,
+                    "ratingsCount": ratings_count,
                     "userRatings": [],
                 }
             )
         return output
 
-    def _place_to_record(self, place: Team5Place) -> PlaceRecord:
-        return {
-            "placeId": place.place_id,
-            "cityId": place.city_id,
-            "placeName": place.place_name,
-            "coordinates": [place.latitude, place.longitude],
+    def get_media_by_ids(self, media_ids: list[str]) -> list[MediaRecord]:
+        """Fetch only the requested media, with rating stats from correlated subqueries, in one query."""
+        media_ids = list(dict.fromkeys(media_ids))
+        if not media_ids:
+            return []
+        if is_sharded():
+            return self._get_sharded_media_by_ids(media_ids)
+        ratings = Team5MediaRating.objects.filter(media_id=OuterRef("media_id")).order_by().values("media_id")
+        rows = (
+            Team5Media.objects.filter(media_id__in=media_ids)
+            .annotate(
+                avg_rate=Subquery(ratings.annotate(value=Avg("rate")).values("value")[:1]),
+                count_rate=Subquery(ratings.annotate(value=Count("id")).values("value")[:1]),
+            )
+            .values_list("media_id", "place_id", "title", "caption", "avg_rate", "count_rate")
+        )
+        media_by_id = {
+            media_id: {
+                "mediaId": media_id,
+                "placeId": place_id,
+                "title": title,
+                "caption": caption,
+                "overallRate": round(float(avg_rate), 2) if avg_rate is not None else 0.0,
+                "ratingsCount": int(count_rate or 0),
+                "userRatings": [],
+            }
+            for media_id, place_id, title, caption, avg_rate, count_rate in rows
+        }
+        return [media_by_id[media_id] for media_id in media_ids if media_id in media_by_id]
+
+    def _get_sharded_media_by_ids(self, media_ids: list[str]) -> list[MediaRecord]:
+        stats_by_media = _merge_media_stats(
+            scatter(lambda alias: list(_media_stats(alias).filter(media_id__in=media_ids)))
+        )
+        rows = Team5Media.objects.filter(media_id__in=media_ids).values_list("media_id", "place_id", "title", "caption")
+        media_by_id = {}
+        for media_id, place_id, title, caption in rows:
+            overall_rate, ratings_count = stats_by_media.get(media_id, (0.0, 0))
+            media_by_id[media_id] = {
+                "mediaId": media_id,
+                "placeId": place_id,
+                "title": title,
+                "caption": caption,
+                "overallRate": overall_rate,
+                "ratingsCount": ratings_count,
+                "userRatings": [],
+            }
+        return [media_by_id[media_id] for media_id in media_ids if media_id in media_by_id]
+
+    def get_media_columns(self) -> MediaColumns:
+        """Load ids, places and rating stats into arrays; titles and captions are fetched per materialized row."""
+        stats_by_media = self._get_media_stats()
+        media_ids: list[str] = []
+        place_rows: dict[str, int] = {}
+        place_index: list[int] = []
+        for media_id, place_id in Team5Media.objects.order_by("media_id").values_list("media_id", "place_id"):
+            media_ids.append(media_id)
+            place_index.append(place_rows.setdefault(place_id, len(place_rows)))
+        stats = [stats_by_media.get(media_id, (0.0, 0)) for media_id in media_ids]
+        place_ids = list(place_rows)
+        columns = MediaColumns(
+            media_ids=media_ids,
+            place_ids=place_ids,
+            place_index=np.array(place_index, dtype=np.int32),
+            overall_rate=np.array([rate for rate, _ in stats], dtype=np.float64),
+            ratings_count=np.array([count for _, count in stats], dtype=np.int64),
+            load=lambda rows: self._load_media_rows(columns, rows),
+        )
+        return columns
+
+    def _load_media_rows(self, columns: MediaColumns, rows: list[int]) -> list[MediaRecord]:
+        texts = {
+            media_id: (title, caption)
+            for media_id, title, caption in Team5Media.objects.filter(
+                media_id__in=[columns.media_ids[row] for row in rows]
+            ).values_list("media_id", "title", "caption")
         }
+        output: list[MediaRecord] = []
+        for row in rows:
+            media_id = columns.media_ids[row]
+            title, caption = texts.get(media_id, ("", ""))
+            output.append(
+                {
+                    "mediaId": media_id,
+                    "placeId": columns.place_ids[columns.place_index[row]],
+                    "title": title,
+                    "caption": caption,
+                    "overallRate": float(columns.overall_rate[row]),
+                    "ratingsCount": int(columns.ratings_count[row]),
+                    "userRatings": [],
+                }
+            )
+        return output
+
+    def _get_media_stats(self) -> dict[str, tuple[float, int]]:
+        return _merge_media_stats(scatter(lambda alias: list(_media_stats(alias))))
+
+
+class AsyncDatabaseProvider(AsyncDataProvider):
+    """Async ORM counterpart of `DatabaseProvider` returning the same records in the same order."""
+
+    async def get_cities(self) -> list[CityRecord]:
+        return [
+            {
+                "cityId": row.city_id,
+                "cityName": row.city_name,
+                "coordinates": [row.latitude, row.longitude],
+            }
+            async for row in Team5City.objects.all().order_by("city_name")
+        ]
+
+    async def get_city_places(self, city_id: str) -> list[PlaceRecord]:
+        rows = Team5Place.objects.filter(city_id=city_id).order_by("place_name")
+        return [_place_to_record(row) async for row in rows]
+
+    async def get_all_places(self) -> list[PlaceRecord]:
+        return [_place_to_record(row) async for row in Team5Place.objects.all().order_by("place_name")]
+
+    async def get_media(self) -> list[MediaRecord]:
+        rows_by_alias = []
+        for alias in rating_aliases():
+            rows_by_alias.append([row async for row in _media_stats(alias)])
+        stats_by_media = _merge_media_stats(rows_by_alias)
+        output: list[MediaRecord] = []
+        async for media_id, place_id, title, caption in Team5Media.objects.order_by("media_id").values_list(
+            "media_id", "place_id", "title", "caption"
+        ):
+            overall_rate, ratings_count = stats_by_media.get(media_id, (0.0, 0))
+            output.append(
+                {
+                    "mediaId": media_id,
+                    "placeId": place_id,
+                    "title": title,
+                    "caption": caption,
+                    "overallRate": overall_rate,
+                    "ratingsCount": ratings_count,
+                    "userRatings": [],
+                }
+            )
+        return output
+
+
+def _media_stats(alias: str):
+    """Per-media rating sum and count on one alias; shards merge them into averages."""
+    return (
+        Team5MediaRating.objects.using(alias)
+        .values("media_id")
+        .annotate(sum_rate=Sum("rate"), count_rate=Count("id"))
+        .order_by()
+    )
+
+
+def _merge_media_stats(rows_by_alias: list[list[dict]]) -> dict[str, tuple[float, int]]:
+    totals: dict[str, list] = defaultdict(lambda: [0.0, 0])
+    for rows in rows_by_alias:
+        for row in rows:
+            total = totals[row["media_id"]]
+            total[0] += float(row["sum_rate"])
+            total[1] += int(row["count_rate"])
+    return {media_id: (round(rate_sum / count, 2), count) for media_id, (rate_sum, count) in totals.items() if count}
+
+
+def _place_to_record(place: Team5Place) -> PlaceRecord:
+    return {
+        "placeId": place.place_id,
+        "cityId": place.city_id,
+        "placeName": place.place_name,
+        "coordinates": [place.latitude, place.longitude],
+    }
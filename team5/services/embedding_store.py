@@ -0,0 +1,158 @@
+"""Memory-mapped user/media embeddings produced by `train_team5_embeddings`."""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+USER_FACTORS_FILE = "user_factors.npy"
+ITEM_FACTORS_FILE = "item_factors.npy"
+ID_MAP_FILE = "id_map.json"
+
+
+def default_embeddings_dir() -> Path:
+    return Path(getattr(settings, "TEAM5_EMBEDDINGS_DIR", Path(__file__).resolve().parent.parent / "embeddings"))
+
+
+def write_embeddings(
+    directory: Path,
+    *,
+    user_ids: list[str],
+    media_ids: list[str],
+    user_factors: np.ndarray,
+    item_factors: np.ndarray,
+) -> None:
+    """Write factor matrices and the id map; the id map is replaced last and marks the new version."""
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, matrix in ((USER_FACTORS_FILE, user_factors), (ITEM_FACTORS_FILE, item_factors)):
+        tmp_path = directory / f".{name}.tmp"
+        with tmp_path.open("wb") as f:
+            np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+        os.replace(tmp_path, directory / name)
+
+    tmp_map = directory / f".{ID_MAP_FILE}.tmp"
+    tmp_map.write_text(
+        json.dumps({"factors": int(item_factors.shape[1]), "users": user_ids, "media": media_ids}),
+        encoding="utf-8",
+    )
+    os.replace(tmp_map, directory / ID_MAP_FILE)
+
+
+class EmbeddingStore:
+    """Read-only view over embedding files, remapped when the id map changes on disk."""
+
+    def __init__(self, directory: Path | None = None):
+        self.directory = directory or default_embeddings_dir()
+        self._lock = threading.Lock()
+        self._stamp: tuple[int, int] | None = None
+        self._snapshot: _EmbeddingSnapshot | None = None
+
+    def is_available(self) -> bool:
+        return self._refresh() is not None
+
+    def score_media(
+        self,
+        user_id: str,
+        *,
+        limit: int,
+        excluded_media_ids: set[str] = frozenset(),
+    ) -> list[tuple[str, float]]:
+        """Rank every media for the user with one matrix-vector product and a partial sort."""
+        snapshot = self._refresh()
+        if snapshot is None or limit <= 0:
+            return []
+        user_row = snapshot.user_index.get(str(user_id))
+        if user_row is None:
+            return []
+
+        scores = snapshot.item_factors @ snapshot.user_factors[user_row]
+        excluded_rows = [snapshot.media_index[m] for m in excluded_media_ids if m in snapshot.media_index]
+        if excluded_rows:
+            scores[excluded_rows] = -np.inf
+
+        top_k = min(limit, len(scores) - len(excluded_rows))
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return [(snapshot.media_ids[row], float(scores[row])) for row in top]
+
+    def score_media_batch(
+        self,
+        user_ids: list[str],
+        *,
+        limit: int,
+        excluded_media_ids: dict[str, set[str]] | None = None,
+        block_cells: int = 8_000_000,
+    ) -> dict[str, list[tuple[str, float]]]:
+        """
+        Rank media for many users with blocked matrix-matrix products.
+
+        Users are scored in blocks so the score matrix never exceeds `block_cells`
+        floats; each row is cut down to `limit` with argpartition.
+        """
+        snapshot = self._refresh()
+        if snapshot is None or limit <= 0:
+            return {}
+        excluded_media_ids = excluded_media_ids or {}
+        known = [(user_id, snapshot.user_index[user_id]) for user_id in user_ids if user_id in snapshot.user_index]
+        item_count = snapshot.item_factors.shape[0]
+        block = max(1, block_cells // max(1, item_count))
+
+        output: dict[str, list[tuple[str, float]]] = {}
+        for start in range(0, len(known), block):
+            chunk = known[start : start + block]
+            scores = snapshot.user_factors[[row for _, row in chunk]] @ snapshot.item_factors.T
+            for position, (user_id, _) in enumerate(chunk):
+                excluded = excluded_media_ids.get(user_id, ())
+                excluded_rows = [snapshot.media_index[m] for m in excluded if m in snapshot.media_index]
+                if excluded_rows:
+                    scores[position, excluded_rows] = -np.inf
+            top_k = min(limit, item_count)
+            top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            for position, (user_id, _) in enumerate(chunk):
+                output[user_id] = [
+                    (snapshot.media_ids[row], float(score))
+                    for row, score in zip(top[position, order[position]], top_scores[position, order[position]])
+                    if np.isfinite(score)
+                ]
+        return output
+
+    def _refresh(self) -> "_EmbeddingSnapshot | None":
+        id_map_path = self.directory / ID_MAP_FILE
+        try:
+            stat = id_map_path.stat()
+        except FileNotFoundError:
+            self._stamp = self._snapshot = None
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return self._snapshot
+
+        with self._lock:
+            if stamp != self._stamp:
+                id_map = json.loads(id_map_path.read_text(encoding="utf-8"))
+                self._snapshot = _EmbeddingSnapshot(
+                    user_index={user_id: row for row, user_id in enumerate(id_map["users"])},
+                    media_ids=list(id_map["media"]),
+                    user_factors=np.load(self.directory / USER_FACTORS_FILE, mmap_mode="r"),
+                    item_factors=np.load(self.directory / ITEM_FACTORS_FILE, mmap_mode="r"),
+                )
+                self._stamp = stamp
+            return self._snapshot
+
+
+class _EmbeddingSnapshot:
+    __slots__ = ("user_index", "media_ids", "media_index", "user_factors", "item_factors")
+
+    def __init__(self, *, user_index, media_ids, user_factors, item_factors):
+        self.user_index = user_index
+        self.media_ids = media_ids
+        self.media_index = {media_id: row for row, media_id in enumerate(media_ids)}
+        self.user_factors = user_factors
+        self.item_factors = item_factors
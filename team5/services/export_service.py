@@ -0,0 +1,109 @@
+"""Streaming NDJSON export of Team5 ratings and catalog for offline jobs."""
+
+import heapq
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+
+from django.conf import settings
+from django.db.models import Max
+
+from team5.models import Team5City, Team5Media, Team5MediaRating, Team5Place
+
+from .rating_shards import rating_aliases, scatter
+
+EXPORT_CHUNK = 2000
+RATING_FIELDS = ("user_id", "media_id", "rate", "liked", "updated_at")
+EXPORT_SAFETY_LAG_SECONDS = 60
+
+
+def ratings_watermark() -> datetime | None:
+    """
+    Upper bound for one export, or None when there are no ratings.
+
+    This is the latest rating `updated_at` across all shards, capped at now minus
+    TEAM5_EXPORT_SAFETY_LAG_SECONDS. `updated_at` is stamped before commit, so a
+    slow transaction can commit a row older than the newest visible one. The lag
+    keeps such rows at or above the watermark, and the next incremental export
+    picks them up.
+    """
+    lag = getattr(settings, "TEAM5_EXPORT_SAFETY_LAG_SECONDS", EXPORT_SAFETY_LAG_SECONDS)
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=lag)
+    latest = [
+        value
+        for value in scatter(
+            lambda alias: Team5MediaRating.objects.using(alias).aggregate(latest=Max("updated_at"))["latest"]
+        )
+        if value is not None
+    ]
+    return min(max(latest), cutoff) if latest else None
+
+
+def iter_ratings(
+    *,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    chunk_size: int = EXPORT_CHUNK,
+) -> Iterator[dict]:
+    """
+    Yield ratings with since <= updatedAt <= until, oldest first, in fixed memory.
+
+    Each shard is read through a chunked cursor (server-side on PostgreSQL)
+    and the ordered streams are merged. `since` is inclusive, so rows at the
+    previous watermark are exported again; consumers upsert by (userId, mediaId).
+    """
+    streams = []
+    for alias in rating_aliases():
+        rows = Team5MediaRating.objects.using(alias).order_by("updated_at", "id")
+        if since is not None:
+            rows = rows.filter(updated_at__gte=since)
+        if until is not None:
+            rows = rows.filter(updated_at__lte=until)
+        streams.append(rows.values_list(*RATING_FIELDS).iterator(chunk_size=chunk_size))
+    for user_id, media_id, rate, liked, updated_at in heapq.merge(*streams, key=lambda row: row[4]):
+        yield {
+            "userId": str(user_id),
+            "mediaId": media_id,
+            "rate": float(rate),
+            "liked": bool(liked),
+            "updatedAt": updated_at.isoformat(),
+        }
+
+
+def iter_catalog(*, chunk_size: int = EXPORT_CHUNK) -> Iterator[dict]:
+    """Yield every city, place and media as records tagged with their `type`."""
+    for city_id, city_name, latitude, longitude in (
+        Team5City.objects.order_by("city_id")
+        .values_list("city_id", "city_name", "latitude", "longitude")
+        .iterator(chunk_size=chunk_size)
+    ):
+        yield {"type": "city", "cityId": city_id, "cityName": city_name, "coordinates": [latitude, longitude]}
+    for place_id, city_id, place_name, latitude, longitude in (
+        Team5Place.objects.order_by("place_id")
+        .values_list("place_id", "city_id", "place_name", "latitude", "longitude")
+        .iterator(chunk_size=chunk_size)
+    ):
+        yield {
+            "type": "place",
+            "placeId": place_id,
+            "cityId": city_id,
+            "placeName": place_name,
+            "coordinates": [latitude, longitude],
+        }
+    for media_id, place_id, title, caption in (
+        Team5Media.objects.order_by("media_id")
+        .values_list("media_id", "place_id", "title", "caption")
+        .iterator(chunk_size=chunk_size)
+    ):
+        yield {"type": "media", "mediaId": media_id, "placeId": place_id, "title": title, "caption": caption}
+
+
+def ndjson_lines(records: Iterator[dict]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def parse_watermark(value: str) -> datetime:
+    """Parse an ISO watermark, treating naive timestamps as UTC; raises ValueError when malformed."""
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
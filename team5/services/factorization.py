@@ -0,0 +1,84 @@
+"""Implicit-feedback matrix factorization (ALS) for Team5 ratings."""
+
+from typing import Iterable
+
+import numpy as np
+
+
+def train_implicit_als(
+    ratings: Iterable[tuple[object, str, float]],
+    *,
+    factors: int = 32,
+    iterations: int = 10,
+    regularization: float = 0.05,
+    alpha: float = 10.0,
+    positive_rate: float = 3.0,
+    seed: int = 1404,
+) -> tuple[list[str], list[str], np.ndarray, np.ndarray]:
+    """
+    Factorize the user x media matrix with weighted ALS (Hu, Koren & Volinsky).
+
+    Every rating is an observation: rates at or above `positive_rate` mean preference 1,
+    lower rates preference 0, and the distance from `positive_rate` scales confidence.
+    Returns (user ids, media ids, user factors, item factors) with float32 factor rows
+    aligned to the id lists.
+    """
+    user_index: dict[str, int] = {}
+    media_index: dict[str, int] = {}
+    user_ids: list[str] = []
+    media_ids: list[str] = []
+    rows: list[int] = []
+    cols: list[int] = []
+    values: list[float] = []
+    for user_id, media_id, rate in ratings:
+        user_key = str(user_id)
+        if user_key not in user_index:
+            user_index[user_key] = len(user_ids)
+            user_ids.append(user_key)
+        if media_id not in media_index:
+            media_index[media_id] = len(media_ids)
+            media_ids.append(media_id)
+        rows.append(user_index[user_key])
+        cols.append(media_index[media_id])
+        values.append(float(rate))
+
+    rng = np.random.default_rng(seed)
+    user_factors = rng.normal(scale=0.01, size=(len(user_ids), factors))
+    item_factors = rng.normal(scale=0.01, size=(len(media_ids), factors))
+    if not values:
+        return user_ids, media_ids, user_factors.astype(np.float32), item_factors.astype(np.float32)
+
+    row_array = np.asarray(rows, dtype=np.int64)
+    col_array = np.asarray(cols, dtype=np.int64)
+    rate_array = np.asarray(values, dtype=np.float64)
+    preference = (rate_array >= positive_rate).astype(np.float64)
+    confidence = 1.0 + alpha * np.abs(rate_array - positive_rate)
+
+    by_user = _group_rows(row_array, col_array, preference, confidence, len(user_ids))
+    by_item = _group_rows(col_array, row_array, preference, confidence, len(media_ids))
+    for _ in range(iterations):
+        _solve_side(user_factors, item_factors, by_user, regularization)
+        _solve_side(item_factors, user_factors, by_item, regularization)
+
+    return user_ids, media_ids, user_factors.astype(np.float32), item_factors.astype(np.float32)
+
+
+def _group_rows(keys, others, preference, confidence, size):
+    order = np.argsort(keys, kind="stable")
+    bounds = np.searchsorted(keys[order], np.arange(size + 1))
+    return [
+        (others[order[start:end]], preference[order[start:end]], confidence[order[start:end]])
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def _solve_side(target: np.ndarray, fixed: np.ndarray, groups, regularization: float) -> None:
+    gram = fixed.T @ fixed
+    identity = regularization * np.eye(fixed.shape[1])
+    for index, (others, preference, confidence) in enumerate(groups):
+        if not len(others):
+            continue
+        observed = fixed[others]
+        lhs = gram + (observed.T * (confidence - 1.0)) @ observed + identity
+        rhs = (confidence * preference) @ observed
+        target[index] = np.linalg.solve(lhs, rhs)
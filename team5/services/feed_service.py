@@ -0,0 +1,71 @@
+"""Materialized per-user personalized feeds."""
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+from team5.models import Team5UserFeed
+
+from . import data_versions
+from .contracts import FEED_MAX_AGE_SECONDS, FEED_SIZE
+from .recommendation_service import RecommendationService, _parse_uuid
+
+FEED_ENTRY_KEYS = ("matchReason", "userRate", "predictedScore")
+
+
+class FeedService:
+    def __init__(
+        self,
+        recommendation_service: RecommendationService,
+        *,
+        size: int = FEED_SIZE,
+        max_age_seconds: int = FEED_MAX_AGE_SECONDS,
+    ):
+        self.recommendation_service = recommendation_service
+        self.size = size
+        self.max_age = timedelta(seconds=max_age_seconds)
+
+    def current_version(self) -> str:
+        versions = data_versions.get_versions(data_versions.CATALOG, data_versions.MODELS)
+        return f"c{versions[data_versions.CATALOG]}-m{versions[data_versions.MODELS]}"
+
+    def rebuild(self, user_id: str, *, version: str | None = None) -> Team5UserFeed | None:
+        user_uuid = _parse_uuid(user_id)
+        if user_uuid is None:
+            return None
+        items = self.recommendation_service.get_personalized(user_id=str(user_uuid), limit=self.size)
+        entries = [
+            {"mediaId": item["mediaId"], **{key: item[key] for key in FEED_ENTRY_KEYS if key in item}}
+            for item in items
+        ]
+        feed, _ = Team5UserFeed.objects.update_or_create(
+            user_id=user_uuid,
+            defaults={"items": entries, "version": version or self.current_version()},
+        )
+        return feed
+
+    def get_fresh_feed(self, user_id: str) -> Team5UserFeed | None:
+        """Return the stored feed, or None when it is missing or stale."""
+        user_uuid = _parse_uuid(user_id)
+        if user_uuid is None:
+            return None
+        feed = Team5UserFeed.objects.filter(user_id=user_uuid).first()
+        if feed is None or feed.version != self.current_version():
+            return None
+        if feed.built_at < timezone.now() - self.max_age:
+            return None
+        return feed
+
+    def materialize(self, feed: Team5UserFeed, limit: int) -> list[dict]:
+        media_by_id = {item["mediaId"]: item for item in self.recommendation_service.provider.get_media()}
+        output = []
+        for entry in feed.items:
+            media = media_by_id.get(entry["mediaId"])
+            if media is None:
+                continue
+            item = dict(media)
+            item.update({key: entry[key] for key in FEED_ENTRY_KEYS if key in entry})
+            output.append(item)
+            if len(output) >= limit:
+                break
+        return output
@@ -0,0 +1,222 @@
+"""Geolocation result cache shared by Team5 workers (memory LRU + SQLite file)."""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from ipaddress import IPv4Address, ip_address, ip_network
+from pathlib import Path
+from typing import Callable
+
+from django.conf import settings
+
+KEY_IP = "ip"
+KEY_PREFIX = "prefix"
+IPV4_PREFIX = 24
+IPV6_PREFIX = 48
+
+_MISS = object()
+
+
+class GeoCache:
+    """
+    Two-level cache for IP geolocation results.
+
+    Lookups hit a per-process LRU first, then a SQLite file that all workers on the
+    host share. Found locations live for `positive_ttl` seconds, misses (None) for
+    `negative_ttl`. Concurrent lookups of the same key in one process wait for a
+    single resolution instead of each calling the resolver.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        *,
+        max_entries: int = 10_000,
+        positive_ttl: float = 24 * 60 * 60,
+        negative_ttl: float = 10 * 60,
+        key_mode: str = KEY_PREFIX,
+        wait_timeout: float = 5.0,
+    ):
+        if key_mode not in (KEY_IP, KEY_PREFIX):
+            raise ValueError(f"Unknown geo cache key mode: {key_mode}")
+        self.path = path
+        self.max_entries = max_entries
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.key_mode = key_mode
+        self.wait_timeout = wait_timeout
+        self._memory: OrderedDict[str, tuple[float, dict | None]] = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._inflight: dict[str, _Flight] = {}
+        self._inflight_lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connection() as connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS geo_cache ("
+                    "key TEXT PRIMARY KEY, payload TEXT, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                connection.execute("CREATE INDEX IF NOT EXISTS geo_cache_accessed ON geo_cache (accessed_at)")
+
+    def cache_key(self, client_ip: str) -> str:
+        try:
+            parsed = ip_address(client_ip)
+        except ValueError:
+            return client_ip.strip()
+        if self.key_mode == KEY_IP:
+            return str(parsed)
+        prefix = IPV4_PREFIX if isinstance(parsed, IPv4Address) else IPV6_PREFIX
+        return str(ip_network(f"{parsed}/{prefix}", strict=False))
+
+    def get_or_resolve(
+        self,
+        client_ip: str,
+        resolver: Callable[[str], dict | None],
+        *,
+        namespace: str = "",
+    ) -> dict | None:
+        """Return the cached location of `client_ip`; entries cached under another `namespace` are ignored."""
+        key = f"{namespace}|{self.cache_key(client_ip)}" if namespace else self.cache_key(client_ip)
+        cached = self._get(key)
+        if cached is not _MISS:
+            return cached
+
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        if not leader:
+            flight.done.wait(self.wait_timeout)
+            return flight.result
+
+        try:
+            cached = self._get(key)
+            flight.result = resolver(client_ip) if cached is _MISS else cached
+            if cached is _MISS:
+                self._set(key, flight.result)
+            return flight.result
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def clear(self) -> None:
+        with self._memory_lock:
+            self._memory.clear()
+        if self.path is not None:
+            with self._connection() as connection:
+                connection.execute("DELETE FROM geo_cache")
+
+    def _get(self, key: str):
+        now = time.time()
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    return entry[1]
+                del self._memory[key]
+
+        if self.path is None:
+            return _MISS
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT payload, expires_at FROM geo_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return _MISS
+            connection.execute("UPDATE geo_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        value = json.loads(row[0])
+        self._remember(key, row[1], value)
+        return value
+
+    def _set(self, key: str, value: dict | None) -> None:
+        now = time.time()
+        expires_at = now + (self.positive_ttl if value else self.negative_ttl)
+        self._remember(key, expires_at, value)
+        if self.path is None:
+            return
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO geo_cache (key, payload, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict(connection, now)
+
+    def _remember(self, key: str, expires_at: float, value: dict | None) -> None:
+        with self._memory_lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> None:
+        connection.execute("DELETE FROM geo_cache WHERE expires_at <= ?", (now,))
+        (count,) = connection.execute("SELECT COUNT(*) FROM geo_cache").fetchone()
+        if count > self.max_entries:
+            connection.execute(
+                "DELETE FROM geo_cache WHERE key IN "
+                "(SELECT key FROM geo_cache ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(str(self.path), timeout=5.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+
+class _Flight:
+    __slots__ = ("done", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: dict | None = None
+
+
+_default_lock = threading.Lock()
+_default_cache: GeoCache | None = None
+_default_config: tuple | None = None
+
+
+def default_cache_path() -> Path:
+    """Per-user cache file outside the source tree, under $XDG_CACHE_HOME or ~/.cache."""
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "app404" / "team5_geo_cache.sqlite3"
+
+
+def get_geo_cache() -> GeoCache:
+    """Return the process-wide cache configured from TEAM5_GEO_CACHE_* settings; a None path keeps it in memory."""
+    global _default_cache, _default_config
+    path = getattr(settings, "TEAM5_GEO_CACHE_PATH", default_cache_path())
+    config = (
+        str(path) if path else None,
+        getattr(settings, "TEAM5_GEO_CACHE_SIZE", 10_000),
+        getattr(settings, "TEAM5_GEO_CACHE_TTL", 24 * 60 * 60),
+        getattr(settings, "TEAM5_GEO_CACHE_NEGATIVE_TTL", 10 * 60),
+        getattr(settings, "TEAM5_GEO_CACHE_KEY", KEY_PREFIX),
+    )
+    if config != _default_config:
+        with _default_lock:
+            if config != _default_config:
+                _default_cache = GeoCache(
+                    Path(path) if path else None,
+                    max_entries=config[1],
+                    positive_ttl=config[2],
+                    negative_ttl=config[3],
+                    key_mode=config[4],
+                )
+                _default_config = config
+    return _default_cache
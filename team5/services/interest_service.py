@@ -0,0 +1,175 @@
+"""Incrementally maintained per-user city and place interest counters."""
+
+from collections import defaultdict
+from typing import Iterable
+from uuid import UUID
+
+from django.db import connections, router, transaction
+
+from team5.models import Team5Media, Team5MediaRating, Team5UserInterest
+
+from .contracts import PERSONALIZED_MIN_USER_RATE, RATINGS_QUERY_CHUNK
+from .rating_shards import group_by_alias, rating_aliases
+
+KINDS = (Team5UserInterest.KIND_CITY, Team5UserInterest.KIND_PLACE)
+
+# (user_id, media_id, previous rate or None, new rate or None)
+RatingChange = tuple[UUID, str, float | None, float | None]
+
+
+def apply_rating_changes(changes: Iterable[RatingChange], *, min_rate: float = PERSONALIZED_MIN_USER_RATE) -> None:
+    """Adjust counters for ratings that crossed `min_rate` in either direction."""
+    media_deltas: dict[tuple[UUID, str], int] = defaultdict(int)
+    for user_id, media_id, previous, current in changes:
+        was_interested = previous is not None and previous >= min_rate
+        is_interested = current is not None and current >= min_rate
+        if was_interested != is_interested:
+            media_deltas[(_as_uuid(user_id), media_id)] += 1 if is_interested else -1
+    if not media_deltas:
+        return
+
+    locations = _media_locations({media_id for _, media_id in media_deltas})
+    deltas: dict[tuple[UUID, str, str], int] = defaultdict(int)
+    for (user_id, media_id), delta in media_deltas.items():
+        location = locations.get(media_id)
+        if location is None or not delta:
+            continue
+        place_id, city_id = location
+        deltas[(user_id, Team5UserInterest.KIND_PLACE, place_id)] += delta
+        deltas[(user_id, Team5UserInterest.KIND_CITY, city_id)] += delta
+    _apply_deltas({key: delta for key, delta in deltas.items() if delta})
+
+
+def rebuild_user_interests(user_ids: Iterable[UUID] | None = None, *, min_rate: float = PERSONALIZED_MIN_USER_RATE) -> int:
+    """
+    Recount interests from stored ratings, for `user_ids` or everyone. Returns the rows written.
+
+    Users are recounted RATINGS_QUERY_CHUNK at a time, so only one chunk's
+    counters are held in memory and the `IN` lists stay within the database's
+    parameter limit. A full rebuild clears every counter and walks each shard's
+    raters in id order, all in one transaction.
+    """
+    locations = _media_locations(None)
+    if user_ids is None:
+        written = 0
+        with transaction.atomic(using=router.db_for_write(Team5UserInterest)):
+            Team5UserInterest.objects.all().delete()
+            for alias in rating_aliases():
+                for chunk in _rater_chunks(alias, min_rate):
+                    written += _write_counts(_count_liked([(alias, chunk)], locations, min_rate))
+        return written
+    user_ids = [_as_uuid(user_id) for user_id in user_ids]
+    written = 0
+    for start in range(0, len(user_ids), RATINGS_QUERY_CHUNK):
+        chunk = user_ids[start : start + RATINGS_QUERY_CHUNK]
+        counts = _count_liked(group_by_alias(chunk).items(), locations, min_rate)
+        with transaction.atomic(using=router.db_for_write(Team5UserInterest)):
+            Team5UserInterest.objects.filter(user_id__in=chunk).delete()
+            written += _write_counts(counts)
+    return written
+
+
+def _rater_chunks(alias: str, min_rate: float):
+    """Ids of users with ratings at or above `min_rate` on `alias`, RATINGS_QUERY_CHUNK at a time in id order."""
+    raters = Team5MediaRating.objects.using(alias).filter(rate__gte=min_rate).order_by("user_id")
+    last = None
+    while True:
+        page = raters if last is None else raters.filter(user_id__gt=last)
+        chunk = list(page.values_list("user_id", flat=True).distinct()[:RATINGS_QUERY_CHUNK])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def _count_liked(shards, locations: dict[str, tuple[str, str]], min_rate: float) -> dict[tuple[UUID, str, str], int]:
+    counts: dict[tuple[UUID, str, str], int] = defaultdict(int)
+    for user_id, media_id in _liked_pairs(shards, min_rate):
+        location = locations.get(media_id)
+        if location is None:
+            continue
+        counts[(user_id, Team5UserInterest.KIND_PLACE, location[0])] += 1
+        counts[(user_id, Team5UserInterest.KIND_CITY, location[1])] += 1
+    return counts
+
+
+def _write_counts(counts: dict[tuple[UUID, str, str], int]) -> int:
+    Team5UserInterest.objects.bulk_create(
+        (
+            Team5UserInterest(user_id=user_id, kind=kind, target_id=target_id, count=count)
+            for (user_id, kind, target_id), count in counts.items()
+        ),
+        batch_size=2000,
+    )
+    return len(counts)
+
+
+def _liked_pairs(shards, min_rate: float):
+    """(user_id, media_id) of ratings at or above `min_rate`, per (alias, user ids) shard."""
+    for alias, shard_users in shards:
+        ratings = Team5MediaRating.objects.using(alias).filter(rate__gte=min_rate, user_id__in=shard_users)
+        yield from ratings.values_list("user_id", "media_id").iterator(chunk_size=2000)
+
+
+def get_user_interests(user_id: UUID, *, top: int | None = None) -> dict[str, list[tuple[str, int]]]:
+    """Return {kind: [(target_id, count), ...]} for one user, largest counts first, in one query."""
+    grouped: dict[str, list[tuple[str, int]]] = {kind: [] for kind in KINDS}
+    rows = (
+        Team5UserInterest.objects.filter(user_id=user_id, count__gt=0)
+        .order_by("kind", "-count", "target_id")
+        .values_list("kind", "target_id", "count")
+    )
+    for kind, target_id, count in rows:
+        entries = grouped.setdefault(kind, [])
+        if top is None or len(entries) < top:
+            entries.append((target_id, count))
+    return grouped
+
+
+def _apply_deltas(deltas: dict[tuple[UUID, str, str], int]) -> None:
+    if not deltas:
+        return
+    alias = router.db_for_write(Team5UserInterest)
+    with transaction.atomic(using=alias):
+        existing = {
+            (row.user_id, row.kind, row.target_id): row
+            for row in Team5UserInterest.objects.select_for_update().filter(
+                user_id__in={user_id for user_id, _, _ in deltas},
+                target_id__in={target_id for _, _, target_id in deltas},
+            )
+        }
+        rows = []
+        emptied = []
+        for key, delta in deltas.items():
+            current = existing.get(key)
+            count = (current.count if current else 0) + delta
+            if count <= 0:
+                if current is not None:
+                    emptied.append(current.pk)
+                continue
+            user_id, kind, target_id = key
+            rows.append(Team5UserInterest(user_id=user_id, kind=kind, target_id=target_id, count=count))
+        if emptied:
+            Team5UserInterest.objects.filter(pk__in=emptied).delete()
+        if rows:
+            supports_target = connections[alias].features.supports_update_conflicts_with_target
+            Team5UserInterest.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["user_id", "kind", "target_id"] if supports_target else None,
+                update_fields=["count"],
+            )
+
+
+def _media_locations(media_ids: set[str] | None) -> dict[str, tuple[str, str]]:
+    media = Team5Media.objects.all()
+    if media_ids is not None:
+        media = media.filter(media_id__in=media_ids)
+    return {
+        media_id: (place_id, city_id)
+        for media_id, place_id, city_id in media.values_list("media_id", "place_id", "place__city_id")
+    }
+
+
+def _as_uuid(value) -> UUID:
+    return value if isinstance(value, UUID) else UUID(str(value))
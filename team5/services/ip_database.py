@@ -0,0 +1,177 @@
+"""Offline IP-range to location lookup for Team5 geolocation."""
+
+from __future__ import annotations
+
+import csv
+import io
+import os
+import threading
+from array import array
+from bisect import bisect_right
+from ipaddress import IPv4Address, IPv6Address, ip_address, ip_network
+from pathlib import Path
+from typing import Iterable
+
+from django.conf import settings
+
+CSV_FIELDS = ["start_ip", "end_ip", "city", "country", "latitude", "longitude"]
+
+
+def default_database_path() -> Path:
+    return Path(
+        getattr(
+            settings,
+            "TEAM5_IP_DATABASE_PATH",
+            Path(__file__).resolve().parent.parent / "geo_data" / "ip_ranges.csv",
+        )
+    )
+
+
+class IpLocationDatabase:
+    """
+    Sorted, non-overlapping IP ranges with bisect lookup.
+
+    IPv4 bounds live in compact unsigned arrays; IPv6 bounds need 128 bits and are
+    kept as sorted int lists. Locations are de-duplicated and referenced by index.
+    """
+
+    def __init__(self, rows: Iterable[dict]):
+        ranges_v4: list[tuple[int, int, int]] = []
+        ranges_v6: list[tuple[int, int, int]] = []
+        location_index: dict[tuple, int] = {}
+        self.locations: list[dict] = []
+
+        for row in rows:
+            start, end = _parse_bounds(row)
+            if start.version != end.version or int(end) < int(start):
+                raise ValueError(f"Invalid IP range: {row}")
+            location = (
+                (row.get("city") or "").strip() or None,
+                (row.get("country") or "").strip() or None,
+                _to_float(row.get("latitude")),
+                _to_float(row.get("longitude")),
+            )
+            index = location_index.get(location)
+            if index is None:
+                index = location_index[location] = len(self.locations)
+                self.locations.append(
+                    {"city": location[0], "country": location[1], "latitude": location[2], "longitude": location[3]}
+                )
+            target = ranges_v4 if start.version == 4 else ranges_v6
+            target.append((int(start), int(end), index))
+
+        ranges_v4.sort()
+        ranges_v6.sort()
+        self._starts_v4 = array("I", (entry[0] for entry in ranges_v4))
+        self._ends_v4 = array("I", (entry[1] for entry in ranges_v4))
+        self._locations_v4 = array("I", (entry[2] for entry in ranges_v4))
+        self._starts_v6 = [entry[0] for entry in ranges_v6]
+        self._ends_v6 = [entry[1] for entry in ranges_v6]
+        self._locations_v6 = array("I", (entry[2] for entry in ranges_v6))
+
+    @classmethod
+    def from_csv(cls, path: Path) -> IpLocationDatabase:
+        with path.open("r", encoding="utf-8", newline="") as f:
+            return cls(csv.DictReader(f))
+
+    def __len__(self) -> int:
+        return len(self._starts_v4) + len(self._starts_v6)
+
+    def lookup(self, client_ip: str) -> dict | None:
+        try:
+            parsed = ip_address(client_ip)
+        except ValueError:
+            return None
+        if isinstance(parsed, IPv6Address) and parsed.ipv4_mapped is not None:
+            parsed = parsed.ipv4_mapped
+
+        if isinstance(parsed, IPv4Address):
+            starts, ends, locations = self._starts_v4, self._ends_v4, self._locations_v4
+        else:
+            starts, ends, locations = self._starts_v6, self._ends_v6, self._locations_v6
+
+        value = int(parsed)
+        position = bisect_right(starts, value) - 1
+        if position < 0 or value > ends[position]:
+            return None
+        return dict(self.locations[locations[position]])
+
+    def write_csv(self, path: Path) -> None:
+        """Write the normalized, sorted ranges atomically."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with tmp_path.open("w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for starts, ends, locations, address_type in (
+                (self._starts_v4, self._ends_v4, self._locations_v4, IPv4Address),
+                (self._starts_v6, self._ends_v6, self._locations_v6, IPv6Address),
+            ):
+                for start, end, index in zip(starts, ends, locations):
+                    location = self.locations[index]
+                    writer.writerow(
+                        {
+                            "start_ip": str(address_type(start)),
+                            "end_ip": str(address_type(end)),
+                            "city": location["city"] or "",
+                            "country": location["country"] or "",
+                            "latitude": "" if location["latitude"] is None else location["latitude"],
+                            "longitude": "" if location["longitude"] is None else location["longitude"],
+                        }
+                    )
+        os.replace(tmp_path, path)
+
+
+def parse_csv_text(text: str) -> IpLocationDatabase:
+    return IpLocationDatabase(csv.DictReader(io.StringIO(text)))
+
+
+_default_lock = threading.Lock()
+_default_database: IpLocationDatabase | None = None
+_default_stamp: tuple | None = None
+
+
+def database_stamp() -> str:
+    """Identity of the installed database file; changes whenever it is replaced."""
+    try:
+        stat = default_database_path().stat()
+    except FileNotFoundError:
+        return ""
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def get_default_database() -> IpLocationDatabase | None:
+    """Return the on-disk database, reloading it when the file changes."""
+    global _default_database, _default_stamp
+    path = default_database_path()
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    stamp = (str(path), stat.st_mtime_ns, stat.st_size)
+    if stamp != _default_stamp:
+        with _default_lock:
+            if stamp != _default_stamp:
+                _default_database = IpLocationDatabase.from_csv(path)
+                _default_stamp = stamp
+    return _default_database
+
+
+def _parse_bounds(row: dict):
+    network = (row.get("network") or "").strip()
+    if network:
+        parsed = ip_network(network, strict=False)
+        return parsed.network_address, parsed.broadcast_address
+    return ip_address(_normalize_ip(row["start_ip"])), ip_address(_normalize_ip(row["end_ip"]))
+
+
+def _normalize_ip(value) -> str | int:
+    value = str(value).strip()
+    return int(value) if value.isdigit() else value
+
+
+def _to_float(value) -> float | None:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
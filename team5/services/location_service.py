@@ -8,6 +8,12 @@ from ipaddress import ip_address
 from urllib.error import URLError
 from urllib.request import urlopen
 
+from django.conf import settings
+
+from .geo_cache import get_geo_cache
+from .ip_database import database_stamp, get_default_database
+from .spatial_index import SpatialIndex
+
 
 def get_client_ip(request, *, ip_override: str | None = None) -> str | None:
     """Return client IP from query override, X-Forwarded-For or REMOTE_ADDR."""
@@ -25,11 +31,24 @@ def get_client_ip(request, *, ip_override: str | None = None) -> str | None:
     return remote_addr or None
 
 
+_LOOKUP = object()
+
+
+def locate_ip(client_ip: str | None) -> dict | None:
+    """Geolocate `client_ip` through the shared geo cache; None when it cannot be placed."""
+    if not client_ip:
+        return None
+    # Namespacing by the database file drops every worker's cached results once it is refreshed.
+    return get_geo_cache().get_or_resolve(client_ip, _geolocate_ip, namespace=database_stamp())
+
+
 def resolve_client_city(
     *,
     cities: list[dict],
     client_ip: str | None,
     preferred_city_id: str | None = None,
+    city_index: SpatialIndex | None = None,
+    geo: dict | None = _LOOKUP,
 ) -> dict | None:
     """
     Resolve nearest city from IP geolocation, then explicit city fallback.
@@ -38,9 +57,14 @@ def resolve_client_city(
     - city: matching city record from provider
     - source: how city was resolved
     - geo: raw geolocation payload (if available)
+
+    When `city_index` is given, coordinates are matched with a k-nearest query
+    instead of scanning every city. Callers that already ran `locate_ip` pass
+    its result as `geo` to skip the lookup.
     """
+    if geo is _LOOKUP:
+        geo = locate_ip(client_ip)
     if client_ip:
-        geo = _geolocate_ip(client_ip)
         if geo:
             if geo.get("city"):
                 city = _match_city_name(cities, str(geo["city"]))
@@ -50,7 +74,11 @@ def resolve_client_city(
             latitude = _to_float(geo.get("latitude"))
             longitude = _to_float(geo.get("longitude"))
             if latitude is not None and longitude is not None:
-                city = _nearest_city_by_coordinates(cities, latitude=latitude, longitude=longitude)
+                if city_index is not None:
+                    nearest = city_index.nearest(latitude, longitude, k=1)
+                    city = nearest[0][0] if nearest else None
+                else:
+                    city = _nearest_city_by_coordinates(cities, latitude=latitude, longitude=longitude)
                 if city:
                     return {"city": city, "source": "ip_coordinates", "geo": geo}
 
@@ -64,11 +92,12 @@ def resolve_client_city(
 
 def _geolocate_ip(client_ip: str) -> dict | None:
     """
-    Resolve IP to city/coordinates using a public endpoint.
+    Resolve IP to city/coordinates from the offline range database.
 
     Notes:
     - For private/local addresses, return None to avoid misleading results.
-    - Keep timeout short to avoid slowing requests.
+    - The public HTTP endpoint is only queried when the local database misses
+      and TEAM5_GEOIP_HTTP_FALLBACK is set to True (it is off by default).
     """
     try:
         parsed_ip = ip_address(client_ip)
@@ -77,6 +106,19 @@ def _geolocate_ip(client_ip: str) -> dict | None:
     except ValueError:
         return None
 
+    database = get_default_database()
+    if database is not None:
+        geo = database.lookup(client_ip)
+        if geo:
+            return geo
+
+    if not getattr(settings, "TEAM5_GEOIP_HTTP_FALLBACK", False):
+        return None
+    return _geolocate_ip_http(client_ip)
+
+
+def _geolocate_ip_http(client_ip: str) -> dict | None:
+    """Resolve IP using a public endpoint; keep timeout short to avoid slowing requests."""
     url = f"https://ipapi.co/{client_ip}/json/"
     try:
         with urlopen(url, timeout=1.5) as response:
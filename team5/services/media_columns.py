@@ -0,0 +1,117 @@
+"""Array-backed view of the Team5 media catalog for ranking without per-record dicts."""
+
+from bisect import bisect_right
+from typing import Callable
+
+import numpy as np
+
+from .contracts import MediaRecord
+
+
+class MediaColumns:
+    """
+    Parallel arrays over the media catalog, one row per media.
+
+    Ranking and filtering work on numpy columns; `materialize` builds record
+    dicts only for the rows that are finally returned. `place_index` points
+    into `place_ids`, so place and city filters are one boolean gather.
+    """
+
+    __slots__ = (
+        "media_ids",
+        "place_ids",
+        "place_index",
+        "overall_rate",
+        "ratings_count",
+        "_load",
+        "_row_by_id",
+        "_feed_order",
+        "_feed_keys",
+    )
+
+    def __init__(
+        self,
+        *,
+        media_ids: list[str],
+        place_ids: list[str],
+        place_index: np.ndarray,
+        overall_rate: np.ndarray,
+        ratings_count: np.ndarray,
+        load: Callable[[list[int]], list[MediaRecord]],
+    ):
+        self.media_ids = media_ids
+        self.place_ids = place_ids
+        self.place_index = place_index
+        self.overall_rate = overall_rate
+        self.ratings_count = ratings_count
+        self._load = load
+        self._row_by_id: dict[str, int] | None = None
+        self._feed_order: np.ndarray | None = None
+        self._feed_keys: tuple[np.ndarray, np.ndarray, list[str]] | None = None
+
+    @classmethod
+    def from_records(cls, records: list[MediaRecord]) -> "MediaColumns":
+        place_rows: dict[str, int] = {}
+        place_index = np.fromiter(
+            (place_rows.setdefault(item["placeId"], len(place_rows)) for item in records),
+            dtype=np.int32,
+            count=len(records),
+        )
+        return cls(
+            media_ids=[item["mediaId"] for item in records],
+            place_ids=list(place_rows),
+            place_index=place_index,
+            overall_rate=np.fromiter((float(item["overallRate"]) for item in records), np.float64, len(records)),
+            ratings_count=np.fromiter((int(item["ratingsCount"]) for item in records), np.int64, len(records)),
+            load=lambda rows: [dict(records[row]) for row in rows],
+        )
+
+    def __len__(self) -> int:
+        return len(self.media_ids)
+
+    def rows_for(self, media_ids) -> list[int]:
+        """Row numbers of the given media ids, in order, skipping unknown ids."""
+        if self._row_by_id is None:
+            self._row_by_id = {media_id: row for row, media_id in enumerate(self.media_ids)}
+        rows = (self._row_by_id.get(media_id) for media_id in media_ids)
+        return [row for row in rows if row is not None]
+
+    def in_places(self, place_ids: set[str]) -> np.ndarray:
+        """Boolean row mask of media located at any of `place_ids`."""
+        place_mask = np.fromiter((place_id in place_ids for place_id in self.place_ids), bool, len(self.place_ids))
+        return place_mask[self.place_index] if len(self.place_ids) else np.zeros(len(self), dtype=bool)
+
+    def rank(self, mask: np.ndarray | None = None, limit: int | None = None) -> np.ndarray:
+        """Rows ordered by overall rate then ratings count, both descending; ties keep catalog order."""
+        rows = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        order = np.lexsort((-self.ratings_count[rows], -self.overall_rate[rows]))
+        return rows[order[:limit] if limit is not None else order]
+
+    def feed_order(self) -> np.ndarray:
+        """Rows in stable feed order: overall rate and ratings count descending, then media id; sorted once."""
+        if self._feed_order is None:
+            self._feed_order = np.lexsort((np.array(self.media_ids), -self.ratings_count, -self.overall_rate))
+        return self._feed_order
+
+    def feed_position(self, key: tuple[float, int, str]) -> int:
+        """Number of rows at or before `key`, a (-overall rate, -ratings count, media id) feed sort key."""
+        if self._feed_keys is None:
+            order = self.feed_order()
+            self._feed_keys = (
+                -self.overall_rate[order],
+                -self.ratings_count[order],
+                [self.media_ids[row] for row in order],
+            )
+        rates, counts, media_ids = self._feed_keys
+        rate_key, count_key, media_id = key
+        low = int(np.searchsorted(rates, rate_key, side="left"))
+        high = int(np.searchsorted(rates, rate_key, side="right"))
+        low, high = (
+            low + int(np.searchsorted(counts[low:high], count_key, side="left")),
+            low + int(np.searchsorted(counts[low:high], count_key, side="right")),
+        )
+        return bisect_right(media_ids, media_id, low, high)
+
+    def materialize(self, rows) -> list[MediaRecord]:
+        rows = [int(row) for row in rows]
+        return self._load(rows) if rows else []
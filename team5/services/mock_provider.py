@@ -1,38 +1,180 @@
 """Mock data provider backed by JSON files."""
 
 import json
-from functools import lru_cache
+import threading
+from collections.abc import Sequence
 from pathlib import Path
+from types import MappingProxyType
 
+from .catalog_file import CatalogFile, write_catalog_file
 from .contracts import CityRecord, MediaRecord, PlaceRecord
 from .data_provider import DataProvider
+from .media_columns import MediaColumns
+
+CITIES_FILE = "cities.json"
+PLACES_FILE = "city_places.json"
+MEDIA_FILE = "media_items.json"
+SOURCE_FILES = (CITIES_FILE, PLACES_FILE, MEDIA_FILE)
+COMPILED_FILE = "catalog.t5c"
+
+
+def default_mock_data_dir() -> Path:
+    return Path(__file__).resolve().parent.parent / "mock_data"
 
 
 class MockProvider(DataProvider):
+    """
+    Fixture-backed provider that reloads only when its files change.
+
+    Records are handed out as shared read-only views (tuples of frozen dicts
+    that still serialize as JSON), so getters never copy. When a compiled sidecar written by
+    `compile_mock_catalog` matches the current JSON files, it is memory-mapped
+    instead of parsing JSON; records are then built on first access and media
+    columns come straight from the mapping.
+    """
+
     def __init__(self, base_path: Path | None = None):
-        if base_path is None:
-            self.base_path = Path(__file__).resolve().parent.parent / "mock_data"
-        else:
-            self.base_path = base_path
+        self.base_path = base_path or default_mock_data_dir()
+        self._lock = threading.Lock()
+        self._stamp: tuple | None = None
+        self._snapshot: _MockSnapshot | None = None
+
+    def get_cities(self) -> Sequence[CityRecord]:
+        return self._current().cities
+
+    def get_city_places(self, city_id: str) -> Sequence[PlaceRecord]:
+        return self._current().places_by_city.get(city_id, ())
+
+    def get_all_places(self) -> Sequence[PlaceRecord]:
+        return self._current().places
+
+    def get_media(self) -> Sequence[MediaRecord]:
+        return self._current().media
+
+    def get_media_columns(self) -> MediaColumns:
+        return self._current().media_columns
+
+    def is_compiled(self) -> bool:
+        return self._current().compiled is not None
+
+    def _current(self) -> "_MockSnapshot":
+        sources = _source_stamps(self.base_path)
+        compiled_path = self.base_path / COMPILED_FILE
+        compiled_stat = compiled_path.stat() if compiled_path.exists() else None
+        compiled_stamp = (compiled_stat.st_mtime_ns, compiled_stat.st_size) if compiled_stat else None
+        stamp = (tuple(map(tuple, sources.values())), compiled_stamp)
+        if stamp == self._stamp:
+            return self._snapshot
+        with self._lock:
+            if stamp != self._stamp:
+                compiled = CatalogFile(compiled_path) if compiled_stat is not None else None
+                if compiled is not None and (compiled.sources != sources or not compiled.has_user_ratings()):
+                    compiled = None
+                self._snapshot = _MockSnapshot(self.base_path, compiled)
+                self._stamp = stamp
+            return self._snapshot
+
+
+def compile_mock_catalog(base_path: Path | None = None) -> Path:
+    """Write the compiled sidecar for the JSON fixtures in `base_path` and return its path."""
+    base_path = base_path or default_mock_data_dir()
+    sources = _source_stamps(base_path)
+    path = base_path / COMPILED_FILE
+    write_catalog_file(
+        path,
+        cities=_read_json(base_path / CITIES_FILE),
+        places=_read_json(base_path / PLACES_FILE),
+        media=_read_json(base_path / MEDIA_FILE),
+        versions={},
+        sources=sources,
+    )
+    return path
+
+
+class _MockSnapshot:
+    """One loaded version of the fixtures; each record list is built at most once."""
+
+    def __init__(self, base_path: Path, compiled: CatalogFile | None):
+        self.base_path = base_path
+        self.compiled = compiled
+        # Re-entrant: derived views such as places_by_city load their base records while holding it.
+        self._lock = threading.RLock()
+        self._loaded: dict[str, object] = {}
+
+    @property
+    def cities(self) -> tuple:
+        return self._load("cities", lambda: self.compiled.cities() if self.compiled else self._json(CITIES_FILE))
+
+    @property
+    def places(self) -> tuple:
+        return self._load("places", lambda: self.compiled.places() if self.compiled else self._json(PLACES_FILE))
+
+    @property
+    def media(self) -> tuple:
+        return self._load("media", lambda: self.compiled.media() if self.compiled else self._json(MEDIA_FILE))
+
+    @property
+    def places_by_city(self) -> MappingProxyType:
+        def group():
+            grouped: dict[str, list] = {}
+            for place in self.places:
+                grouped.setdefault(place["cityId"], []).append(place)
+            return MappingProxyType({city_id: tuple(places) for city_id, places in grouped.items()})
+
+        return self._load("places_by_city", group, freeze=False)
+
+    @property
+    def media_columns(self) -> MediaColumns:
+        if self.compiled is not None:
+            return self._load("media_columns", self.compiled.media_columns, freeze=False)
+        return self._load("media_columns", lambda: MediaColumns.from_records(self.media), freeze=False)
+
+    def _json(self, name: str) -> list[dict]:
+        return _read_json(self.base_path / name)
+
+    def _load(self, key: str, build, *, freeze: bool = True):
+        value = self._loaded.get(key)
+        if value is None:
+            with self._lock:
+                value = self._loaded.get(key)
+                if value is None:
+                    value = _freeze(build()) if freeze else build()
+                    self._loaded[key] = value
+        return value
+
+
+class _FrozenRecord(dict):
+    """A dict that refuses mutation; `json.dumps` and `dict(record)` still treat it as a plain dict."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Mock provider records are read-only; copy with dict(record) first.")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return dict, (dict(self),)
 
-    def get_cities(self) -> list[CityRecord]:
-        return list(_read_json(self.base_path / "cities.json"))
 
-    def get_city_places(self, city_id: str) -> list[PlaceRecord]:
-        places = self.get_all_places()
-        return [place for place in places if place["cityId"] == city_id]
+def _freeze(value):
+    if isinstance(value, dict):
+        return _FrozenRecord({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
 
-    def get_all_places(self) -> list[PlaceRecord]:
-        return list(_read_json(self.base_path / "city_places.json"))
 
-    def get_media(self) -> list[MediaRecord]:
-        return list(_read_json(self.base_path / "media_items.json"))
+def _source_stamps(base_path: Path) -> dict[str, list[int]]:
+    stamps = {}
+    for name in SOURCE_FILES:
+        stat = (base_path / name).stat()
+        stamps[name] = [stat.st_mtime_ns, stat.st_size]
+    return stamps
 
 
-@lru_cache(maxsize=32)
 def _read_json(path: Path) -> list[dict]:
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+    with path.open("rb") as f:
+        data = json.loads(f.read())
     if not isinstance(data, list):
         raise ValueError(f"Mock JSON file must contain a list: {path}")
     return data
@@ -0,0 +1,153 @@
+"""Request-scoped memoization of Team5 provider reads."""
+
+import threading
+from collections import Counter
+from collections.abc import Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from .contracts import CityRecord, MediaRecord, PlaceRecord
+from .data_provider import AsyncDataProvider, DataProvider
+from .media_columns import MediaColumns
+
+_current_scope: ContextVar["ProviderScope | None"] = ContextVar("team5_provider_scope", default=None)
+
+
+class ProviderScope:
+    """
+    Results of provider reads for one request, and how often each was asked for.
+
+    `calls` counts every read made through a scoped provider; `loads` counts
+    the reads that reached the underlying provider. The scope is shared with
+    worker threads started from the request, so it is guarded by a lock.
+    """
+
+    def __init__(self):
+        self.calls: Counter[str] = Counter()
+        self.loads: Counter[str] = Counter()
+        self._results: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, key: tuple) -> tuple[bool, object]:
+        with self._lock:
+            self.calls[key[0]] += 1
+            if key in self._results:
+                return True, self._results[key]
+            return False, None
+
+    def store(self, key: tuple, value):
+        with self._lock:
+            self.loads[key[0]] += 1
+            return self._results.setdefault(key, value)
+
+    def passthrough(self, name: str) -> None:
+        """Count a read that is never memoized."""
+        with self._lock:
+            self.calls[name] += 1
+            self.loads[name] += 1
+
+    def summary(self) -> str:
+        """`name=loads/calls` for every method read in this scope, e.g. "get_media=1/2"."""
+        return ";".join(f"{name}={self.loads[name]}/{count}" for name, count in sorted(self.calls.items()))
+
+
+def current_scope() -> ProviderScope | None:
+    return _current_scope.get()
+
+
+@contextmanager
+def provider_scope() -> Iterator[ProviderScope]:
+    """Memoize scoped provider reads until the block exits; nested blocks reuse the outer scope."""
+    scope = _current_scope.get()
+    if scope is not None:
+        yield scope
+        return
+    scope = ProviderScope()
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+class ScopedProvider(DataProvider):
+    """
+    Wrap a provider so catalog reads run at most once per `provider_scope`.
+
+    Outside a scope every call goes straight to `provider`. `get_media_by_ids`
+    is never memoized because callers annotate the records it returns. Other
+    attributes, such as `SharedCatalogProvider.current`, are read from the
+    wrapped provider.
+    """
+
+    def __init__(self, provider: DataProvider):
+        self.provider = provider
+
+    def __getattr__(self, name: str):
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    def get_cities(self) -> Sequence[CityRecord]:
+        return self._read(("get_cities",), self.provider.get_cities)
+
+    def get_city_places(self, city_id: str) -> Sequence[PlaceRecord]:
+        return self._read(("get_city_places", city_id), lambda: self.provider.get_city_places(city_id))
+
+    def get_all_places(self) -> Sequence[PlaceRecord]:
+        return self._read(("get_all_places",), self.provider.get_all_places)
+
+    def get_media(self) -> Sequence[MediaRecord]:
+        return self._read(("get_media",), self.provider.get_media)
+
+    def get_media_columns(self) -> MediaColumns:
+        return self._read(("get_media_columns",), self.provider.get_media_columns)
+
+    def get_media_by_ids(self, media_ids: list[str]) -> list[MediaRecord]:
+        scope = _current_scope.get()
+        if scope is not None:
+            scope.passthrough("get_media_by_ids")
+        return self.provider.get_media_by_ids(media_ids)
+
+    def _read(self, key: tuple, load):
+        scope = _current_scope.get()
+        if scope is None:
+            return load()
+        found, value = scope.lookup(key)
+        if found:
+            return value
+        return scope.store(key, load())
+
+
+class ScopedAsyncProvider(AsyncDataProvider):
+    """Async counterpart of `ScopedProvider`; it shares cache keys, so sync and async reads dedupe together."""
+
+    def __init__(self, provider: AsyncDataProvider):
+        self.provider = provider
+
+    def __getattr__(self, name: str):
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    async def get_cities(self) -> Sequence[CityRecord]:
+        return await self._read(("get_cities",), self.provider.get_cities)
+
+    async def get_city_places(self, city_id: str) -> Sequence[PlaceRecord]:
+        return await self._read(("get_city_places", city_id), lambda: self.provider.get_city_places(city_id))
+
+    async def get_all_places(self) -> Sequence[PlaceRecord]:
+        return await self._read(("get_all_places",), self.provider.get_all_places)
+
+    async def get_media(self) -> Sequence[MediaRecord]:
+        return await self._read(("get_media",), self.provider.get_media)
+
+    async def _read(self, key: tuple, load):
+        scope = _current_scope.get()
+        if scope is None:
+            return await load()
+        found, value = scope.lookup(key)
+        if found:
+            return value
+        return scope.store(key, await load())
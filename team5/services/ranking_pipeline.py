@@ -0,0 +1,183 @@
+"""Two-stage candidate generation and re-ranking with per-stage budgets."""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RERANK_STAGE = "rerank"
+
+
+@dataclass(frozen=True)
+class StageBudget:
+    """Most candidates a stage may contribute and how long it may run; None means unbounded."""
+
+    max_items: int | None = None
+    max_ms: float | None = None
+
+
+@dataclass
+class Candidate:
+    media_id: str
+    reason: str
+    score: float
+    extras: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class StageTiming:
+    stage: str
+    elapsed_ms: float
+    produced: int
+    kept: int
+    status: str
+
+
+Clock = Callable[[], float]
+
+
+class Deadline:
+    """Point in time a stage should stop at; sources poll `expired()` inside their loops."""
+
+    __slots__ = ("at", "clock")
+
+    def __init__(self, at: float | None, clock: Clock = time.perf_counter):
+        self.at = at
+        self.clock = clock
+
+    @classmethod
+    def after(
+        cls,
+        budget_ms: float | None,
+        *,
+        within: "Deadline | None" = None,
+        clock: Clock = time.perf_counter,
+    ) -> "Deadline":
+        at = None if budget_ms is None else clock() + budget_ms / 1000.0
+        if within is not None and within.at is not None:
+            at = within.at if at is None else min(at, within.at)
+        return cls(at, clock)
+
+    def expired(self) -> bool:
+        return self.at is not None and self.clock() >= self.at
+
+
+# A source gets the caller's context, its deadline and its item cap, and returns candidates best first.
+CandidateSource = Callable[[Any, Deadline, int], list[Candidate]]
+
+
+@dataclass(frozen=True)
+class PipelineStage:
+    name: str
+    source: CandidateSource
+    budget: StageBudget = StageBudget()
+
+
+class RankingPipeline:
+    """
+    Run capped candidate sources in order, then re-rank their union once.
+
+    Each source sees a deadline that is the earlier of its own budget and the
+    pipeline's; a source that raises is logged and contributes nothing, and
+    sources still waiting when the pipeline budget is spent are skipped. The
+    re-rank stage orders candidates by (reason tier, score desc, overall rate
+    desc, ratings count desc) in one lexsort and keeps each media's best-tier
+    entry. Per-stage timings are logged and passed to `on_timings`. `clock`
+    returns seconds and drives both deadlines and timings.
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[PipelineStage],
+        *,
+        reason_tiers: dict[str, int],
+        total_budget_ms: float | None = None,
+        on_timings: Callable[[list[StageTiming]], None] | None = None,
+        clock: Clock = time.perf_counter,
+    ):
+        self.stages = list(stages)
+        self.reason_tiers = reason_tiers
+        self.total_budget_ms = total_budget_ms
+        self.on_timings = on_timings
+        self.clock = clock
+
+    def run(
+        self,
+        context: Any,
+        *,
+        limit: int,
+        stats: Callable[[str], tuple[float, int]],
+    ) -> tuple[list[Candidate], list[StageTiming]]:
+        """Return up to `limit` ranked candidates and the timing of every stage."""
+        overall = Deadline.after(self.total_budget_ms, clock=self.clock)
+        candidates: list[Candidate] = []
+        timings: list[StageTiming] = []
+
+        for stage in self.stages:
+            if overall.expired():
+                timings.append(StageTiming(stage.name, 0.0, 0, 0, "skipped"))
+                continue
+            cap = limit if stage.budget.max_items is None else min(limit, stage.budget.max_items)
+            deadline = Deadline.after(stage.budget.max_ms, within=overall, clock=self.clock)
+            started = self.clock()
+            status = "ok"
+            try:
+                produced = stage.source(context, deadline, cap) if cap > 0 else []
+            except Exception:
+                logger.exception("team5 candidate source %s failed", stage.name)
+                produced, status = [], "failed"
+            elapsed_ms = (self.clock() - started) * 1000.0
+            kept = produced[:cap]
+            if status == "ok" and deadline.expired():
+                status = "over_budget"
+            elif status == "ok" and len(kept) < len(produced):
+                status = "truncated"
+            candidates.extend(kept)
+            timings.append(StageTiming(stage.name, elapsed_ms, len(produced), len(kept), status))
+
+        started = self.clock()
+        ranked = self.rerank(candidates, limit=limit, stats=stats)
+        elapsed_ms = (self.clock() - started) * 1000.0
+        timings.append(StageTiming(RERANK_STAGE, elapsed_ms, len(candidates), len(ranked), "ok"))
+
+        logger.debug(
+            "team5 pipeline timings: %s",
+            ", ".join(f"{t.stage}={t.elapsed_ms:.2f}ms/{t.kept}/{t.status}" for t in timings),
+        )
+        if self.on_timings is not None:
+            self.on_timings(timings)
+        return ranked, timings
+
+    def rerank(
+        self,
+        candidates: list[Candidate],
+        *,
+        limit: int,
+        stats: Callable[[str], tuple[float, int]],
+    ) -> list[Candidate]:
+        if not candidates:
+            return []
+        size = len(candidates)
+        unknown_tier = max(self.reason_tiers.values(), default=0) + 1
+        tier = np.fromiter((self.reason_tiers.get(c.reason, unknown_tier) for c in candidates), np.int64, size)
+        score = np.fromiter((c.score for c in candidates), np.float64, size)
+        media_stats = [stats(c.media_id) for c in candidates]
+        overall_rate = np.fromiter((rate for rate, _ in media_stats), np.float64, size)
+        ratings_count = np.fromiter((count for _, count in media_stats), np.int64, size)
+        order = np.lexsort((-ratings_count, -overall_rate, -score, tier))
+
+        ranked: list[Candidate] = []
+        seen: set[str] = set()
+        for index in order:
+            candidate = candidates[index]
+            if candidate.media_id in seen:
+                continue
+            seen.add(candidate.media_id)
+            ranked.append(candidate)
+            if len(ranked) >= limit:
+                break
+        return ranked
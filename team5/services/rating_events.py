@@ -0,0 +1,84 @@
+"""Derived-state updates that follow Team5 rating writes."""
+
+from dataclasses import replace
+from typing import Iterable
+
+from django.db import router, transaction
+
+from team5.models import Team5MediaRating, Team5UserFeed
+
+from . import data_versions, interest_service
+from .db_provider import DatabaseProvider
+from .embedding_store import EmbeddingStore
+from .feed_service import FeedService
+from .recommendation_service import RecommendationService, pipeline_budgets_from_settings
+from .trending_service import TrendingCounter, rating_weight
+
+_feed_service: FeedService | None = None
+trending_counter = TrendingCounter()
+
+
+def get_feed_service() -> FeedService:
+    """Feed builder shared by rating writes and `build_team5_feeds`; offline, so no stage runs on a clock."""
+    global _feed_service
+    if _feed_service is None:
+        untimed = {
+            name: replace(budget, max_ms=None) for name, budget in pipeline_budgets_from_settings().items()
+        }
+        _feed_service = FeedService(
+            RecommendationService(
+                DatabaseProvider(),
+                embedding_store=EmbeddingStore(),
+                stage_budgets=untimed,
+                pipeline_budget_ms=None,
+            )
+        )
+    return _feed_service
+
+
+def ratings_changed(
+    ratings: Iterable[Team5MediaRating],
+    *,
+    previous_rates: dict[tuple[str, str], float] | None = None,
+    deleted: bool = False,
+    refresh_feeds: bool = True,
+    using: str | None = None,
+) -> None:
+    """
+    Apply one batch of rating writes (or deletes) made on the `using` alias.
+
+    Written ratings feed the trending counters, and `previous_rates` maps
+    (str(user_id), media_id) to the rate each row held before the write, so
+    interest counters only move for ratings that crossed the threshold.
+    Affected users' stored feeds are dropped right away so reads fall back to
+    live computation; the ratings version bump and, unless `refresh_feeds` is
+    False, the feed rebuilds run once the write transaction commits, so the
+    rebuilds never hold its locks.
+    """
+    ratings = list(ratings)
+    if not ratings:
+        return
+    using = using or router.db_for_write(Team5MediaRating, instance=ratings[0])
+    user_ids = {rating.user_id for rating in ratings}
+    transaction.on_commit(lambda: data_versions.bump_version(data_versions.RATINGS), using=using)
+    if deleted:
+        interest_service.apply_rating_changes(
+            (rating.user_id, rating.media_id, rating.rate, None) for rating in ratings
+        )
+    else:
+        previous_rates = previous_rates or {}
+        interest_service.apply_rating_changes(
+            (rating.user_id, rating.media_id, previous_rates.get((str(rating.user_id), rating.media_id)), rating.rate)
+            for rating in ratings
+        )
+        trending_counter.record((rating.media_id, rating_weight(rating.rate)) for rating in ratings)
+    Team5UserFeed.objects.filter(user_id__in=user_ids).delete()
+    if refresh_feeds:
+        transaction.on_commit(lambda: _rebuild_feeds(user_ids), using=using)
+
+
+def _rebuild_feeds(user_ids) -> None:
+    feed_service = get_feed_service()
+    version = feed_service.current_version()
+    for user_id in user_ids:
+        feed_service.rebuild(str(user_id), version=version)
@@ -0,0 +1,167 @@
+"""Batched upserts of Team5 media ratings."""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+from uuid import UUID
+
+from django.db import connections, transaction
+
+from team5.models import Team5Media, Team5MediaRating
+
+from .contracts import LIKED_MIN_RATE, RATE_MAX, RATE_MIN
+from .rating_events import ratings_changed
+from .rating_shards import alias_for_user
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class RatingInput:
+    user_id: UUID
+    media_id: str
+    rate: float
+    user_email: str = ""
+
+
+@dataclass
+class IngestionResult:
+    received: int = 0
+    upserted: int = 0
+    batches: int = 0
+    errors: list[dict] | None = None
+
+    def as_dict(self) -> dict:
+        return {
+            "received": self.received,
+            "upserted": self.upserted,
+            "batches": self.batches,
+            "errors": self.errors or [],
+        }
+
+
+def parse_rating(payload) -> RatingInput:
+    """Validate one {userId, mediaId, rate, userEmail?} payload, raising ValueError on bad input."""
+    if not isinstance(payload, dict):
+        raise ValueError("rating must be an object")
+    try:
+        user_id = UUID(str(payload.get("userId")))
+    except ValueError as exc:
+        raise ValueError("userId must be a UUID") from exc
+    media_id = str(payload.get("mediaId") or "").strip()
+    if not media_id:
+        raise ValueError("mediaId is required")
+    try:
+        rate = float(payload.get("rate"))
+    except (TypeError, ValueError) as exc:
+        raise ValueError("rate must be a number") from exc
+    if not RATE_MIN <= rate <= RATE_MAX:
+        raise ValueError(f"rate must be between {RATE_MIN} and {RATE_MAX}")
+    return RatingInput(
+        user_id=user_id,
+        media_id=media_id,
+        rate=rate,
+        user_email=str(payload.get("userEmail") or "").strip(),
+    )
+
+
+def upsert_ratings(
+    payloads: Iterable,
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    refresh_feeds: bool = False,
+    on_batch=None,
+) -> IngestionResult:
+    """
+    Upsert rating payloads in batches, one transaction and one INSERT ... ON CONFLICT per batch.
+
+    Invalid rows and rows for unknown media are reported in `errors` with their
+    position and skipped. Derived state is updated once per batch through
+    `ratings_changed`. Affected users' stored feeds are only dropped, and
+    `build_team5_feeds --stale-only` rebuilds them. Pass `refresh_feeds=True` to
+    rebuild them after each batch commits instead; each rebuild reads the full catalog.
+    """
+    result = IngestionResult(errors=[])
+    for batch in _batched(payloads, batch_size):
+        parsed: dict[tuple[UUID, str], RatingInput] = {}
+        positions: dict[tuple[UUID, str], int] = {}
+        for position, payload in batch:
+            result.received += 1
+            try:
+                rating = parse_rating(payload)
+            except ValueError as exc:
+                result.errors.append({"index": position, "detail": str(exc)})
+                continue
+            key = (rating.user_id, rating.media_id)
+            parsed[key] = rating
+            positions[key] = position
+
+        known_media = set(
+            Team5Media.objects.filter(media_id__in={media_id for _, media_id in parsed}).values_list(
+                "media_id", flat=True
+            )
+        )
+        rows = []
+        for key, rating in parsed.items():
+            if rating.media_id not in known_media:
+                result.errors.append({"index": positions[key], "detail": f"unknown mediaId {rating.media_id}"})
+                continue
+            rows.append(
+                Team5MediaRating(
+                    user_id=rating.user_id,
+                    user_email=rating.user_email,
+                    media_id=rating.media_id,
+                    rate=rating.rate,
+                    liked=rating.rate >= LIKED_MIN_RATE,
+                )
+            )
+        if not rows:
+            continue
+
+        rows_by_alias: dict[str, list[Team5MediaRating]] = defaultdict(list)
+        for row in rows:
+            rows_by_alias[alias_for_user(row.user_id)].append(row)
+        for alias, shard_rows in rows_by_alias.items():
+            _upsert_shard(alias, shard_rows, refresh_feeds=refresh_feeds)
+
+        result.upserted += len(rows)
+        result.batches += 1
+        if on_batch is not None:
+            on_batch(result)
+    result.errors.sort(key=lambda error: error["index"])
+    return result
+
+
+def _upsert_shard(alias: str, rows: list[Team5MediaRating], *, refresh_feeds: bool) -> None:
+    # MySQL upserts via ON DUPLICATE KEY and rejects an explicit conflict target.
+    unique_fields = (
+        ["user_id", "media_id"] if connections[alias].features.supports_update_conflicts_with_target else None
+    )
+    ratings = Team5MediaRating.objects.using(alias)
+    with transaction.atomic(using=alias):
+        previous_rates = {
+            (str(user_id), media_id): rate
+            for user_id, media_id, rate in ratings.filter(
+                user_id__in={row.user_id for row in rows},
+                media_id__in={row.media_id for row in rows},
+            ).values_list("user_id", "media_id", "rate")
+        }
+        ratings.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=["user_email", "rate", "liked", "updated_at"],
+        )
+        # Opt-in feed rebuilds wait for this shard's commit, so they never hold its write lock.
+        ratings_changed(rows, previous_rates=previous_rates, refresh_feeds=refresh_feeds, using=alias)
+
+
+def _batched(payloads: Iterable, size: int) -> Iterator[list[tuple[int, object]]]:
+    batch: list[tuple[int, object]] = []
+    for position, payload in enumerate(payloads):
+        batch.append((position, payload))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,69 @@
+"""Placement of Team5 ratings across hash-sharded database aliases."""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, TypeVar
+from uuid import UUID
+
+from django.db import connections, router
+from django.db.models import QuerySet
+
+from core.db_router import shard_aliases, shard_for_key
+from team5.models import Team5MediaRating
+
+T = TypeVar("T")
+
+
+def rating_aliases() -> list[str]:
+    """Every alias that stores ratings: the configured shards, or the single team5 alias."""
+    return shard_aliases(Team5MediaRating) or [router.db_for_write(Team5MediaRating)]
+
+
+def is_sharded() -> bool:
+    """Whether ratings live on shard aliases, even a single one, rather than on the team5 alias with the catalog."""
+    return bool(shard_aliases(Team5MediaRating))
+
+
+def alias_for_user(user_id: UUID) -> str:
+    """Alias holding all of one user's ratings."""
+    return shard_for_key(Team5MediaRating, user_id) or router.db_for_write(Team5MediaRating)
+
+
+def user_ratings(user_id: UUID) -> QuerySet:
+    """Ratings of one user, read from that user's shard only."""
+    return Team5MediaRating.objects.using(alias_for_user(user_id)).filter(user_id=user_id)
+
+
+def group_by_alias(user_ids: Iterable[UUID]) -> dict[str, list[UUID]]:
+    grouped: dict[str, list[UUID]] = defaultdict(list)
+    for user_id in user_ids:
+        grouped[alias_for_user(user_id)].append(user_id)
+    return dict(grouped)
+
+
+def scatter(query: Callable[[str], T], aliases: list[str] | None = None) -> list[T]:
+    """
+    Run `query(alias)` on every rating alias and return the results in alias order.
+
+    Shards are queried in parallel threads, each on its own connection, which
+    is closed when its query finishes. A single alias runs inline so it keeps
+    the caller's connection and transaction.
+    """
+    aliases = aliases if aliases is not None else rating_aliases()
+    if len(aliases) <= 1:
+        return [query(alias) for alias in aliases]
+
+    def run(alias: str) -> T:
+        try:
+            return query(alias)
+        finally:
+            connections[alias].close()
+
+    with ThreadPoolExecutor(max_workers=len(aliases), thread_name_prefix="team5-shard") as pool:
+        return list(pool.map(run, aliases))
+
+
+def iter_all_ratings(*fields: str, chunk_size: int = 5000) -> Iterator[tuple]:
+    """Stream `fields` of every rating, one shard after another, with server-side chunking."""
+    for alias in rating_aliases():
+        yield from Team5MediaRating.objects.using(alias).values_list(*fields).iterator(chunk_size=chunk_size)
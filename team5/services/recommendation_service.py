@@ -1,18 +1,65 @@
 """Recommendation scoring for popular and personalized feeds."""
 
+import base64
+import json
 from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Iterator
 from uuid import UUID
 
+import numpy as np
+from django.conf import settings
+
 from .contracts import (
     DEFAULT_LIMIT,
+    PIPELINE_TOTAL_BUDGET_MS,
+    RATINGS_QUERY_CHUNK,
     PERSONALIZED_MIN_USER_RATE,
     POPULAR_MIN_OVERALL_RATE,
     POPULAR_MIN_VOTES,
     MediaRecord,
     PlaceRecord,
 )
+from . import data_versions, interest_service, rating_shards
 from .data_provider import DataProvider
-from team5.models import Team5MediaRating
+from .embedding_store import EmbeddingStore
+from .media_columns import MediaColumns
+from .ranking_pipeline import Candidate, Deadline, PipelineStage, RankingPipeline, StageBudget, StageTiming
+from .spatial_index import SpatialIndex
+from .trending_service import TrendingCounter
+from team5.models import Team5MediaNeighbor, Team5MediaRating, Team5UserInterest
+
+
+FEED_MATERIALIZE_CHUNK = 500
+DEADLINE_CHECK_EVERY = 256
+SAME_CITY_SCORE = 1.5
+
+# Re-rank order of candidate reasons; a media found by several sources keeps its best tier.
+REASON_TIERS = {
+    "high_user_rating": 0,
+    "predicted_interest": 1,
+    "similar_ratings": 2,
+    "similar_topic": 3,
+    "same_city": 4,
+    "popular": 5,
+}
+DEFAULT_STAGE_BUDGETS = {
+    "liked": StageBudget(),
+    "predicted": StageBudget(max_ms=50.0),
+    "similar": StageBudget(max_items=10, max_ms=50.0),
+    "same_city": StageBudget(max_items=10, max_ms=25.0),
+    "popular": StageBudget(max_items=10, max_ms=25.0),
+}
+# Default for `pipeline_budget_ms`: read TEAM5_PIPELINE_BUDGET_MS; an explicit None means no overall budget.
+BUDGET_FROM_SETTINGS = object()
+
+
+def pipeline_budgets_from_settings() -> dict[str, StageBudget]:
+    """Default stage budgets overlaid with TEAM5_PIPELINE_BUDGETS, e.g. {"similar": {"max_items": 5}}."""
+    budgets = dict(DEFAULT_STAGE_BUDGETS)
+    for name, overrides in getattr(settings, "TEAM5_PIPELINE_BUDGETS", {}).items():
+        budgets[name] = StageBudget(**{**budgets.get(name, StageBudget()).__dict__, **overrides})
+    return budgets
 
 
 class RecommendationService:
@@ -23,70 +70,298 @@ class RecommendationService:
         popular_min_overall_rate: float = POPULAR_MIN_OVERALL_RATE,
         popular_min_votes: int = POPULAR_MIN_VOTES,
         personalized_min_user_rate: float = PERSONALIZED_MIN_USER_RATE,
+        embedding_store: EmbeddingStore | None = None,
+        trending_counter: TrendingCounter | None = None,
+        stage_budgets: dict[str, StageBudget] | None = None,
+        pipeline_budget_ms: float | None | object = BUDGET_FROM_SETTINGS,
+        on_pipeline_timings: Callable[[list[StageTiming]], None] | None = None,
     ):
         self.provider = provider
+        self.embedding_store = embedding_store
+        self.trending_counter = trending_counter or TrendingCounter()
         self.popular_min_overall_rate = popular_min_overall_rate
         self.popular_min_votes = popular_min_votes
         self.personalized_min_user_rate = personalized_min_user_rate
+        self._spatial_indexes: dict[str, tuple[int, SpatialIndex]] = {}
+        self._feed_snapshot: tuple[str, MediaColumns] | None = None
+        self.pipeline = self._build_pipeline(
+            stage_budgets if stage_budgets is not None else pipeline_budgets_from_settings(),
+            getattr(settings, "TEAM5_PIPELINE_BUDGET_MS", PIPELINE_TOTAL_BUDGET_MS)
+            if pipeline_budget_ms is BUDGET_FROM_SETTINGS
+            else pipeline_budget_ms,
+            on_pipeline_timings,
+        )
 
     def get_popular(self, limit: int = DEFAULT_LIMIT) -> list[MediaRecord]:
-        media = [dict(item) for item in self.provider.get_media()]
-        filtered = [
-            item
-            for item in media
-            if float(item["overallRate"]) >= self.popular_min_overall_rate
-            and int(item["ratingsCount"]) >= self.popular_min_votes
-        ]
-        filtered.sort(key=lambda item: (float(item["overallRate"]), int(item["ratingsCount"])), reverse=True)
-        return filtered[:limit]
+        columns = self.provider.get_media_columns()
+        mask = (columns.overall_rate >= self.popular_min_overall_rate) & (
+            columns.ratings_count >= self.popular_min_votes
+        )
+        return columns.materialize(columns.rank(mask, limit))
 
-    def get_nearest_by_city(self, city_id: str, limit: int = DEFAULT_LIMIT) -> list[MediaRecord]:
-        place_by_id = {place["placeId"]: place for place in self.provider.get_all_places()}
-        items: list[dict] = []
+    def get_trending(self, limit: int = DEFAULT_LIMIT) -> list[MediaRecord]:
+        """Return media ranked by time-decayed rating activity, hottest first."""
+        ranked = self.trending_counter.top(limit)
+        if not ranked:
+            return []
+        score_by_id = {media_id: score for media_id, score, _events in ranked}
+        items = self.provider.get_media_by_ids(list(score_by_id))
+        for item in items:
+            item["matchReason"] = "trending"
+            item["trendScore"] = round(score_by_id[item["mediaId"]], 4)
+        return items
 
-        for media in self.provider.get_media():
-            place = place_by_id.get(media["placeId"])
-            if not place or place["cityId"] != city_id:
-                continue
-            item = dict(media)
+    def get_nearest_by_city(self, city_id: str, limit: int = DEFAULT_LIMIT) -> list[MediaRecord]:
+        place_ids = {place["placeId"] for place in self.provider.get_city_places(city_id)}
+        columns = self.provider.get_media_columns()
+        items = columns.materialize(columns.rank(columns.in_places(place_ids), limit))
+        for item in items:
             item["matchReason"] = "your_nearest"
-            items.append(item)
+        return items
+
+    def get_nearest_places(self, latitude: float, longitude: float, k: int) -> list[dict]:
+        return [
+            {**place, "distanceKm": round(distance, 3)}
+            for place, distance in self.get_spatial_index("places").nearest(latitude, longitude, k)
+        ]
 
-        items.sort(key=lambda item: (float(item["overallRate"]), int(item["ratingsCount"])), reverse=True)
-        return items[:limit]
+    def get_nearest_by_coordinates(
+        self,
+        latitude: float,
+        longitude: float,
+        *,
+        k: int,
+        limit: int = DEFAULT_LIMIT,
+    ) -> tuple[list[dict], list[MediaRecord]]:
+        """Return the k nearest places and their media, closest place first."""
+        places = self.get_nearest_places(latitude, longitude, k)
+        distance_by_place = {place["placeId"]: place["distanceKm"] for place in places}
+        columns = self.provider.get_media_columns()
+        place_distance = np.array(
+            [distance_by_place.get(place_id, np.inf) for place_id in columns.place_ids], dtype=np.float64
+        )
+        distance = place_distance[columns.place_index] if len(place_distance) else np.empty(0)
+        rows = np.flatnonzero(np.isfinite(distance))
+        order = np.lexsort((-columns.ratings_count[rows], -columns.overall_rate[rows], distance[rows]))
+        items = columns.materialize(rows[order[:limit]])
+        for item in items:
+            item["matchReason"] = "nearest_place"
+            item["distanceKm"] = distance_by_place[item["placeId"]]
+        return places, items
+
+    def get_spatial_index(self, kind: str) -> SpatialIndex:
+        """Return the k-d tree over "cities" or "places", rebuilt when the catalog version changes."""
+        version = data_versions.get_version(data_versions.CATALOG)
+        cached = self._spatial_indexes.get(kind)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        records = self.provider.get_cities() if kind == "cities" else self.provider.get_all_places()
+        index = SpatialIndex(records)
+        self._spatial_indexes[kind] = (version, index)
+        return index
 
     def get_personalized(self, user_id: str, limit: int = DEFAULT_LIMIT) -> list[MediaRecord]:
-        media = [dict(item) for item in self.provider.get_media()]
-        media_by_id = {item["mediaId"]: item for item in media}
-        scored: list[tuple[float, float, int, dict]] = []
+        catalog = _CatalogSnapshot(self.provider.get_media(), self.provider.get_all_places)
         ratings_by_media = self._get_db_ratings_by_media(user_id)
+        return self._personalize(user_id, ratings_by_media, catalog, limit=limit)
 
-        for item in media_by_id.values():
-            user_rate = ratings_by_media.get(item["mediaId"])
-            if user_rate is None or user_rate < self.personalized_min_user_rate:
-                continue
-            item["userRate"] = user_rate
-            item["matchReason"] = "high_user_rating"
-            scored.append((user_rate, float(item["overallRate"]), int(item["ratingsCount"]), item))
+    def iter_personalized_batch(
+        self,
+        user_ids: list[str],
+        limit: int = DEFAULT_LIMIT,
+    ) -> Iterator[tuple[str, list[MediaRecord]]]:
+        """
+        Yield (user id, personalized items) for many users.
+
+        The catalog is read once, every user's ratings come from one query per chunk
+        of ids, neighbour lists for all liked media from one query, and embedding
+        scores for all users from blocked matrix products.
+        """
+        catalog = _CatalogSnapshot(self.provider.get_media(), self.provider.get_all_places)
+        user_uuids = {user_id: _parse_uuid(user_id) for user_id in user_ids}
+        ratings_by_user = self._get_db_ratings_by_user({uuid for uuid in user_uuids.values() if uuid})
+
+        seed_media_ids = {
+            media_id
+            for ratings in ratings_by_user.values()
+            for media_id, rate in ratings.items()
+            if rate >= self.personalized_min_user_rate
+        }
+        neighbors = self._load_neighbors(seed_media_ids)
+
+        predicted: dict[str, list[tuple[str, float]]] = {}
+        if self.embedding_store is not None:
+            predicted = self.embedding_store.score_media_batch(
+                [str(uuid) for uuid in user_uuids.values() if uuid],
+                limit=limit,
+                excluded_media_ids={str(uuid): set(ratings) for uuid, ratings in ratings_by_user.items()},
+            )
+
+        for user_id, user_uuid in user_uuids.items():
+            ratings_by_media = ratings_by_user.get(user_uuid, {}) if user_uuid else {}
+            yield user_id, self._personalize(
+                user_id,
+                ratings_by_media,
+                catalog,
+                limit=limit,
+                neighbors=neighbors,
+                predicted=predicted.get(str(user_uuid), []) if user_uuid else [],
+            )
+
+    def _personalize(
+        self,
+        user_id: str,
+        ratings_by_media: dict[str, float],
+        catalog: "_CatalogSnapshot",
+        *,
+        limit: int,
+        neighbors: dict[str, list[tuple[str, float]]] | None = None,
+        predicted: list[tuple[str, float]] | None = None,
+    ) -> list[MediaRecord]:
+        liked = [
+            (media_id, user_rate)
+            for media_id, user_rate in sorted(ratings_by_media.items())
+            if user_rate >= self.personalized_min_user_rate and media_id in catalog.media_by_id
+        ]
+        liked.sort(key=lambda data: (data[1], *catalog.stats(data[0])), reverse=True)
+        request = _PersonalizeRequest(
+            user_id=user_id,
+            ratings_by_media=ratings_by_media,
+            catalog=catalog,
+            seeds=liked[:limit],
+            neighbors=neighbors,
+            predicted=predicted,
+        )
+        ranked, _ = self.pipeline.run(request, limit=limit, stats=catalog.stats)
+        items = []
+        for candidate in ranked:
+            item = dict(catalog.media_by_id[candidate.media_id])
+            item.update(candidate.extras)
+            item["matchReason"] = candidate.reason
+            items.append(item)
+        return items
+
+    def _build_pipeline(
+        self,
+        budgets: dict[str, StageBudget],
+        total_budget_ms: float | None,
+        on_timings,
+    ) -> RankingPipeline:
+        sources = {
+            "liked": self._liked_candidates,
+            "predicted": self._predicted_candidates,
+            "similar": self._similar_candidates,
+            "same_city": self._same_city_candidates,
+            "popular": self._popular_candidates,
+        }
+        return RankingPipeline(
+            [PipelineStage(name, source, budgets.get(name, StageBudget())) for name, source in sources.items()],
+            reason_tiers=REASON_TIERS,
+            total_budget_ms=total_budget_ms,
+            on_timings=on_timings,
+        )
 
-        scored.sort(key=lambda data: (data[0], data[1], data[2]), reverse=True)
-        base_items = [entry[3] for entry in scored[:limit]]
+    def _liked_candidates(self, request: "_PersonalizeRequest", deadline: Deadline, cap: int) -> list[Candidate]:
+        return [
+            Candidate(media_id, "high_user_rating", user_rate, {"userRate": user_rate})
+            for media_id, user_rate in request.seeds[:cap]
+        ]
 
-        similar_items = self.get_similar_items(
-            user_id=user_id,
-            based_on_items=base_items,
-            excluded_media_ids={item["mediaId"] for item in base_items},
-            limit=max(1, min(limit, 10)),
+    def _predicted_candidates(
+        self, request: "_PersonalizeRequest", deadline: Deadline, cap: int
+    ) -> list[Candidate]:
+        predicted = request.predicted
+        if predicted is None:
+            if self.embedding_store is None:
+                return []
+            predicted = self.embedding_store.score_media(
+                request.user_id, limit=cap, excluded_media_ids=set(request.ratings_by_media)
+            )
+        return [
+            Candidate(media_id, "predicted_interest", score, {"predictedScore": round(score, 4)})
+            for media_id, score in predicted[:cap]
+            if media_id in request.catalog.media_by_id
+        ]
+
+    def _similar_candidates(self, request: "_PersonalizeRequest", deadline: Deadline, cap: int) -> list[Candidate]:
+        """Neighbour-list matches of the liked media, then keyword matches when those run short."""
+        if not request.seeds:
+            return []
+        seed_ids = {media_id for media_id, _ in request.seeds}
+        neighbors = request.neighbors if request.neighbors is not None else self._load_neighbors(seed_ids)
+        ranked = self._rank_neighbors(
+            request.catalog,
+            seeds=request.seeds,
+            neighbors=neighbors,
+            excluded_media_ids=seed_ids,
+            limit=cap,
         )
+        output = [Candidate(media_id, "similar_ratings", score) for media_id, score in ranked]
+        if len(output) < cap and not deadline.expired():
+            excluded = seed_ids | {media_id for media_id, _ in ranked}
+            output.extend(
+                Candidate(media_id, reason, score)
+                for media_id, score, reason in self._rank_heuristic(
+                    request.catalog,
+                    seed_ids=seed_ids,
+                    excluded_media_ids=excluded,
+                    limit=cap - len(output),
+                    deadline=deadline,
+                )
+            )
+        return output
 
-        merged = list(base_items)
-        for item in similar_items:
-            if len(merged) >= limit:
-                break
-            merged.append(item)
-        return merged[:limit]
+    def _same_city_candidates(
+        self, request: "_PersonalizeRequest", deadline: Deadline, cap: int
+    ) -> list[Candidate]:
+        """Best-rated media in the cities of the liked media."""
+        if not request.seeds:
+            return []
+        catalog = request.catalog
+        seed_ids = {media_id for media_id, _ in request.seeds}
+        city_ids = {catalog.city_by_media.get(media_id) for media_id in seed_ids} - {None}
+        if not city_ids:
+            return []
+        columns = self.provider.get_media_columns()
+        place_ids = {place_id for place_id, city_id in catalog.city_by_place.items() if city_id in city_ids}
+        rows = columns.rank(columns.in_places(place_ids), cap + len(seed_ids))
+        return [
+            Candidate(media_id, "same_city", SAME_CITY_SCORE + float(columns.overall_rate[row]) / 10.0)
+            for row in rows
+            if (media_id := columns.media_ids[row]) not in seed_ids and media_id in catalog.media_by_id
+        ][:cap]
+
+    def _popular_candidates(self, request: "_PersonalizeRequest", deadline: Deadline, cap: int) -> list[Candidate]:
+        """Popular media to fill short lists; users without liked media fall back to popular in the views."""
+        if not request.seeds:
+            return []
+        seed_ids = {media_id for media_id, _ in request.seeds}
+        return [
+            Candidate(item["mediaId"], "popular", float(item["overallRate"]))
+            for item in self.get_popular(limit=cap + len(seed_ids))
+            if item["mediaId"] not in seed_ids and item["mediaId"] in request.catalog.media_by_id
+        ][:cap]
+
+    def get_user_interest_distribution(self, user_id: str, *, top: int | None = None) -> dict:
+        """
+        Return the user's city and place interest counts, largest first.
+
+        Counters are maintained on rating writes at PERSONALIZED_MIN_USER_RATE;
+        a service configured with another threshold recounts from the catalog.
+        """
+        if self.personalized_min_user_rate != PERSONALIZED_MIN_USER_RATE:
+            return self._scan_user_interests(user_id, top=top)
+        user_uuid = _parse_uuid(user_id)
+        if user_uuid is None:
+            return {"userId": user_id, "cityInterests": [], "placeInterests": []}
+        interests = interest_service.get_user_interests(user_uuid, top=top)
+        return _interest_payload(
+            user_id,
+            interests[Team5UserInterest.KIND_CITY],
+            interests[Team5UserInterest.KIND_PLACE],
+        )
 
-    def get_user_interest_distribution(self, user_id: str) -> dict:
+    def _scan_user_interests(self, user_id: str, *, top: int | None) -> dict:
         place_by_id = {place["placeId"]: place for place in self.provider.get_all_places()}
         city_counts: dict[str, int] = defaultdict(int)
         place_counts: dict[str, int] = defaultdict(int)
@@ -104,28 +379,21 @@ class RecommendationService:
             if place:
                 city_counts[place["cityId"]] += 1
 
-        return {
-            "userId": user_id,
-            "cityInterests": [
-                {"cityId": city_id, "count": count}
-                for city_id, count in sorted(city_counts.items(), key=lambda item: item[1], reverse=True)
-            ],
-            "placeInterests": [
-                {"placeId": place_id, "count": count}
-                for place_id, count in sorted(place_counts.items(), key=lambda item: item[1], reverse=True)
-            ],
-        }
+        def ranked(counts: dict[str, int]) -> list[tuple[str, int]]:
+            return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:top]
+
+        return _interest_payload(user_id, ranked(city_counts), ranked(place_counts))
 
     def get_place_lookup(self) -> dict[str, PlaceRecord]:
         return {place["placeId"]: place for place in self.provider.get_all_places()}
 
     def get_user_ratings(self, user_id: str) -> list[dict]:
-        media_by_id = {item["mediaId"]: item for item in self.provider.get_media()}
         user_uuid = _parse_uuid(user_id)
         if user_uuid is None:
             return []
 
-        ratings = Team5MediaRating.objects.filter(user_id=user_uuid).order_by("-rate", "-updated_at")
+        ratings = list(rating_shards.user_ratings(user_uuid).order_by("-rate", "-updated_at"))
+        media_by_id = {item["mediaId"]: item for item in self.provider.get_media_by_ids([r.media_id for r in ratings])}
         return [
             {
                 "userId": str(r.user_id),
@@ -140,27 +408,17 @@ class RecommendationService:
         ]
 
     def get_media_feed(self, user_id: str | None = None) -> dict:
-        items = [dict(item) for item in self.provider.get_media()]
-
-        rated_high: list[dict] = []
-        rated_low: list[dict] = []
-        user_ratings_map = self._get_db_ratings_by_media(user_id) if user_id else {}
-
-        for item in items:
-            user_rate = None
-            if user_id:
-                user_rate = user_ratings_map.get(item["mediaId"])
-            if user_rate is not None:
-                item["userRate"] = float(user_rate)
-                item["liked"] = float(user_rate) >= self.personalized_min_user_rate
-                if item["liked"]:
-                    rated_high.append(item)
-                else:
-                    rated_low.append(item)
-
-        items.sort(key=lambda data: (float(data["overallRate"]), int(data["ratingsCount"])), reverse=True)
-        rated_high.sort(key=lambda data: float(data["userRate"]), reverse=True)
-        rated_low.sort(key=lambda data: float(data["userRate"]))
+        """Whole media feed in feed order, built from the sorted catalog columns, plus the user's rated splits."""
+        items = list(self.iter_media_feed(user_id))
+        rated_high = sorted(
+            (item for item in items if item.get("liked")),
+            key=lambda data: float(data["userRate"]),
+            reverse=True,
+        )
+        rated_low = sorted(
+            (item for item in items if "userRate" in item and not item["liked"]),
+            key=lambda data: float(data["userRate"]),
+        )
 
         return {
             "userId": user_id,
@@ -170,6 +428,58 @@ class RecommendationService:
             "ratedLow": rated_low,
         }
 
+    def get_media_page(
+        self,
+        user_id: str | None = None,
+        *,
+        cursor: str | None = None,
+        page_size: int = DEFAULT_LIMIT,
+    ) -> dict:
+        """Return one page of the media feed and the cursor of the next page."""
+        items = list(self.iter_media_feed(user_id, cursor=cursor, limit=page_size + 1))
+        next_cursor = encode_media_cursor(items[page_size - 1]) if len(items) > page_size else None
+        items = items[:page_size]
+        return {"userId": user_id, "count": len(items), "items": items, "nextCursor": next_cursor}
+
+    def iter_media_feed(
+        self,
+        user_id: str | None = None,
+        *,
+        cursor: str | None = None,
+        limit: int | None = None,
+    ) -> Iterator[dict]:
+        """
+        Yield media in stable feed order (overall rate, ratings count, then media id).
+
+        The sorted catalog columns are kept until the catalog or ratings version
+        changes, so a page costs a binary search for `cursor` plus the rows it
+        returns; item dicts are materialized in chunks as they are yielded.
+        """
+        columns = self._feed_columns()
+        order = columns.feed_order()
+        start = columns.feed_position(decode_media_cursor(cursor)) if cursor else 0
+        stop = len(order) if limit is None else min(len(order), start + limit)
+
+        user_ratings_map = self._get_db_ratings_by_media(user_id) if user_id else {}
+        for chunk_start in range(start, stop, FEED_MATERIALIZE_CHUNK):
+            for item in columns.materialize(order[chunk_start : min(stop, chunk_start + FEED_MATERIALIZE_CHUNK)]):
+                user_rate = user_ratings_map.get(item["mediaId"])
+                if user_rate is not None:
+                    item["userRate"] = float(user_rate)
+                    item["liked"] = float(user_rate) >= self.personalized_min_user_rate
+                yield item
+
+    def _feed_columns(self) -> MediaColumns:
+        """Catalog columns in feed order, rebuilt when the catalog or ratings version changes."""
+        version = data_versions.get_version_token(data_versions.CATALOG, data_versions.RATINGS)
+        cached = self._feed_snapshot
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        columns = self.provider.get_media_columns()
+        columns.feed_order()
+        self._feed_snapshot = (version, columns)
+        return columns
+
     def get_similar_items(
         self,
         *,
@@ -180,43 +490,158 @@ class RecommendationService:
     ) -> list[dict]:
         if not based_on_items:
             return []
+        catalog = _CatalogSnapshot(self.provider.get_media(), self.provider.get_all_places)
+        return self._similar_items(
+            catalog,
+            based_on_items=based_on_items,
+            excluded_media_ids=excluded_media_ids,
+            limit=limit,
+        )
 
-        all_items = [dict(item) for item in self.provider.get_media()]
-        place_by_id = {place["placeId"]: place for place in self.provider.get_all_places()}
+    def _similar_items(
+        self,
+        catalog: "_CatalogSnapshot",
+        *,
+        based_on_items: list[dict],
+        excluded_media_ids: set[str],
+        limit: int,
+        neighbors: dict[str, list[tuple[str, float]]] | None = None,
+    ) -> list[dict]:
+        if not based_on_items:
+            return []
+        if neighbors is None:
+            neighbors = self._load_neighbors({item["mediaId"] for item in based_on_items})
+
+        output = self._get_neighbor_items(
+            catalog,
+            based_on_items=based_on_items,
+            neighbors=neighbors,
+            excluded_media_ids=excluded_media_ids,
+            limit=limit,
+        )
+        if len(output) >= limit:
+            return output
+
+        excluded = set(excluded_media_ids) | {item["mediaId"] for item in output}
+        output.extend(
+            self._get_heuristic_similar_items(
+                catalog,
+                based_on_items=based_on_items,
+                excluded_media_ids=excluded,
+                limit=limit - len(output),
+            )
+        )
+        return output
+
+    def _load_neighbors(self, media_ids: set[str]) -> dict[str, list[tuple[str, float]]]:
+        neighbors: dict[str, list[tuple[str, float]]] = defaultdict(list)
+        if not media_ids:
+            return neighbors
+        rows = Team5MediaNeighbor.objects.filter(media_id__in=list(media_ids)).values_list(
+            "media_id", "neighbor_media_id", "score"
+        )
+        for media_id, neighbor_id, score in rows:
+            neighbors[media_id].append((neighbor_id, score))
+        return neighbors
+
+    def _get_neighbor_items(
+        self,
+        catalog: "_CatalogSnapshot",
+        *,
+        based_on_items: list[dict],
+        neighbors: dict[str, list[tuple[str, float]]],
+        excluded_media_ids: set[str],
+        limit: int,
+    ) -> list[dict]:
+        """Merge precomputed item-item neighbour lists of the seed items."""
+        seeds = [(item["mediaId"], item.get("userRate")) for item in based_on_items]
+        output = []
+        for media_id, _ in self._rank_neighbors(
+            catalog, seeds=seeds, neighbors=neighbors, excluded_media_ids=excluded_media_ids, limit=limit
+        ):
+            item = dict(catalog.media_by_id[media_id])
+            item["matchReason"] = "similar_ratings"
+            output.append(item)
+        return output
+
+    def _rank_neighbors(
+        self,
+        catalog: "_CatalogSnapshot",
+        *,
+        seeds: list[tuple[str, float | None]],
+        neighbors: dict[str, list[tuple[str, float]]],
+        excluded_media_ids: set[str],
+        limit: int,
+    ) -> list[tuple[str, float]]:
+        scores: dict[str, float] = defaultdict(float)
+        for seed_id, user_rate in seeds:
+            weight = float(user_rate or self.personalized_min_user_rate)
+            for neighbor_id, score in neighbors.get(seed_id, ()):
+                if neighbor_id in excluded_media_ids or neighbor_id not in catalog.media_by_id:
+                    continue
+                scores[neighbor_id] += score * weight
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+
+    def _get_heuristic_similar_items(
+        self,
+        catalog: "_CatalogSnapshot",
+        *,
+        based_on_items: list[dict],
+        excluded_media_ids: set[str],
+        limit: int,
+    ) -> list[dict]:
+        """Keyword and same-city similarity used when neighbour lists are missing."""
+        output = []
+        for media_id, _, reason in self._rank_heuristic(
+            catalog,
+            seed_ids={item["mediaId"] for item in based_on_items},
+            excluded_media_ids=excluded_media_ids,
+            limit=limit,
+        ):
+            item = dict(catalog.media_by_id[media_id])
+            item["matchReason"] = reason
+            output.append(item)
+        return output
+
+    def _rank_heuristic(
+        self,
+        catalog: "_CatalogSnapshot",
+        *,
+        seed_ids: set[str],
+        excluded_media_ids: set[str],
+        limit: int,
+        deadline: Deadline | None = None,
+    ) -> list[tuple[str, float, str]]:
+        """Score the catalog against the seeds' keywords and cities; stops early once `deadline` passes."""
+        keywords = catalog.keywords
+        city_by_media = catalog.city_by_media
         scores: dict[str, float] = defaultdict(float)
         reasons: dict[str, str] = {}
 
         seed_keywords = set()
         seed_city_ids = set()
-        for item in based_on_items:
-            seed_keywords |= _extract_keywords(item["title"] + " " + item.get("caption", ""))
-            place = place_by_id.get(item["placeId"])
-            if place:
-                seed_city_ids.add(place["cityId"])
-
-        for candidate in all_items:
+        for media_id in seed_ids:
+            seed_keywords |= keywords.get(media_id, set())
+            city_id = city_by_media.get(media_id)
+            if city_id:
+                seed_city_ids.add(city_id)
+
+        for position, candidate in enumerate(catalog.media):
+            if deadline is not None and position % DEADLINE_CHECK_EVERY == 0 and deadline.expired():
+                break
             media_id = candidate["mediaId"]
             if media_id in excluded_media_ids:
                 continue
-            place = place_by_id.get(candidate["placeId"])
-            candidate_keywords = _extract_keywords(candidate["title"] + " " + candidate.get("caption", ""))
-            overlap = seed_keywords.intersection(candidate_keywords)
-            if overlap:
+            if seed_keywords.intersection(keywords[media_id]):
                 scores[media_id] += 2.5
                 reasons[media_id] = "similar_topic"
-            if place and place["cityId"] in seed_city_ids:
-                scores[media_id] += 1.5
+            if city_by_media.get(media_id) in seed_city_ids:
+                scores[media_id] += SAME_CITY_SCORE
                 reasons[media_id] = reasons.get(media_id, "same_city")
             scores[media_id] += float(candidate.get("overallRate", 0)) / 10.0
 
         ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
-        media_by_id = {item["mediaId"]: item for item in all_items}
-        output = []
-        for media_id, _ in ranked:
-            item = media_by_id[media_id]
-            item["matchReason"] = reasons.get(media_id, "similar")
-            output.append(item)
-        return output
+        return [(media_id, score, reasons.get(media_id, "similar")) for media_id, score in ranked]
 
     def _get_db_ratings_by_media(self, user_id: str) -> dict[str, float]:
         user_uuid = _parse_uuid(user_id)
@@ -224,9 +649,74 @@ class RecommendationService:
             return {}
         return {
             item.media_id: float(item.rate)
-            for item in Team5MediaRating.objects.filter(user_id=user_uuid)
+            for item in rating_shards.user_ratings(user_uuid)
         }
 
+    def _get_db_ratings_by_user(self, user_uuids: set[UUID]) -> dict[UUID, dict[str, float]]:
+        ratings_by_user: dict[UUID, dict[str, float]] = defaultdict(dict)
+        for alias, shard_users in rating_shards.group_by_alias(sorted(user_uuids)).items():
+            for start in range(0, len(shard_users), RATINGS_QUERY_CHUNK):
+                rows = Team5MediaRating.objects.using(alias).filter(
+                    user_id__in=shard_users[start : start + RATINGS_QUERY_CHUNK]
+                )
+                for user_id, media_id, rate in rows.values_list("user_id", "media_id", "rate"):
+                    ratings_by_user[user_id][media_id] = float(rate)
+        return ratings_by_user
+
+
+@dataclass
+class _PersonalizeRequest:
+    """Inputs the candidate sources share for one user; `seeds` are the liked (media id, rate) pairs, best first."""
+
+    user_id: str
+    ratings_by_media: dict[str, float]
+    catalog: "_CatalogSnapshot"
+    seeds: list[tuple[str, float]]
+    neighbors: dict[str, list[tuple[str, float]]] | None = None
+    predicted: list[tuple[str, float]] | None = None
+
+
+class _CatalogSnapshot:
+    """Catalog records shared by every user scored in one call; places and keywords load lazily."""
+
+    def __init__(self, media: list[MediaRecord], load_places):
+        self.media = media
+        self.media_by_id = {item["mediaId"]: item for item in media}
+        self._load_places = load_places
+        self._city_by_place: dict[str, str] | None = None
+        self._city_by_media: dict[str, str] | None = None
+        self._keywords: dict[str, set[str]] | None = None
+
+    def stats(self, media_id: str) -> tuple[float, int]:
+        item = self.media_by_id.get(media_id)
+        return (float(item["overallRate"]), int(item["ratingsCount"])) if item else (0.0, 0)
+
+    @property
+    def city_by_place(self) -> dict[str, str]:
+        if self._city_by_place is None:
+            self._city_by_place = {place["placeId"]: place["cityId"] for place in self._load_places()}
+        return self._city_by_place
+
+    @property
+    def city_by_media(self) -> dict[str, str]:
+        if self._city_by_media is None:
+            city_by_place = self.city_by_place
+            self._city_by_media = {
+                item["mediaId"]: city_by_place[item["placeId"]]
+                for item in self.media
+                if item["placeId"] in city_by_place
+            }
+        return self._city_by_media
+
+    @property
+    def keywords(self) -> dict[str, set[str]]:
+        if self._keywords is None:
+            self._keywords = {
+                item["mediaId"]: _extract_keywords(item["title"] + " " + item.get("caption", ""))
+                for item in self.media
+            }
+        return self._keywords
+
 
 def _parse_uuid(value: str) -> UUID | None:
     try:
@@ -235,6 +725,14 @@ def _parse_uuid(value: str) -> UUID | None:
         return None
 
 
+def _interest_payload(user_id: str, cities: list[tuple[str, int]], places: list[tuple[str, int]]) -> dict:
+    return {
+        "userId": user_id,
+        "cityInterests": [{"cityId": city_id, "count": count} for city_id, count in cities],
+        "placeInterests": [{"placeId": place_id, "count": count} for place_id, count in places],
+    }
+
+
 def _extract_keywords(text: str) -> set[str]:
     text = text.lower()
     keywords = set()
@@ -251,3 +749,18 @@ def _extract_keywords(text: str) -> set[str]:
         if any(token in text for token in tokens):
             keywords.add(canonical)
     return keywords
+
+
+def encode_media_cursor(item: dict) -> str:
+    key = [-float(item["overallRate"]), -int(item["ratingsCount"]), item["mediaId"]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_media_cursor(cursor: str) -> tuple[float, int, str]:
+    """Decode a media feed cursor, raising ValueError when it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rate, count, media_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return float(rate), int(count), str(media_id)
+    except (TypeError, ValueError, UnicodeError) as exc:
+        raise ValueError("Invalid media cursor") from exc
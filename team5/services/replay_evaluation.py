@@ -0,0 +1,277 @@
+"""Offline time-ordered replay of Team5 ratings to score recommenders for quality and speed."""
+
+import sqlite3
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator
+from uuid import UUID
+
+from django.db import connections, router, transaction
+
+from team5.models import Team5MediaNeighbor, Team5MediaRating
+
+from . import data_versions, rating_shards
+from .benchmark import percentile
+from .contracts import LIKED_MIN_RATE, RATINGS_QUERY_CHUNK, SIMILAR_TOP_N
+from .recommendation_service import RecommendationService
+from .similarity_service import ADJUSTED_COSINE, compute_item_neighbors
+
+STRATEGIES = ("popular", "personalized", "similar", "nearest")
+
+
+@dataclass(frozen=True)
+class ReplaySplit:
+    """Ratings before `cutoff` are replayed as history; later ones are the per-user holdout."""
+
+    cutoff: datetime | None
+    training_ratings: int
+    holdout_ids: list[int]
+    holdout: dict[UUID, dict[str, float]]
+
+
+def split_ratings(*, holdout_fraction: float, cutoff: datetime | None = None) -> ReplaySplit:
+    """
+    Split ratings by creation time.
+
+    With `cutoff`, every rating created at or after it is held out; otherwise
+    the newest `holdout_fraction` of ratings are, ties broken by row id.
+    """
+    rows = Team5MediaRating.objects.order_by("created_at", "id").values_list(
+        "id", "user_id", "media_id", "rate", "created_at"
+    )
+    if cutoff is None:
+        total = rows.count()
+        start = min(total, int(total * (1.0 - holdout_fraction)))
+        held = list(rows[start:]) if start < total else []
+        cutoff = held[0][4] if held else None
+    else:
+        held = list(rows.filter(created_at__gte=cutoff))
+        total = rows.count()
+
+    holdout: dict[UUID, dict[str, float]] = defaultdict(dict)
+    for _id, user_id, media_id, rate, _created_at in held:
+        holdout[user_id][media_id] = float(rate)
+    return ReplaySplit(
+        cutoff=cutoff,
+        training_ratings=total - len(held),
+        holdout_ids=[row[0] for row in held],
+        holdout=dict(holdout),
+    )
+
+
+def replay(
+    service_factory: Callable[[], RecommendationService],
+    *,
+    k: int,
+    holdout_fraction: float = 0.2,
+    cutoff: datetime | None = None,
+    strategies: tuple[str, ...] = STRATEGIES,
+    max_users: int | None = None,
+    rebuild_neighbors: bool = True,
+    on_copy: bool = False,
+) -> dict:
+    """
+    Hide the holdout, evaluate each strategy against it, then roll everything back.
+
+    Inside one transaction the held-out ratings are deleted and, unless
+    `rebuild_neighbors` is False, item neighbours are recomputed from the
+    remaining history so no strategy sees the future. Users are evaluated on
+    the holdout media they liked; media they had already rated are never
+    counted as recommendations.
+
+    That transaction holds the write lock for the whole evaluation. The caller
+    must therefore confirm with `on_copy` that the team5 alias is a copy, for
+    example one opened with `sqlite_snapshot`, and not the serving database.
+    """
+    unknown = [name for name in strategies if name not in STRATEGIES]
+    if unknown:
+        raise ValueError(f"Unknown strategies: {', '.join(unknown)}")
+
+    if rating_shards.is_sharded():
+        raise ValueError("Replay needs all ratings on one alias; run it against an unsharded copy.")
+    alias = router.db_for_write(Team5MediaRating)
+    if not on_copy:
+        raise ValueError(
+            f"Replay locks '{alias}' for writes until it finishes; run it on a snapshot or a copy of the database."
+        )
+    with transaction.atomic(using=alias):
+        split = split_ratings(holdout_fraction=holdout_fraction, cutoff=cutoff)
+        _hide_ratings(alias, split.holdout_ids)
+        if rebuild_neighbors:
+            _rebuild_neighbors()
+        service = service_factory()
+        report = {
+            "cutoff": split.cutoff.isoformat() if split.cutoff else None,
+            "k": k,
+            "trainingRatings": split.training_ratings,
+            "holdoutRatings": len(split.holdout_ids),
+            "strategies": evaluate(service, split, k=k, strategies=strategies, max_users=max_users),
+        }
+        transaction.set_rollback(True, using=alias)
+    return report
+
+
+@contextmanager
+def sqlite_snapshot(alias: str) -> Iterator[None]:
+    """Point `alias` at a temporary copy of its SQLite database until the block exits."""
+    connection = connections[alias]
+    if connection.vendor != "sqlite":
+        raise ValueError(f"Snapshots need a SQLite '{alias}' database; point it at a copy instead.")
+    original = connection.settings_dict["NAME"]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f"{alias}_replay.sqlite3"
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            connection.connection.backup(target)
+        finally:
+            target.close()
+        connection.close()
+        connection.settings_dict["NAME"] = str(path)
+        try:
+            yield
+        finally:
+            connection.close()
+            connection.settings_dict["NAME"] = original
+
+
+def evaluate(
+    service: RecommendationService,
+    split: ReplaySplit,
+    *,
+    k: int,
+    strategies: tuple[str, ...] = STRATEGIES,
+    max_users: int | None = None,
+) -> dict[str, dict]:
+    """Return precision/recall@k and per-call latency of each strategy over the holdout users."""
+    relevant = {
+        user_id: {media_id for media_id, rate in ratings.items() if rate >= LIKED_MIN_RATE}
+        for user_id, ratings in split.holdout.items()
+    }
+    users = sorted(user_id for user_id, media_ids in relevant.items() if media_ids)[:max_users]
+    history = _ratings_by_user(users)
+    city_by_media = _city_by_media(service)
+    recommenders = {
+        "popular": lambda user_id, seen: [item["mediaId"] for item in service.get_popular(limit=k + len(seen))],
+        "personalized": lambda user_id, seen: _personalized_ids(service, user_id, seen, k),
+        "similar": lambda user_id, seen: [
+            item["mediaId"]
+            for item in service.get_similar_items(
+                user_id=str(user_id),
+                based_on_items=[
+                    {"mediaId": media_id, "userRate": rate}
+                    for media_id, rate in seen.items()
+                    if rate >= service.personalized_min_user_rate
+                ],
+                excluded_media_ids=set(seen),
+                limit=k,
+            )
+        ],
+        "nearest": lambda user_id, seen: _nearest_ids(service, seen, city_by_media, k),
+    }
+
+    results = {}
+    for name in strategies:
+        recommend = recommenders[name]
+        latencies, precisions, recalls, hits = [], [], [], 0
+        started = time.perf_counter()
+        for user_id in users:
+            seen = history.get(user_id, {})
+            call_started = time.perf_counter()
+            media_ids = recommend(user_id, seen)
+            latencies.append((time.perf_counter() - call_started) * 1000.0)
+            top = [media_id for media_id in media_ids if media_id not in seen][:k]
+            found = len(relevant[user_id].intersection(top))
+            precisions.append(found / k)
+            recalls.append(found / len(relevant[user_id]))
+            hits += bool(found)
+        elapsed = time.perf_counter() - started
+        calls = len(users)
+        results[name] = {
+            "users": calls,
+            "precision_at_k": round(sum(precisions) / calls, 4) if calls else 0.0,
+            "recall_at_k": round(sum(recalls) / calls, 4) if calls else 0.0,
+            "hit_rate": round(hits / calls, 4) if calls else 0.0,
+            "mean_ms": round(sum(latencies) / calls, 3) if calls else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "throughput_per_s": round(calls / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+    return results
+
+
+def _personalized_ids(service: RecommendationService, user_id: UUID, seen: dict[str, float], k: int) -> list[str]:
+    items = service.get_personalized(str(user_id), limit=k + len(seen))
+    if not items:
+        # Same fallback the personalized endpoint serves to users without liked media.
+        items = service.get_popular(limit=k + len(seen))
+    return [item["mediaId"] for item in items]
+
+
+def _nearest_ids(
+    service: RecommendationService,
+    seen: dict[str, float],
+    city_by_media: dict[str, str],
+    k: int,
+) -> list[str]:
+    """Nearest-by-city for the city holding most of the user's liked history."""
+    cities = Counter(
+        city_by_media[media_id]
+        for media_id, rate in seen.items()
+        if rate >= service.personalized_min_user_rate and media_id in city_by_media
+    )
+    if not cities:
+        return []
+    city_id = min(cities, key=lambda city: (-cities[city], city))
+    return [item["mediaId"] for item in service.get_nearest_by_city(city_id, limit=k + len(seen))]
+
+
+def _ratings_by_user(user_ids: list[UUID]) -> dict[UUID, dict[str, float]]:
+    ratings: dict[UUID, dict[str, float]] = defaultdict(dict)
+    for start in range(0, len(user_ids), RATINGS_QUERY_CHUNK):
+        rows = Team5MediaRating.objects.filter(user_id__in=user_ids[start : start + RATINGS_QUERY_CHUNK])
+        for user_id, media_id, rate in rows.values_list("user_id", "media_id", "rate"):
+            ratings[user_id][media_id] = float(rate)
+    return ratings
+
+
+def _city_by_media(service: RecommendationService) -> dict[str, str]:
+    city_by_place = {place["placeId"]: place["cityId"] for place in service.provider.get_all_places()}
+    return {
+        item["mediaId"]: city_by_place[item["placeId"]]
+        for item in service.provider.get_media()
+        if item["placeId"] in city_by_place
+    }
+
+
+def _hide_ratings(alias: str, rating_ids: list[int]) -> None:
+    """Delete the holdout with plain SQL so per-row signals do not rebuild feeds and counters."""
+    table = Team5MediaRating._meta.db_table
+    with connections[alias].cursor() as cursor:
+        for start in range(0, len(rating_ids), RATINGS_QUERY_CHUNK):
+            chunk = rating_ids[start : start + RATINGS_QUERY_CHUNK]
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+    data_versions.bump_version(data_versions.RATINGS)
+
+
+def _rebuild_neighbors() -> None:
+    neighbors = compute_item_neighbors(
+        Team5MediaRating.objects.values_list("user_id", "media_id", "rate").iterator(chunk_size=5000),
+        top_n=SIMILAR_TOP_N,
+        method=ADJUSTED_COSINE,
+    )
+    Team5MediaNeighbor.objects.all().delete()
+    Team5MediaNeighbor.objects.bulk_create(
+        [
+            Team5MediaNeighbor(media_id=media_id, neighbor_media_id=neighbor_id, score=score, rank=rank)
+            for media_id, entries in neighbors.items()
+            for rank, (neighbor_id, score) in enumerate(entries)
+        ],
+        batch_size=5000,
+    )
+    data_versions.bump_version(data_versions.MODELS)
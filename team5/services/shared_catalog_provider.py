@@ -0,0 +1,140 @@
+"""Provider that serves the Team5 catalog from a memory-mapped file shared across workers."""
+
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from . import data_versions
+from .catalog_file import CatalogFile, write_catalog_file
+from .contracts import CityRecord, MediaRecord, PlaceRecord
+from .data_provider import DataProvider
+from .media_columns import MediaColumns
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Rating writes only change per-media stats, which each worker refreshes on its own; see `_rating_stats`.
+TRACKED_VERSIONS = (data_versions.CATALOG,)
+
+
+def default_catalog_path() -> Path:
+    return Path(
+        getattr(settings, "TEAM5_CATALOG_PATH", Path(__file__).resolve().parent.parent / "catalog" / "catalog.bin")
+    )
+
+
+class SharedCatalogProvider(DataProvider):
+    """
+    Read the catalog from one columnar file that every worker maps zero-copy.
+
+    Each call compares the file's recorded catalog version with the database.
+    On a mismatch the first worker to take the file lock rebuilds it from
+    `source` and bumps its generation; the others remap the new file when they
+    notice it on disk. Older mappings stay valid until their last reader drops
+    them. Rating stats change with every rating write, so they are not served
+    from the file: each worker reloads them from `source` when the ratings
+    version changes.
+    """
+
+    def __init__(self, source: DataProvider, path: Path | None = None):
+        self.source = source
+        self.path = path or default_catalog_path()
+        self._lock = threading.Lock()
+        self._stamp: tuple[int, int, int] | None = None
+        self._file: CatalogFile | None = None
+        self._stats: tuple[tuple[int, str], tuple[np.ndarray, np.ndarray]] | None = None
+
+    def get_cities(self) -> list[CityRecord]:
+        return self.current().cities()
+
+    def get_city_places(self, city_id: str) -> list[PlaceRecord]:
+        return self.current().places(city_id)
+
+    def get_all_places(self) -> list[PlaceRecord]:
+        return self.current().places()
+
+    def get_media(self) -> list[MediaRecord]:
+        catalog = self.current()
+        return catalog.media_records(range(catalog.counts["media"]), stats=self._rating_stats(catalog))
+
+    def get_media_columns(self) -> MediaColumns:
+        catalog = self.current()
+        return catalog.media_columns(stats=self._rating_stats(catalog))
+
+    def get_media_by_ids(self, media_ids: list[str]) -> list[MediaRecord]:
+        columns = self.get_media_columns()
+        return columns.materialize(columns.rows_for(dict.fromkeys(media_ids)))
+
+    def current(self) -> CatalogFile:
+        versions = data_versions.get_versions(*TRACKED_VERSIONS)
+        catalog = self._file
+        if catalog is not None and catalog.versions == versions:
+            return catalog
+        with self._lock:
+            catalog = self._remap()
+            if catalog is None or catalog.versions != versions:
+                with _file_lock(self.path.with_name(f"{self.path.name}.lock")):
+                    catalog = self._remap()
+                    if catalog is None or catalog.versions != versions:
+                        self.rebuild(versions)
+                        catalog = self._remap()
+            return catalog
+
+    def rebuild(self, versions: dict[str, int] | None = None) -> int:
+        """Write a new catalog generation from the source provider and return its number."""
+        # Versions are read before the data, so a concurrent write can only make the file look older than it is.
+        versions = versions or data_versions.get_versions(*TRACKED_VERSIONS)
+        return write_catalog_file(
+            self.path,
+            cities=self.source.get_cities(),
+            places=self.source.get_all_places(),
+            media=self.source.get_media(),
+            versions=versions,
+        )
+
+    def _rating_stats(self, catalog: CatalogFile) -> tuple[np.ndarray, np.ndarray]:
+        """Live (overall rate, ratings count) aligned to the file's media rows."""
+        key = (catalog.generation, data_versions.get_version_token(data_versions.RATINGS))
+        cached = self._stats
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        live = self.source.get_media_columns()
+        live_rows = {media_id: row for row, media_id in enumerate(live.media_ids)}
+        index = np.array([live_rows.get(media_id, -1) for media_id in catalog.media_ids()], dtype=np.int64)
+        found = index >= 0
+        rates = np.zeros(len(index), dtype=np.float64)
+        counts = np.zeros(len(index), dtype=np.int64)
+        rates[found] = live.overall_rate[index[found]]
+        counts[found] = live.ratings_count[index[found]]
+        self._stats = (key, (rates, counts))
+        return rates, counts
+
+    def _remap(self) -> CatalogFile | None:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            self._file = CatalogFile(self.path)
+            self._stamp = stamp
+        return self._file
+
+
+@contextmanager
+def _file_lock(path: Path):
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
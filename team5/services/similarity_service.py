@@ -0,0 +1,96 @@
+"""Offline item-item similarity over the Team5 user x media rating matrix."""
+
+from typing import Iterable
+
+import numpy as np
+
+from .contracts import SIMILAR_TOP_N
+
+COSINE = "cosine"
+ADJUSTED_COSINE = "adjusted_cosine"
+
+
+def compute_item_neighbors(
+    ratings: Iterable[tuple[object, str, float]],
+    *,
+    top_n: int = SIMILAR_TOP_N,
+    method: str = ADJUSTED_COSINE,
+    min_score: float = 0.0,
+) -> dict[str, list[tuple[str, float]]]:
+    """
+    Return the top-N most similar media for every rated media.
+
+    `ratings` yields (user_id, media_id, rate) triples. The matrix is kept sparse as
+    numpy arrays in both orientations (user rows and media columns); each media column
+    is multiplied against the rows of its raters with one vectorized gather and
+    `bincount`, so memory stays proportional to the number of ratings plus one
+    accumulator row.
+    """
+    if method not in (COSINE, ADJUSTED_COSINE):
+        raise ValueError(f"Unknown similarity method: {method}")
+
+    user_index: dict[object, int] = {}
+    media_index: dict[str, int] = {}
+    media_ids: list[str] = []
+    rows: list[int] = []
+    cols: list[int] = []
+    values: list[float] = []
+    for user_id, media_id, rate in ratings:
+        if user_id not in user_index:
+            user_index[user_id] = len(user_index)
+        if media_id not in media_index:
+            media_index[media_id] = len(media_ids)
+            media_ids.append(media_id)
+        rows.append(user_index[user_id])
+        cols.append(media_index[media_id])
+        values.append(float(rate))
+    if not values:
+        return {}
+
+    user_count, media_count = len(user_index), len(media_ids)
+    row_array = np.asarray(rows, dtype=np.int64)
+    col_array = np.asarray(cols, dtype=np.int64)
+    value_array = np.asarray(values, dtype=np.float64)
+    if method == ADJUSTED_COSINE:
+        sums = np.bincount(row_array, weights=value_array, minlength=user_count)
+        counts = np.bincount(row_array, minlength=user_count)
+        value_array = value_array - (sums / counts)[row_array]
+        keep = value_array != 0.0
+        row_array, col_array, value_array = row_array[keep], col_array[keep], value_array[keep]
+
+    norms = np.sqrt(np.bincount(col_array, weights=value_array * value_array, minlength=media_count))
+    user_bounds, user_cols, user_values = _compress(row_array, col_array, value_array, user_count)
+    media_bounds, media_users, media_values = _compress(col_array, row_array, value_array, media_count)
+
+    neighbors: dict[str, list[tuple[str, float]]] = {}
+    for index in np.flatnonzero(norms):
+        raters = media_users[media_bounds[index] : media_bounds[index + 1]]
+        starts = user_bounds[raters]
+        lengths = user_bounds[raters + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        gathered = np.arange(lengths.sum()) - np.repeat(offsets - starts, lengths)
+        weights = np.repeat(media_values[media_bounds[index] : media_bounds[index + 1]], lengths)
+        dots = np.bincount(user_cols[gathered], weights=weights * user_values[gathered], minlength=media_count)
+
+        scores = np.zeros(media_count)
+        np.divide(dots, norms[index] * norms, out=scores, where=norms > 0)
+        # Only media sharing a rater with a nonzero score qualify, even when min_score is negative.
+        eligible = (scores != 0.0) & (scores > min_score)
+        eligible[index] = False
+        candidates = np.flatnonzero(eligible)
+        if len(candidates) > top_n:
+            candidates = candidates[np.argpartition(-scores[candidates], top_n - 1)[:top_n]]
+        # Best score first, ties broken by the later media as a heap of (score, index) would.
+        candidates = candidates[np.lexsort((-candidates, -scores[candidates]))]
+        if len(candidates):
+            neighbors[media_ids[index]] = [
+                (media_ids[other], round(float(scores[other]), 6)) for other in candidates
+            ]
+    return neighbors
+
+
+def _compress(keys: np.ndarray, others: np.ndarray, values: np.ndarray, size: int):
+    """Group (others, values) by key: returns row bounds plus the regrouped arrays."""
+    order = np.argsort(keys, kind="stable")
+    bounds = np.searchsorted(keys[order], np.arange(size + 1))
+    return bounds, others[order], values[order]
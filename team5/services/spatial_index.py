@@ -0,0 +1,113 @@
+"""k-nearest lookups over city/place coordinates."""
+
+from __future__ import annotations
+
+import heapq
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+LEAF_SIZE = 32
+
+
+class SpatialIndex:
+    """
+    Static k-d tree over coordinates projected onto the unit sphere.
+
+    Chord length between unit vectors grows monotonically with great-circle
+    distance, so the tree searches in 3D Euclidean space and the final candidates
+    are refined with a vectorized haversine.
+    """
+
+    def __init__(self, records: list[dict]):
+        usable = [record for record in records if _coordinates(record) is not None]
+        self.records = usable
+        coords = np.array([_coordinates(record) for record in usable], dtype=np.float64).reshape(-1, 2)
+        self._lat = np.radians(coords[:, 0])
+        self._lon = np.radians(coords[:, 1])
+        self._points = _unit_vectors(self._lat, self._lon)
+        self._order = np.arange(len(usable))
+        self._nodes: list[tuple] = []
+        if len(usable):
+            self._build(0, len(usable))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> list[tuple[dict, float]]:
+        """Return up to k (record, distance_km) pairs ordered by distance."""
+        if not self.records or k <= 0:
+            return []
+        lat, lon = math.radians(latitude), math.radians(longitude)
+        query = _unit_vectors(np.array([lat]), np.array([lon]))[0]
+
+        best: list[tuple[float, int]] = []  # max-heap of (-squared chord, point)
+        frontier = [(0.0, 0)]
+        while frontier:
+            bound, node_index = heapq.heappop(frontier)
+            if len(best) == k and bound >= -best[0][0]:
+                break
+            node = self._nodes[node_index]
+            if node[0] == "leaf":
+                _, start, end = node
+                points = self._order[start:end]
+                distances = ((self._points[points] - query) ** 2).sum(axis=1)
+                for point, distance in zip(points.tolist(), distances.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, point))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, point))
+                continue
+
+            _, axis, split, left, right = node
+            offset = query[axis] - split
+            near, far = (left, right) if offset <= 0 else (right, left)
+            heapq.heappush(frontier, (bound, near))
+            heapq.heappush(frontier, (max(bound, offset * offset), far))
+
+        points = np.array([point for _, point in best], dtype=np.int64)
+        distances = haversine_km(lat, lon, self._lat[points], self._lon[points])
+        ranked = np.argsort(distances, kind="stable")
+        return [(self.records[points[i]], float(distances[i])) for i in ranked]
+
+    def _build(self, start: int, end: int) -> int:
+        node_index = len(self._nodes)
+        self._nodes.append(None)
+        if end - start <= LEAF_SIZE:
+            self._nodes[node_index] = ("leaf", start, end)
+            return node_index
+
+        segment = self._order[start:end]
+        points = self._points[segment]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        middle = (end - start) // 2
+        partition = np.argpartition(points[:, axis], middle)
+        self._order[start:end] = segment[partition]
+        split = float(self._points[self._order[start + middle], axis])
+
+        left = self._build(start, start + middle)
+        right = self._build(start + middle, end)
+        self._nodes[node_index] = ("split", axis, split, left, right)
+        return node_index
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; arguments in radians, numpy arrays broadcast."""
+    a = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _unit_vectors(lat, lon):
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def _coordinates(record: dict) -> tuple[float, float] | None:
+    coords = record.get("coordinates") or []
+    if len(coords) != 2:
+        return None
+    try:
+        return float(coords[0]), float(coords[1])
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,235 @@
+"""Reproducible, skewed synthetic Team5 datasets for benchmarking."""
+
+from dataclasses import dataclass
+from typing import Callable
+from uuid import UUID
+
+import numpy as np
+from django.db import connections, router, transaction
+
+from team5.models import Team5City, Team5Media, Team5MediaRating, Team5MediaTrend, Team5Place, Team5UserInterest
+
+from . import data_versions
+from .interest_service import rebuild_user_interests
+from .contracts import LIKED_MIN_RATE
+from .rating_shards import alias_for_user, rating_aliases, scatter
+
+ID_PREFIX = "bench-"
+# Rough bounding box of Iran, so generated coordinates look like the real catalog.
+LATITUDE_RANGE = (25.0, 40.0)
+LONGITUDE_RANGE = (44.0, 63.0)
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    cities: int = 100
+    places: int = 2_000
+    media: int = 20_000
+    users: int = 5_000
+    ratings: int = 200_000
+    zipf_exponent: float = 1.1
+    seed: int = 1404
+
+
+def generate_dataset(
+    spec: DatasetSpec,
+    *,
+    chunk_size: int = 10_000,
+    progress: Callable[[str, int, int], None] | None = None,
+) -> dict[str, int]:
+    """
+    Insert a synthetic catalog and rating set described by `spec`.
+
+    Places per city, media per place, user activity and media popularity all follow
+    Zipf-like weights so a few entities dominate, as in production traffic. Rows are
+    written with chunked bulk inserts; the same seed always produces the same data.
+    Generated ids are deterministic, so clear an earlier dataset first.
+    """
+    rng = np.random.default_rng(spec.seed)
+    report = progress or (lambda stage, done, total: None)
+
+    city_lat = rng.uniform(*LATITUDE_RANGE, size=spec.cities)
+    city_lng = rng.uniform(*LONGITUDE_RANGE, size=spec.cities)
+    _insert_chunks(
+        Team5City,
+        spec.cities,
+        chunk_size,
+        lambda i: Team5City(
+            city_id=f"{ID_PREFIX}city-{i}",
+            city_name=f"Bench City {i}",
+            latitude=float(city_lat[i]),
+            longitude=float(city_lng[i]),
+        ),
+        "cities",
+        report,
+    )
+
+    place_city = rng.choice(spec.cities, size=spec.places, p=_zipf_weights(rng, spec.cities, spec.zipf_exponent))
+    place_lat = np.clip(city_lat[place_city] + rng.normal(0, 0.05, size=spec.places), -90, 90)
+    place_lng = np.clip(city_lng[place_city] + rng.normal(0, 0.05, size=spec.places), -180, 180)
+    _insert_chunks(
+        Team5Place,
+        spec.places,
+        chunk_size,
+        lambda i: Team5Place(
+            place_id=f"{ID_PREFIX}place-{i}",
+            city_id=f"{ID_PREFIX}city-{place_city[i]}",
+            place_name=f"Bench Place {i}",
+            latitude=float(place_lat[i]),
+            longitude=float(place_lng[i]),
+        ),
+        "places",
+        report,
+    )
+
+    media_place = rng.choice(spec.places, size=spec.media, p=_zipf_weights(rng, spec.places, spec.zipf_exponent))
+    _insert_chunks(
+        Team5Media,
+        spec.media,
+        chunk_size,
+        lambda i: Team5Media(
+            media_id=f"{ID_PREFIX}media-{i}",
+            place_id=f"{ID_PREFIX}place-{media_place[i]}",
+            title=f"Bench media {i}",
+            caption="",
+        ),
+        "media",
+        report,
+    )
+
+    user_ids = [UUID(int=int(value), version=4) for value in _random_128(rng, spec.users)]
+    user_weights = _zipf_weights(rng, spec.users, spec.zipf_exponent)
+    media_weights = _zipf_weights(rng, spec.media, spec.zipf_exponent)
+    media_quality = rng.normal(3.5, 0.7, size=spec.media)
+    user_bias = rng.normal(0.0, 0.5, size=spec.users)
+
+    per_user = _allocate_ratings(rng, spec.ratings, user_weights, cap=spec.media)
+    total = int(per_user.sum())
+    written = 0
+    rows: list[Team5MediaRating] = []
+    for user, count in enumerate(per_user.tolist()):
+        if not count:
+            continue
+        media = _sample_distinct(rng, media_weights, count)
+        rates = np.clip(
+            np.round((media_quality[media] + user_bias[user] + rng.normal(0, 0.6, size=count)) * 2) / 2,
+            1.0,
+            5.0,
+        )
+        rows.extend(
+            Team5MediaRating(
+                user_id=user_ids[user],
+                media_id=f"{ID_PREFIX}media-{media_index}",
+                rate=rate,
+                liked=rate >= LIKED_MIN_RATE,
+            )
+            for media_index, rate in zip(media.tolist(), rates.tolist())
+        )
+        if len(rows) >= chunk_size:
+            _insert_ratings(rows)
+            written += len(rows)
+            rows = []
+            report("ratings", written, total)
+    if rows:
+        _insert_ratings(rows)
+        written += len(rows)
+        report("ratings", written, total)
+
+    # Bulk inserts bypass the rating signals, so recount interest counters in one pass over all ratings.
+    rebuild_user_interests()
+    data_versions.bump_version(data_versions.CATALOG)
+    data_versions.bump_version(data_versions.RATINGS)
+    return {
+        "cities": spec.cities,
+        "places": spec.places,
+        "media": spec.media,
+        "users": spec.users,
+        "ratings": sum(
+            scatter(
+                lambda alias: Team5MediaRating.objects.using(alias).filter(media_id__startswith=ID_PREFIX).count()
+            )
+        ),
+    }
+
+
+def dataset_exists() -> bool:
+    """True when generated rows from an earlier run are still stored."""
+    return Team5City.objects.filter(city_id__startswith=ID_PREFIX).exists() or any(
+        scatter(lambda alias: Team5MediaRating.objects.using(alias).filter(media_id__startswith=ID_PREFIX).exists())
+    )
+
+
+def clear_dataset() -> None:
+    """Delete generated rows with plain SQL, skipping per-row signals and cascades."""
+    for alias in rating_aliases():
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {Team5MediaRating._meta.db_table} WHERE media_id LIKE %s", [f"{ID_PREFIX}%"]
+            )
+    alias = router.db_for_write(Team5MediaTrend)
+    with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+        for model, column in (
+            (Team5MediaTrend, "media_id"),
+            (Team5UserInterest, "target_id"),
+            (Team5Media, "media_id"),
+            (Team5Place, "place_id"),
+            (Team5City, "city_id"),
+        ):
+            cursor.execute(f"DELETE FROM {model._meta.db_table} WHERE {column} LIKE %s", [f"{ID_PREFIX}%"])
+        data_versions.bump_version(data_versions.CATALOG)
+        data_versions.bump_version(data_versions.RATINGS)
+
+
+def _insert_ratings(rows: list[Team5MediaRating]) -> None:
+    rows_by_alias: dict[str, list[Team5MediaRating]] = {}
+    for row in rows:
+        rows_by_alias.setdefault(alias_for_user(row.user_id), []).append(row)
+    for alias, shard_rows in rows_by_alias.items():
+        Team5MediaRating.objects.using(alias).bulk_create(shard_rows, ignore_conflicts=True)
+
+
+def _insert_chunks(model, total: int, chunk_size: int, build, stage: str, report) -> None:
+    for start in range(0, total, chunk_size):
+        stop = min(total, start + chunk_size)
+        model.objects.bulk_create([build(i) for i in range(start, stop)])
+        report(stage, stop, total)
+
+
+def _zipf_weights(rng: np.random.Generator, size: int, exponent: float) -> np.ndarray:
+    """Zipf weights over a random permutation, so popularity does not follow id order."""
+    weights = 1.0 / np.arange(1, size + 1, dtype=np.float64) ** exponent
+    return rng.permutation(weights / weights.sum())
+
+
+def _allocate_ratings(rng: np.random.Generator, ratings: int, weights: np.ndarray, *, cap: int) -> np.ndarray:
+    """Split ratings across users by weight; shares above `cap` are redrawn among the others."""
+    per_user = np.zeros(len(weights), dtype=np.int64)
+    remaining = ratings
+    while remaining > 0:
+        open_users = per_user < cap
+        if not open_users.any():
+            break
+        shares = np.where(open_users, weights, 0.0)
+        per_user += rng.multinomial(remaining, shares / shares.sum())
+        remaining = int(np.maximum(per_user - cap, 0).sum())
+        np.minimum(per_user, cap, out=per_user)
+    return per_user
+
+
+def _sample_distinct(rng: np.random.Generator, weights: np.ndarray, count: int) -> np.ndarray:
+    """Draw `count` distinct indices following `weights`."""
+    if count * 10 > len(weights):
+        return rng.choice(len(weights), size=count, replace=False, p=weights)
+    picked = np.empty(0, dtype=np.int64)
+    while len(picked) < count:
+        draws = rng.choice(len(weights), size=2 * (count - len(picked)), p=weights)
+        picked = np.concatenate([picked, draws])
+        _, first = np.unique(picked, return_index=True)
+        picked = picked[np.sort(first)]
+    return picked[:count]
+
+
+def _random_128(rng: np.random.Generator, size: int):
+    high = rng.integers(0, 2**64, size=size, dtype=np.uint64)
+    low = rng.integers(0, 2**64, size=size, dtype=np.uint64)
+    return ((int(h) << 64) | int(l) for h, l in zip(high, low))
@@ -0,0 +1,82 @@
+"""Exponentially decayed trending counters for Team5 media."""
+
+import math
+import time
+from collections import defaultdict
+from typing import Iterable
+
+from django.db import connections, router, transaction
+
+from team5.models import Team5MediaTrend
+
+from .contracts import RATE_MAX, TRENDING_HALF_LIFE_HOURS
+
+
+class TrendingCounter:
+    """
+    Decayed event counter stored in log space against a fixed epoch.
+
+    A score of w added at time t is kept as log(w) + λt, so older events never
+    need rewriting: ranking by the stored value equals ranking by the decayed
+    score, and the decay exp(-λ·now) is applied only when a score is read.
+    """
+
+    def __init__(self, half_life_hours: float = TRENDING_HALF_LIFE_HOURS):
+        self.decay_rate = math.log(2.0) / (half_life_hours * 3600.0)
+
+    def record(self, events: Iterable[tuple[str, float]], *, at: float | None = None) -> None:
+        """Add (media_id, weight) events in one read and one upsert."""
+        timestamp = time.time() if at is None else at
+        weights: dict[str, float] = defaultdict(float)
+        counts: dict[str, int] = defaultdict(int)
+        for media_id, weight in events:
+            if weight > 0:
+                weights[media_id] += weight
+                counts[media_id] += 1
+        if not weights:
+            return
+
+        alias = router.db_for_write(Team5MediaTrend)
+        with transaction.atomic(using=alias):
+            existing = {
+                row.media_id: row
+                for row in Team5MediaTrend.objects.select_for_update().filter(media_id__in=list(weights))
+            }
+            rows = []
+            for media_id, weight in weights.items():
+                log_score = math.log(weight) + self.decay_rate * timestamp
+                current = existing.get(media_id)
+                if current is not None:
+                    log_score = _log_add_exp(current.log_score, log_score)
+                rows.append(
+                    Team5MediaTrend(
+                        media_id=media_id,
+                        log_score=log_score,
+                        events=(current.events if current else 0) + counts[media_id],
+                    )
+                )
+            Team5MediaTrend.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["media_id"] if _supports_conflict_target(alias) else None,
+                update_fields=["log_score", "events", "updated_at"],
+            )
+
+    def top(self, limit: int, *, at: float | None = None) -> list[tuple[str, float, int]]:
+        """Return (media_id, decayed score, events) for the `limit` hottest media via the score index."""
+        now = time.time() if at is None else at
+        rows = Team5MediaTrend.objects.order_by("-log_score").values_list("media_id", "log_score", "events")[:limit]
+        return [(media_id, math.exp(log_score - self.decay_rate * now), events) for media_id, log_score, events in rows]
+
+
+def rating_weight(rate: float) -> float:
+    return max(0.0, float(rate)) / RATE_MAX
+
+
+def _log_add_exp(a: float, b: float) -> float:
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def _supports_conflict_target(alias: str) -> bool:
+    return connections[alias].features.supports_update_conflicts_with_target
@@ -0,0 +1,71 @@
+"""Keyset-paginated listing of active registered users."""
+
+import base64
+import json
+from datetime import datetime
+from typing import Iterator
+from uuid import UUID
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+USER_FIELDS = ("id", "email", "first_name", "last_name", "age", "date_joined")
+STREAM_CHUNK = 500
+
+
+def get_users_page(*, cursor: str | None = None, page_size: int) -> dict:
+    """Return one page of active users, newest first, and the cursor of the next page."""
+    rows = list(_active_users(decode_user_cursor(cursor) if cursor else None)[: page_size + 1])
+    next_cursor = encode_user_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    items = [_user_record(row) for row in rows[:page_size]]
+    return {"count": len(items), "items": items, "nextCursor": next_cursor}
+
+
+def iter_users(*, cursor: str | None = None, limit: int | None = None) -> Iterator[dict]:
+    """Yield active users in page order, one keyset query per chunk."""
+    after = decode_user_cursor(cursor) if cursor else None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = STREAM_CHUNK if remaining is None else min(STREAM_CHUNK, remaining)
+        rows = list(_active_users(after)[:size])
+        for row in rows:
+            yield _user_record(row)
+        if len(rows) < size:
+            return
+        after = (rows[-1]["date_joined"], rows[-1]["id"])
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def encode_user_cursor(row: dict) -> str:
+    key = [row["date_joined"].isoformat(), str(row["id"])]
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_user_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Decode a users cursor, raising ValueError when it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_joined, user_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(date_joined), UUID(user_id)
+    except (AttributeError, TypeError, ValueError, UnicodeError) as exc:
+        raise ValueError("Invalid users cursor") from exc
+
+
+def _active_users(after: tuple[datetime, UUID] | None):
+    users = get_user_model().objects.filter(is_active=True)
+    if after is not None:
+        date_joined, user_id = after
+        users = users.filter(Q(date_joined__lt=date_joined) | Q(date_joined=date_joined, id__lt=user_id))
+    return users.order_by("-date_joined", "-id").values(*USER_FIELDS)
+
+
+def _user_record(row: dict) -> dict:
+    return {
+        "userId": str(row["id"]),
+        "email": row["email"],
+        "firstName": row["first_name"],
+        "lastName": row["last_name"],
+        "age": row["age"],
+        "dateJoined": row["date_joined"].isoformat(),
+    }
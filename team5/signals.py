@@ -0,0 +1,44 @@
+"""Keep Team5 derived data in sync with catalog and rating writes."""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Team5City, Team5Media, Team5MediaRating, Team5Place
+from .services import data_versions
+from .services.rating_events import ratings_changed
+
+
+@receiver(pre_save, sender=Team5MediaRating)
+def _remember_previous_rate(sender, instance, **kwargs):
+    if kwargs.get("raw") or instance._state.adding:
+        instance._team5_previous_rate = None
+        return
+    instance._team5_previous_rate = (
+        Team5MediaRating.objects.using(kwargs["using"]).filter(pk=instance.pk).values_list("rate", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Team5MediaRating)
+def _rating_saved(sender, instance, **kwargs):
+    if kwargs.get("raw"):
+        return
+    previous = getattr(instance, "_team5_previous_rate", None)
+    previous_rates = {(str(instance.user_id), instance.media_id): previous} if previous is not None else None
+    ratings_changed([instance], previous_rates=previous_rates, using=kwargs["using"])
+
+
+@receiver(post_delete, sender=Team5MediaRating)
+def _rating_deleted(sender, instance, **kwargs):
+    ratings_changed([instance], deleted=True, using=kwargs["using"])
+
+
+@receiver(post_save, sender=Team5City)
+@receiver(post_save, sender=Team5Place)
+@receiver(post_save, sender=Team5Media)
+@receiver(post_delete, sender=Team5City)
+@receiver(post_delete, sender=Team5Place)
+@receiver(post_delete, sender=Team5Media)
+def _catalog_changed(sender, **kwargs):
+    if kwargs.get("raw"):
+        return
+    data_versions.bump_version(data_versions.CATALOG)
@@ -1,7 +1,52 @@
+import asyncio
+import json
+import random
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from uuid import UUID
+
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.db import connections, router
+from django.test import SimpleTestCase, TestCase, override_settings
 
-from team5.models import Team5City, Team5Media, Team5MediaRating, Team5Place
+from team5.models import (
+    Team5City,
+    Team5DataVersion,
+    Team5Media,
+    Team5MediaNeighbor,
+    Team5MediaRating,
+    Team5MediaTrend,
+    Team5Place,
+    Team5UserFeed,
+    Team5UserInterest,
+)
+from team5.services import data_versions, interest_service, rating_events
+from team5.services.benchmark import build_operations, check_budget, percentile, run_benchmarks
+from team5.services.db_provider import AsyncDatabaseProvider, DatabaseProvider
+from team5.services.embedding_store import EmbeddingStore
+from team5.services.geo_cache import KEY_IP, GeoCache
+from team5.services.ip_database import parse_csv_text
+from team5.services.location_service import _haversine_km
+from team5.services.media_columns import MediaColumns
+from team5.services.mock_provider import MockProvider, compile_mock_catalog, default_mock_data_dir
+from team5.services import rating_shards
+from team5.services.provider_scope import ScopedProvider, provider_scope
+from team5.services.ranking_pipeline import Candidate, PipelineStage, RankingPipeline, StageBudget
+from team5.services.rating_ingestion import upsert_ratings
+from team5.services.recommendation_service import RecommendationService
+from team5.services.shared_catalog_provider import SharedCatalogProvider
+from team5.services.similarity_service import COSINE, compute_item_neighbors
+from team5.services.spatial_index import SpatialIndex
+from team5.services.synthetic_data import DatasetSpec, clear_dataset, generate_dataset
+from team5.services.trending_service import TrendingCounter
 
 User = get_user_model()
 
@@ -12,6 +57,7 @@ class TeamPingTests(TestCase):
         self.assertEqual(res.status_code, 401)
 
 
+@override_settings(TEAM5_GEO_CACHE_PATH=None)
 class Team5RecommendationApiTests(TestCase):
     databases = {"default", "team5"}
 
@@ -109,6 +155,39 @@ class Team5RecommendationApiTests(TestCase):
             self.assertGreaterEqual(item["overallRate"], 4.0)
             self.assertGreaterEqual(item["ratingsCount"], 5)
 
+    def test_trending_recommendations_follow_rating_activity(self):
+        res = self.client.get("/team5/api/recommendations/trending/?limit=5")
+        self.assertEqual(res.status_code, 200)
+        payload = res.json()
+        self.assertEqual(payload["kind"], "trending")
+        self.assertEqual(payload["items"][0]["mediaId"], "m3")
+        self.assertEqual(payload["items"][0]["matchReason"], "trending")
+        self.assertGreater(payload["items"][0]["trendScore"], payload["items"][1]["trendScore"])
+        self.assertEqual(Team5MediaTrend.objects.get(media_id="m3").events, 6)
+
+    def test_catalog_endpoints_support_conditional_get(self):
+        first = self.client.get("/team5/api/cities/")
+        etag = first["ETag"]
+        self.assertEqual(self.client.get("/team5/api/cities/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Team5City.objects.create(city_id="shiraz", city_name="Shiraz", latitude=29.59, longitude=52.58)
+        refreshed = self.client.get("/team5/api/cities/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertNotEqual(refreshed["ETag"], etag)
+        self.assertIn("shiraz", [city["cityId"] for city in refreshed.json()])
+
+    def test_version_stable_bodies_are_served_from_cache(self):
+        first = self.client.get("/team5/api/recommendations/popular/?limit=5")
+        with self.assertNumQueries(1, using="team5"):
+            second = self.client.get("/team5/api/recommendations/popular/?limit=5")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+        Team5MediaRating.objects.filter(user_id=self.user_main.id, media_id="m3").update(rate=1.0)
+        data_versions.bump_version(data_versions.RATINGS)
+        third = self.client.get("/team5/api/recommendations/popular/?limit=5")
+        self.assertNotEqual(third["ETag"], first["ETag"])
+
     def test_nearest_recommendations_with_city_override(self):
         res = self.client.get("/team5/api/recommendations/nearest/?cityId=tehran&limit=10")
         self.assertEqual(res.status_code, 200)
@@ -120,6 +199,24 @@ class Team5RecommendationApiTests(TestCase):
         self.assertGreaterEqual(payload["count"], 1)
         self.assertTrue(all(item["matchReason"] == "your_nearest" for item in payload["items"]))
 
+    async def test_async_provider_matches_sync_provider(self):
+        async_provider = AsyncDatabaseProvider()
+        sync_provider = DatabaseProvider()
+        cities, places, city_places, media = await asyncio.gather(
+            async_provider.get_cities(),
+            async_provider.get_all_places(),
+            async_provider.get_city_places("tehran"),
+            async_provider.get_media(),
+        )
+        self.assertEqual(cities, await sync_to_async(sync_provider.get_cities)())
+        self.assertEqual(places, await sync_to_async(sync_provider.get_all_places)())
+        self.assertEqual(city_places, await sync_to_async(sync_provider.get_city_places)("tehran"))
+        self.assertEqual(media, await sync_to_async(sync_provider.get_media)())
+
+    def test_nearest_recommendations_reject_non_get(self):
+        res = self.client.post("/team5/api/recommendations/nearest/?cityId=tehran")
+        self.assertEqual(res.status_code, 405)
+
     def test_nearest_recommendations_requires_resolvable_location(self):
         res = self.client.get("/team5/api/recommendations/nearest/")
         self.assertEqual(res.status_code, 400)
@@ -127,6 +224,47 @@ class Team5RecommendationApiTests(TestCase):
         self.assertEqual(payload["kind"], "nearest")
         self.assertEqual(payload["source"], "unresolved")
 
+    def test_nearest_recommendations_from_offline_ip_database(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "source.csv"
+            source.write_text(
+                "network,city,country,latitude,longitude\n5.160.0.0/16,Tehran,Iran,35.69,51.39\n",
+                encoding="utf-8",
+            )
+            target = Path(tmp) / "ip_ranges.csv"
+            with override_settings(
+                TEAM5_IP_DATABASE_PATH=target,
+                TEAM5_GEOIP_HTTP_FALLBACK=False,
+                TEAM5_GEO_CACHE_PATH=Path(tmp) / "geo_cache.sqlite3",
+            ):
+                call_command("refresh_team5_ip_database", str(source), stdout=StringIO())
+                res = self.client.get("/team5/api/recommendations/nearest/?ip=5.160.10.20")
+                self.assertEqual(res.status_code, 200)
+                payload = res.json()
+                self.assertEqual(payload["source"], "ip_city_name")
+                self.assertEqual(payload["cityId"], "tehran")
+
+                source.write_text(
+                    "network,city,country,latitude,longitude\n5.160.0.0/16,Karaj,Iran,35.84,50.97\n",
+                    encoding="utf-8",
+                )
+                call_command("refresh_team5_ip_database", str(source), stdout=StringIO())
+                res = self.client.get("/team5/api/recommendations/nearest/?ip=5.160.10.20")
+                self.assertEqual(res.json()["source"], "ip_coordinates")
+
+    def test_nearest_places_by_coordinates(self):
+        res = self.client.get("/team5/api/recommendations/nearest/?lat=35.745&lng=51.376&k=1")
+        self.assertEqual(res.status_code, 200)
+        payload = res.json()
+        self.assertEqual(payload["source"], "coordinates")
+        self.assertEqual([place["placeId"] for place in payload["places"]], ["tehran-milad-tower"])
+        self.assertEqual([item["mediaId"] for item in payload["items"]], ["m9"])
+        self.assertLess(payload["places"][0]["distanceKm"], 1.0)
+
+    def test_nearest_places_rejects_bad_coordinates(self):
+        res = self.client.get("/team5/api/recommendations/nearest/?lat=135&lng=51")
+        self.assertEqual(res.status_code, 400)
+
     def test_personalized_recommendations_rank_for_user(self):
         res = self.client.get(f"/team5/api/recommendations/personalized/?userId={self.user_main.id}&limit=10")
         self.assertEqual(res.status_code, 200)
@@ -157,13 +295,72 @@ class Team5RecommendationApiTests(TestCase):
         self.assertIn("placeInterests", payload)
         self.assertGreaterEqual(len(payload["cityInterests"]), 1)
 
+    def test_user_interest_counters_follow_threshold_crossings(self):
+        url = f"/team5/api/users/{self.user_main.id}/interests/"
+        self.assertEqual(self.client.get(url).json()["cityInterests"], [{"cityId": "tehran", "count": 1}])
+
+        rating = Team5MediaRating.objects.get(user_id=self.user_main.id, media_id="m9")
+        rating.rate = 4.5
+        rating.save()
+        payload = self.client.get(url).json()
+        self.assertEqual(payload["cityInterests"], [{"cityId": "tehran", "count": 2}])
+        self.assertEqual(len(payload["placeInterests"]), 2)
+        self.assertEqual(len(self.client.get(f"{url}?top=1").json()["placeInterests"]), 1)
+
+        rating.rate = 4.0
+        rating.save()
+        self.assertEqual(self.client.get(url).json()["cityInterests"][0]["count"], 2)
+
+        upsert_ratings([{"userId": str(self.user_main.id), "mediaId": "m3", "rate": 1.0}], refresh_feeds=False)
+        rating.delete()
+        self.assertEqual(self.client.get(url).json()["cityInterests"], [])
+        self.assertFalse(Team5UserInterest.objects.filter(user_id=self.user_main.id).exists())
+
+        call_command("rebuild_team5_interests", stdout=StringIO())
+        self.assertEqual(Team5UserInterest.objects.filter(user_id=self.user_second.id, kind="city").get().count, 1)
+
+    def test_interest_migration_backfills_existing_ratings(self):
+        migration = import_module("team5.migrations.0008_backfill_user_interests")
+        for module, name in ((migration, "USER_CHUNK"), (interest_service, "RATINGS_QUERY_CHUNK")):
+            self.addCleanup(setattr, module, name, getattr(module, name))
+            setattr(module, name, 2)
+        Team5UserInterest.objects.all().delete()
+        migration.backfill_user_interests(django_apps, SimpleNamespace(connection=connections["team5"]))
+        payload = self.client.get(f"/team5/api/users/{self.user_main.id}/interests/").json()
+        self.assertEqual(payload["cityInterests"], [{"cityId": "tehran", "count": 1}])
+        self.assertEqual(Team5UserInterest.objects.filter(kind="city").count(), 6)
+
+        rows = lambda: sorted(Team5UserInterest.objects.values_list("user_id", "kind", "target_id", "count"))
+        backfilled = rows()
+        self.assertEqual(interest_service.rebuild_user_interests(), len(backfilled))
+        self.assertEqual(rows(), backfilled)
+
     def test_list_registered_users(self):
+        User.objects.bulk_create([User(email=f"listed{i}@test.com") for i in range(25)])
         res = self.client.get("/team5/api/users/")
         self.assertEqual(res.status_code, 200)
         payload = res.json()
-        self.assertIn("count", payload)
-        self.assertIn("items", payload)
-        self.assertGreaterEqual(payload["count"], 2)
+        self.assertEqual(payload["count"], 20)
+        self.assertEqual(len(payload["items"]), payload["count"])
+        self.assertTrue(payload["nextCursor"])
+
+    def test_registered_users_keyset_pages_cover_every_user_once(self):
+        seen = []
+        cursor = ""
+        while True:
+            payload = self.client.get(f"/team5/api/users/?pageSize=4&cursor={cursor}").json()
+            self.assertLessEqual(payload["count"], 4)
+            seen.extend(item["userId"] for item in payload["items"])
+            cursor = payload["nextCursor"]
+            if not cursor:
+                break
+        expected = [str(user_id) for user_id in User.objects.order_by("-date_joined", "-id").values_list("id", flat=True)]
+        self.assertEqual(seen, expected)
+
+        res = self.client.get("/team5/api/users/?format=ndjson")
+        streamed = [json.loads(line)["userId"] for line in b"".join(res.streaming_content).splitlines()]
+        self.assertEqual(streamed, expected)
+        self.assertEqual(self.client.get("/team5/api/users/?cursor=bogus").status_code, 400)
 
     def test_user_ratings_endpoint_from_db(self):
         res = self.client.get(f"/team5/api/users/{self.user_main.id}/ratings/")
@@ -173,6 +370,17 @@ class Team5RecommendationApiTests(TestCase):
         self.assertEqual(payload["count"], 2)
         self.assertEqual(payload["items"][0]["mediaId"], "m3")
 
+    def test_user_ratings_fetch_only_referenced_media(self):
+        provider = DatabaseProvider()
+        media_by_id = {item["mediaId"]: item for item in provider.get_media()}
+        with self.assertNumQueries(1, using="team5"):
+            fetched = provider.get_media_by_ids(["m9", "missing", "m3", "m9"])
+        self.assertEqual(fetched, [media_by_id["m9"], media_by_id["m3"]])
+
+        with self.assertNumQueries(2, using="team5"):
+            payload = self.client.get(f"/team5/api/users/{self.user_main.id}/ratings/").json()
+        self.assertEqual(payload["items"][0]["media"], media_by_id["m3"])
+
     def test_media_split_high_low(self):
         res = self.client.get(f"/team5/api/media/?userId={self.user_main.id}")
         self.assertEqual(res.status_code, 200)
@@ -180,9 +388,693 @@ class Team5RecommendationApiTests(TestCase):
         self.assertTrue(any(item["mediaId"] == "m3" for item in payload["ratedHigh"]))
         self.assertTrue(any(item["mediaId"] == "m9" for item in payload["ratedLow"]))
 
+    def test_media_feed_builds_from_columns(self):
+        service = RecommendationService(ScopedProvider(DatabaseProvider()))
+        with provider_scope() as scope:
+            feed = service.get_media_feed(user_id=str(self.user_main.id))
+        self.assertEqual(scope.calls["get_media"], 0)
+        self.assertEqual([item["mediaId"] for item in feed["items"]], ["m3", "m9"])
+        self.assertEqual([item["mediaId"] for item in feed["ratedHigh"]], ["m3"])
+        self.assertEqual([item["mediaId"] for item in feed["ratedLow"]], ["m9"])
+
+    def test_media_cursor_pagination(self):
+        first = self.client.get(f"/team5/api/media/?pageSize=1&userId={self.user_main.id}").json()
+        self.assertEqual([item["mediaId"] for item in first["items"]], ["m3"])
+        self.assertTrue(first["items"][0]["liked"])
+        self.assertIsNotNone(first["nextCursor"])
+
+        second = self.client.get(f"/team5/api/media/?pageSize=1&cursor={first['nextCursor']}").json()
+        self.assertEqual([item["mediaId"] for item in second["items"]], ["m9"])
+        self.assertIsNone(second["nextCursor"])
+
+    def test_media_pages_reuse_sorted_catalog_until_version_changes(self):
+        service = RecommendationService(ScopedProvider(DatabaseProvider()))
+        with provider_scope() as scope:
+            first = service.get_media_page(page_size=1)
+        self.assertEqual(scope.calls["get_media_columns"], 1)
+        with provider_scope() as scope:
+            second = service.get_media_page(cursor=first["nextCursor"], page_size=1)
+        self.assertEqual(scope.calls["get_media_columns"], 0)
+        self.assertEqual([item["mediaId"] for item in second["items"]], ["m9"])
+
+        data_versions.bump_version(data_versions.RATINGS)
+        with provider_scope() as scope:
+            service.get_media_page(page_size=1)
+        self.assertEqual(scope.calls["get_media_columns"], 1)
+
+    def test_media_invalid_cursor(self):
+        res = self.client.get("/team5/api/media/?cursor=not-a-cursor")
+        self.assertEqual(res.status_code, 400)
+
+    def test_media_ndjson_stream(self):
+        res = self.client.get("/team5/api/media/?format=ndjson")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        lines = b"".join(res.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["mediaId"] for line in lines], ["m3", "m9"])
+
     def test_personalized_contains_similar_items(self):
         res = self.client.get(f"/team5/api/recommendations/personalized/?userId={self.user_main.id}&limit=6")
         self.assertEqual(res.status_code, 200)
         payload = res.json()
         self.assertTrue(any(item["mediaId"] == "m3" for item in payload["highRatedItems"]))
         self.assertTrue(any(item["mediaId"] == "m9" for item in payload["similarItems"]))
+
+    def test_personalized_uses_precomputed_neighbors(self):
+        call_command("build_team5_similarity", method=COSINE, stdout=StringIO())
+        self.assertTrue(Team5MediaNeighbor.objects.filter(media_id="m3", neighbor_media_id="m9").exists())
+
+        res = self.client.get(f"/team5/api/recommendations/personalized/?userId={self.user_main.id}&limit=6")
+        self.assertEqual(res.status_code, 200)
+        similar = {item["mediaId"]: item for item in res.json()["similarItems"]}
+        self.assertEqual(similar["m9"]["matchReason"], "similar_ratings")
+
+    def test_personalized_scores_unseen_media_with_embeddings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            call_command(
+                "train_team5_embeddings", output_dir=tmp, factors=4, iterations=3, stdout=StringIO()
+            )
+            store = EmbeddingStore(Path(tmp))
+            service = RecommendationService(DatabaseProvider(), embedding_store=store)
+            items = service.get_personalized(user_id=str(self.user_second.id), limit=5)
+            user_id = str(self.user_main.id)
+            batch = store.score_media_batch([user_id], limit=2, excluded_media_ids={user_id: {"m3"}})
+            self.assertEqual(batch[user_id], store.score_media(user_id, limit=2, excluded_media_ids={"m3"}))
+
+        self.assertEqual(items[0]["mediaId"], "m3")
+        predicted = [item for item in items if item["matchReason"] == "predicted_interest"]
+        self.assertEqual([item["mediaId"] for item in predicted], ["m9"])
+
+    def test_personalized_reads_materialized_feed(self):
+        call_command("build_team5_feeds", stdout=StringIO())
+        feed = Team5UserFeed.objects.get(user_id=self.user_main.id)
+        self.assertEqual(feed.items[0]["mediaId"], "m3")
+
+        res = self.client.get(f"/team5/api/recommendations/personalized/?userId={self.user_main.id}")
+        payload = res.json()
+        self.assertEqual(payload["feed"], "materialized")
+        self.assertEqual(payload["highRatedItems"][0]["userRate"], 5.0)
+
+    def test_rating_write_refreshes_user_feed_after_commit(self):
+        call_command("build_team5_feeds", stdout=StringIO())
+        rating = Team5MediaRating.objects.get(user_id=self.user_main.id, media_id="m9")
+        with self.captureOnCommitCallbacks(using="team5", execute=True):
+            rating.rate = 5.0
+            rating.save()
+            self.assertFalse(Team5UserFeed.objects.filter(user_id=self.user_main.id).exists())
+
+        feed = Team5UserFeed.objects.get(user_id=self.user_main.id)
+        high_rated = [entry["mediaId"] for entry in feed.items if entry["matchReason"] == "high_user_rating"]
+        self.assertEqual(sorted(high_rated), ["m3", "m9"])
+
+    def test_catalog_change_marks_feed_stale(self):
+        Team5City.objects.create(city_id="shiraz", city_name="Shiraz", latitude=29.59, longitude=52.58)
+        res = self.client.get(f"/team5/api/recommendations/personalized/?userId={self.user_main.id}")
+        self.assertEqual(res.json()["feed"], "live")
+
+        call_command("build_team5_feeds", stale_only=True, stdout=StringIO())
+        res = self.client.get(f"/team5/api/recommendations/personalized/?userId={self.user_main.id}")
+        self.assertEqual(res.json()["feed"], "materialized")
+
+    def test_deferred_bumps_apply_catalog_version_once(self):
+        before = data_versions.get_version(data_versions.CATALOG)
+        with data_versions.deferred_bumps():
+            Team5City.objects.create(city_id="shiraz", city_name="Shiraz", latitude=29.59, longitude=52.58)
+            Team5City.objects.create(city_id="isfahan", city_name="Isfahan", latitude=32.65, longitude=51.67)
+            self.assertEqual(data_versions.get_version(data_versions.CATALOG), before)
+        self.assertEqual(data_versions.get_version(data_versions.CATALOG), before + 1)
+
+    def test_bulk_ratings_requires_staff(self):
+        payload = json.dumps({"ratings": []})
+        res = self.client.post("/team5/api/ratings/bulk/", payload, content_type="application/json")
+        self.assertEqual(res.status_code, 401)
+
+        self.client.force_login(self.user_second)
+        res = self.client.post("/team5/api/ratings/bulk/", payload, content_type="application/json")
+        self.assertEqual(res.status_code, 403)
+
+    def test_bulk_ratings_upsert_once_per_batch(self):
+        staff = User.objects.create_user(email="staff@test.com", password="Pass1234!Strong", is_staff=True)
+        self.client.force_login(staff)
+        before = data_versions.get_version(data_versions.RATINGS)
+        ratings = [
+            {"userId": str(self.user_main.id), "mediaId": "m9", "rate": 4.5},
+            {"userId": str(self.user_second.id), "mediaId": "m9", "rate": 3.0, "userEmail": "second.user@test.com"},
+            {"userId": "not-a-uuid", "mediaId": "m9", "rate": 3.0},
+            {"userId": str(self.user_second.id), "mediaId": "missing", "rate": 3.0},
+        ]
+        call_command("build_team5_feeds", stdout=StringIO())
+        with self.captureOnCommitCallbacks(using="team5", execute=True):
+            res = self.client.post(
+                "/team5/api/ratings/bulk/", json.dumps({"ratings": ratings}), content_type="application/json"
+            )
+        self.assertFalse(Team5UserFeed.objects.filter(user_id=self.user_main.id).exists())
+        self.assertEqual(res.status_code, 200)
+        payload = res.json()
+        self.assertEqual(payload["upserted"], 2)
+        self.assertEqual([error["index"] for error in payload["errors"]], [2, 3])
+
+        updated = Team5MediaRating.objects.get(user_id=self.user_main.id, media_id="m9")
+        self.assertEqual(updated.rate, 4.5)
+        self.assertTrue(updated.liked)
+        self.assertEqual(Team5MediaRating.objects.filter(user_id=self.user_second.id).count(), 2)
+        self.assertEqual(Team5DataVersion.objects.get(name="ratings").version, before + 1)
+        call_command("build_team5_feeds", stale_only=True, stdout=StringIO())
+        feed = Team5UserFeed.objects.get(user_id=self.user_main.id)
+        self.assertIn("m9", [entry["mediaId"] for entry in feed.items if entry["matchReason"] == "high_user_rating"])
+
+    def test_import_ratings_command_streams_ndjson(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "ratings.ndjson"
+            path.write_text(
+                json.dumps({"userId": str(self.user_second.id), "mediaId": "m9", "rate": 2.0})
+                + "\n{broken\n",
+                encoding="utf-8",
+            )
+            out = StringIO()
+            call_command("import_team5_ratings", str(path), batch_size=1, stdout=out)
+
+        self.assertIn("Ratings upserted: 1", out.getvalue())
+        self.assertIn("Rows skipped: 1", out.getvalue())
+        self.assertFalse(Team5UserFeed.objects.filter(user_id=self.user_second.id).exists())
+
+    def test_batch_personalized_streams_one_line_per_user(self):
+        staff = User.objects.create_user(email="staff@test.com", password="Pass1234!Strong", is_staff=True)
+        self.client.force_login(staff)
+        fresh = User.objects.create_user(email="batch.new@test.com", password="Pass1234!Strong")
+        user_ids = [str(self.user_main.id), str(fresh.id), str(self.user_main.id)]
+        res = self.client.post(
+            "/team5/api/recommendations/personalized/batch/",
+            json.dumps({"userIds": user_ids, "limit": 5}),
+            content_type="application/json",
+        )
+        self.assertEqual(res.status_code, 200)
+        lines = [json.loads(line) for line in b"".join(res.streaming_content).decode("utf-8").splitlines()]
+        self.assertEqual([line["userId"] for line in lines], [str(self.user_main.id), str(fresh.id)])
+
+        single = RecommendationService(DatabaseProvider()).get_personalized(str(self.user_main.id), limit=5)
+        self.assertEqual(lines[0]["items"], single)
+        self.assertEqual(lines[1]["source"], "fallback_popular")
+
+    def test_personalized_pipeline_reports_stage_timings(self):
+        timings = []
+        service = RecommendationService(DatabaseProvider(), on_pipeline_timings=timings.append)
+        items = service.get_personalized(str(self.user_main.id), limit=5)
+
+        self.assertEqual(items[0]["matchReason"], "high_user_rating")
+        stages = [timing.stage for timing in timings[0]]
+        self.assertEqual(stages, ["liked", "predicted", "similar", "same_city", "popular", "rerank"])
+        self.assertEqual(timings[0][-1].kept, len(items))
+
+    def test_replay_command_scores_holdout_and_rolls_back(self):
+        Team5MediaRating.objects.create(
+            user_id=self.user_second.id, user_email=self.user_second.email, media_id="m9", rate=4.5
+        )
+        ratings_before = Team5MediaRating.objects.count()
+        with self.assertRaises(CommandError):
+            call_command("replay_team5_recommendations", k=1, stdout=StringIO())
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "replay.json"
+            call_command(
+                "replay_team5_recommendations",
+                k=1,
+                holdout_fraction=0.1,
+                on_copy=True,
+                output=str(output),
+                stdout=StringIO(),
+            )
+            report = json.loads(output.read_text(encoding="utf-8"))
+
+        self.assertEqual(report["holdoutRatings"], 1)
+        strategies = report["strategies"]
+        self.assertEqual(set(strategies), {"popular", "personalized", "similar", "nearest"})
+        self.assertEqual(strategies["personalized"]["users"], 1)
+        self.assertEqual(strategies["personalized"]["recall_at_k"], 1.0)
+        self.assertEqual(strategies["nearest"]["precision_at_k"], 1.0)
+        self.assertEqual(strategies["popular"]["hit_rate"], 0.0)
+        self.assertEqual(Team5MediaRating.objects.count(), ratings_before)
+
+    @override_settings(TEAM5_EXPORT_SAFETY_LAG_SECONDS=0)
+    def test_export_ratings_streams_since_watermark(self):
+        staff = User.objects.create_user(email="staff@test.com", password="Pass1234!Strong", is_staff=True)
+        self.client.force_login(staff)
+        res = self.client.get("/team5/api/export/ratings/")
+        self.assertEqual(res.status_code, 200)
+        lines = [json.loads(line) for line in b"".join(res.streaming_content).decode("utf-8").splitlines()]
+        self.assertEqual(len(lines), Team5MediaRating.objects.count())
+        watermark = res["X-Team5-Watermark"]
+        self.assertEqual(watermark, lines[-1]["updatedAt"])
+
+        rating = Team5MediaRating.objects.get(user_id=self.user_second.id, media_id="m3")
+        rating.rate = 3.0
+        rating.save()
+        res = self.client.get("/team5/api/export/ratings/", {"since": res["X-Team5-Watermark"]})
+        lines = [json.loads(line) for line in b"".join(res.streaming_content).decode("utf-8").splitlines()]
+        self.assertEqual((lines[-1]["userId"], lines[-1]["mediaId"]), (str(self.user_second.id), "m3"))
+        self.assertEqual(lines[-1]["rate"], 3.0)
+        self.assertLess(len(lines), Team5MediaRating.objects.count())
+
+        res = self.client.get("/team5/api/export/ratings/", {"since": "yesterday"})
+        self.assertEqual(res.status_code, 400)
+
+    def test_export_watermark_trails_late_commits(self):
+        staff = User.objects.create_user(email="staff@test.com", password="Pass1234!Strong", is_staff=True)
+        self.client.force_login(staff)
+        now = datetime.now(timezone.utc)
+        Team5MediaRating.objects.update(updated_at=now - timedelta(minutes=10))
+        recent = Team5MediaRating.objects.get(user_id=self.user_second.id, media_id="m3")
+        Team5MediaRating.objects.filter(pk=recent.pk).update(updated_at=now - timedelta(seconds=1))
+
+        def exported(params=None):
+            res = self.client.get("/team5/api/export/ratings/", params or {})
+            lines = [json.loads(line) for line in b"".join(res.streaming_content).decode("utf-8").splitlines()]
+            return res["X-Team5-Watermark"], {(line["userId"], line["mediaId"]) for line in lines}
+
+        watermark, keys = exported()
+        self.assertNotIn((str(self.user_second.id), "m3"), keys)
+
+        # A transaction that stamped updated_at before the export only commits after it.
+        late = Team5MediaRating.objects.exclude(pk=recent.pk).first()
+        Team5MediaRating.objects.filter(pk=late.pk).update(updated_at=now - timedelta(seconds=30))
+        with self.settings(TEAM5_EXPORT_SAFETY_LAG_SECONDS=0):  # the next run, once the lag has passed
+            _, keys = exported({"since": watermark})
+        self.assertIn((str(late.user_id), late.media_id), keys)
+        self.assertIn((str(self.user_second.id), "m3"), keys)
+
+    @override_settings(TEAM5_EXPORT_SAFETY_LAG_SECONDS=0)
+    def test_export_command_writes_ndjson_and_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            call_command("export_team5_data", tmp, stdout=StringIO())
+            manifest = json.loads((Path(tmp) / "manifest.json").read_text(encoding="utf-8"))
+            catalog = [json.loads(line) for line in (Path(tmp) / "catalog.ndjson").read_text("utf-8").splitlines()]
+            call_command(
+                "export_team5_data",
+                tmp,
+                only="ratings",
+                since_manifest=str(Path(tmp) / "manifest.json"),
+                stdout=StringIO(),
+            )
+            incremental = json.loads((Path(tmp) / "manifest.json").read_text(encoding="utf-8"))
+
+        self.assertEqual(manifest["ratings"], Team5MediaRating.objects.count())
+        self.assertEqual([record["type"] for record in catalog].count("media"), 2)
+        self.assertEqual(incremental["since"], manifest["watermark"])
+        self.assertLess(incremental["ratings"], manifest["ratings"])
+
+    @override_settings(TEAM5_PROVIDER_CALLS_HEADER=True)
+    def test_personalized_request_loads_each_provider_read_once(self):
+        res = self.client.get(f"/team5/api/recommendations/personalized/?userId={self.user_second.id}")
+        self.assertEqual(res.status_code, 200)
+        loads = dict(entry.split("=") for entry in res["X-Team5-Provider-Calls"].split(";"))
+        self.assertIn("get_media", loads)
+        self.assertTrue(all(counts.split("/")[0] == "1" for counts in loads.values()))
+
+    def test_benchmark_harness_records_metrics(self):
+        service = RecommendationService(DatabaseProvider())
+        operations = build_operations(service, [str(self.user_main.id)], "tehran")
+        results = run_benchmarks(operations, iterations=2)
+        self.assertEqual(set(results), set(operations))
+        self.assertGreater(results["get_popular"]["queries"], 0)
+        self.assertGreater(results["get_media_feed"]["peak_kib"], 0)
+
+
+class Team5BenchmarkBudgetTests(SimpleTestCase):
+    def test_percentile_nearest_rank(self):
+        self.assertEqual(percentile([5.0, 1.0, 3.0, 2.0, 4.0], 50), 3.0)
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+
+    def test_budget_violations(self):
+        results = {"tiny": {"get_popular": {"p95_ms": 12.0, "queries": 2}}}
+        budget = {"tiny": {"get_popular": {"p95_ms": 10, "queries": 2}}, "large": {"get_popular": {"p95_ms": 1}}}
+        self.assertEqual(check_budget(results, budget), ["tiny/get_popular: p95_ms 12.0 > budget 10"])
+
+
+class Team5SyntheticDataTests(TestCase):
+    databases = {"team5"}
+
+    def test_generation_is_sized_and_reproducible(self):
+        spec = DatasetSpec(cities=3, places=12, media=40, users=25, ratings=300, seed=9)
+        counts = generate_dataset(spec, chunk_size=50)
+        self.assertEqual(counts["ratings"], 300)
+        self.assertEqual(Team5Media.objects.count(), 40)
+        first = list(Team5MediaRating.objects.order_by("user_id", "media_id").values_list("user_id", "media_id", "rate"))
+
+        clear_dataset()
+        self.assertFalse(Team5City.objects.exists())
+        generate_dataset(spec, chunk_size=7)
+        second = list(Team5MediaRating.objects.order_by("user_id", "media_id").values_list("user_id", "media_id", "rate"))
+        self.assertEqual(first, second)
+
+        with self.assertRaises(CommandError):
+            call_command("generate_team5_benchmark_data", cities=1, places=1, media=1, users=1, ratings=0)
+
+
+class Team5IpDatabaseTests(SimpleTestCase):
+    def setUp(self):
+        self.database = parse_csv_text(
+            "start_ip,end_ip,city,country,latitude,longitude\n"
+            "2.176.0.0,2.191.255.255,Isfahan,Iran,32.65,51.67\n"
+            "5.160.0.0,5.160.255.255,Tehran,Iran,35.69,51.39\n"
+            "2a01:5ec0::,2a01:5ec0:ffff:ffff:ffff:ffff:ffff:ffff,Shiraz,Iran,29.59,52.58\n"
+        )
+
+    def test_ipv4_range_lookup(self):
+        self.assertEqual(self.database.lookup("5.160.200.1")["city"], "Tehran")
+        self.assertEqual(self.database.lookup("2.180.0.1")["latitude"], 32.65)
+        self.assertIsNone(self.database.lookup("5.161.0.1"))
+        self.assertIsNone(self.database.lookup("1.1.1.1"))
+
+    def test_ipv6_and_mapped_lookup(self):
+        self.assertEqual(self.database.lookup("2a01:5ec0:1::1")["city"], "Shiraz")
+        self.assertEqual(self.database.lookup("::ffff:5.160.0.9")["city"], "Tehran")
+        self.assertIsNone(self.database.lookup("2a01:5ec1::1"))
+
+
+class Team5GeoCacheTests(SimpleTestCase):
+    def test_prefix_key_shares_results_and_negative_entries_expire(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "geo.sqlite3"
+            calls = []
+
+            def resolver(ip):
+                calls.append(ip)
+                return {"city": "Tehran"} if ip.startswith("5.") else None
+
+            cache = GeoCache(path, negative_ttl=0)
+            self.assertEqual(cache.get_or_resolve("5.160.0.1", resolver), {"city": "Tehran"})
+            self.assertEqual(cache.get_or_resolve("5.160.0.99", resolver), {"city": "Tehran"})
+            self.assertIsNone(cache.get_or_resolve("8.8.8.8", resolver))
+            self.assertIsNone(cache.get_or_resolve("8.8.8.8", resolver))
+            self.assertEqual(calls, ["5.160.0.1", "8.8.8.8", "8.8.8.8"])
+
+            other_worker = GeoCache(path)
+            self.assertEqual(other_worker.get_or_resolve("5.160.0.7", resolver), {"city": "Tehran"})
+            self.assertEqual(len(calls), 3)
+
+    def test_lru_bound_and_concurrent_lookups_coalesce(self):
+        cache = GeoCache(None, max_entries=2, key_mode=KEY_IP)
+        release = threading.Event()
+        calls = []
+
+        def slow_resolver(ip):
+            calls.append(ip)
+            release.wait(1)
+            return {"city": ip}
+
+        threads = [threading.Thread(target=cache.get_or_resolve, args=("1.1.1.1", slow_resolver)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(calls, ["1.1.1.1"])
+
+        cache.get_or_resolve("2.2.2.2", slow_resolver)
+        cache.get_or_resolve("3.3.3.3", slow_resolver)
+        cache.get_or_resolve("1.1.1.1", slow_resolver)
+        self.assertEqual(calls.count("1.1.1.1"), 2)
+
+
+class Team5SpatialIndexTests(SimpleTestCase):
+    def test_knn_matches_brute_force(self):
+        rng = random.Random(7)
+        records = [
+            {"placeId": f"p{i}", "coordinates": [rng.uniform(25, 40), rng.uniform(44, 63)]} for i in range(500)
+        ]
+        index = SpatialIndex(records)
+        for _ in range(20):
+            lat, lng = rng.uniform(25, 40), rng.uniform(44, 63)
+            expected = sorted(
+                records,
+                key=lambda record: _haversine_km(lat, lng, *record["coordinates"]),
+            )[:7]
+            found = index.nearest(lat, lng, k=7)
+            self.assertEqual([record["placeId"] for record, _ in found], [r["placeId"] for r in expected])
+            self.assertAlmostEqual(found[0][1], _haversine_km(lat, lng, *expected[0]["coordinates"]), places=6)
+
+    def test_records_without_coordinates_are_skipped(self):
+        index = SpatialIndex([{"cityId": "x", "coordinates": []}, {"cityId": "y", "coordinates": [35.0, 51.0]}])
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.nearest(0.0, 0.0, k=3)[0][0]["cityId"], "y")
+
+
+class Team5SimilarityTests(SimpleTestCase):
+    def test_adjusted_cosine_ranks_co_liked_media_first(self):
+        ratings = [
+            ("u1", "a", 5.0), ("u1", "b", 5.0), ("u1", "c", 1.0),
+            ("u2", "a", 4.0), ("u2", "b", 4.5), ("u2", "c", 2.0),
+            ("u3", "a", 2.0), ("u3", "c", 4.0),
+        ]
+        neighbors = compute_item_neighbors(ratings, top_n=5)
+        self.assertEqual(neighbors["a"][0][0], "b")
+        self.assertNotIn("c", [media_id for media_id, _ in neighbors["a"]])
+
+    def test_top_n_limits_neighbor_lists(self):
+        ratings = [(f"u{i}", media_id, 5.0) for i in range(3) for media_id in "abcd"]
+        neighbors = compute_item_neighbors(ratings, top_n=2, method=COSINE)
+        self.assertTrue(all(len(entries) == 2 for entries in neighbors.values()))
+
+    def test_negative_min_score_keeps_self_and_unrelated_media_out(self):
+        ratings = [("u1", "a", 5.0), ("u1", "b", 1.0), ("u2", "a", 2.0), ("u2", "b", 4.0), ("u3", "c", 3.0)]
+        neighbors = compute_item_neighbors(ratings, min_score=-1.0, method=COSINE)
+        self.assertEqual([media_id for media_id, _ in neighbors["a"]], ["b"])
+        self.assertNotIn("c", neighbors)
+
+
+class Team5TrendingTests(TestCase):
+    databases = {"team5"}
+
+    def test_older_activity_decays_below_recent_activity(self):
+        counter = TrendingCounter(half_life_hours=1.0)
+        counter.record([("old", 1.0)] * 4, at=0.0)
+        counter.record([("new", 1.0)], at=3 * 3600.0)
+        ranked = counter.top(2, at=3 * 3600.0)
+        self.assertEqual([media_id for media_id, _, _ in ranked], ["new", "old"])
+        self.assertAlmostEqual(ranked[1][1], 0.5, places=6)
+
+        counter.record([("old", 1.0)], at=3 * 3600.0)
+        self.assertAlmostEqual(counter.top(1, at=3 * 3600.0)[0][1], 1.5, places=6)
+        self.assertEqual(Team5MediaTrend.objects.get(media_id="old").events, 5)
+
+
+class Team5SharedCatalogTests(TestCase):
+    databases = {"team5"}
+
+    def test_mapped_catalog_matches_database_and_remaps_on_change(self):
+        Team5City.objects.create(city_id="shiraz", city_name="Shiraz", latitude=29.59, longitude=52.58)
+        Team5Place.objects.create(
+            place_id="shiraz-eram", city_id="shiraz", place_name="Eram Garden", latitude=29.63, longitude=52.52
+        )
+        Team5Media.objects.create(media_id="s1", place_id="shiraz-eram", title="Eram in spring", caption="Gülistan")
+        source = DatabaseProvider()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "catalog.bin"
+            shared = SharedCatalogProvider(source, path)
+            self.assertEqual(shared.get_cities(), source.get_cities())
+            self.assertEqual(shared.get_all_places(), source.get_all_places())
+            self.assertEqual(shared.get_city_places("shiraz"), source.get_city_places("shiraz"))
+            self.assertEqual(shared.get_city_places("missing"), [])
+            self.assertEqual(shared.get_media(), source.get_media())
+            for provider in (shared, source):
+                columns = provider.get_media_columns()
+                self.assertEqual(columns.materialize(range(len(columns))), source.get_media())
+            generation = shared.current().generation
+
+            Team5Media.objects.create(media_id="s2", place_id="shiraz-eram", title="Eram at night", caption="")
+            other_worker = SharedCatalogProvider(source, path)
+            self.assertEqual([item["mediaId"] for item in other_worker.get_media()], ["s1", "s2"])
+            self.assertEqual(other_worker.current().generation, generation + 1)
+            self.assertEqual(shared.get_media(), source.get_media())
+
+            with self.captureOnCommitCallbacks(using="team5", execute=True):
+                Team5MediaRating.objects.create(
+                    user_id=UUID(int=1), user_email="", media_id="s2", rate=4.0, liked=True
+                )
+            self.assertEqual(shared.get_media()[1]["ratingsCount"], 1)
+            self.assertEqual(shared.get_media_columns().ratings_count.tolist(), [0, 1])
+            self.assertEqual(shared.current().generation, generation + 1)
+
+
+class Team5MediaColumnsTests(SimpleTestCase):
+    def setUp(self):
+        records = [
+            {"mediaId": "a", "placeId": "p1", "overallRate": 4.0, "ratingsCount": 3},
+            {"mediaId": "b", "placeId": "p2", "overallRate": 4.5, "ratingsCount": 1},
+            {"mediaId": "c", "placeId": "p1", "overallRate": 4.0, "ratingsCount": 9},
+            {"mediaId": "d", "placeId": "p3", "overallRate": 4.0, "ratingsCount": 3},
+        ]
+        self.columns = MediaColumns.from_records(records)
+
+    def test_rank_filters_and_orders_without_materializing(self):
+        ids = lambda rows: [self.columns.media_ids[row] for row in rows]
+        self.assertEqual(ids(self.columns.rank()), ["b", "c", "a", "d"])
+        self.assertEqual(ids(self.columns.rank(self.columns.in_places({"p1", "p3"}), limit=2)), ["c", "a"])
+        items = self.columns.materialize(self.columns.rows_for(["d", "x", "a"]))
+        self.assertEqual([item["mediaId"] for item in items], ["d", "a"])
+
+    def test_feed_position_matches_sorted_keys(self):
+        order = [self.columns.media_ids[row] for row in self.columns.feed_order()]
+        self.assertEqual(order, ["b", "c", "a", "d"])
+        self.assertEqual(self.columns.feed_position((-4.0, -3, "a")), 3)
+        self.assertEqual(self.columns.feed_position((-4.0, -9, "c")), 2)
+        self.assertEqual(self.columns.feed_position((-5.0, 0, "")), 0)
+
+
+class Team5MockProviderTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name)
+        for source in default_mock_data_dir().glob("*.json"):
+            (self.path / source.name).write_bytes(source.read_bytes())
+
+    def test_records_are_shared_read_only_views_reloaded_on_change(self):
+        provider = MockProvider(self.path)
+        cities = provider.get_cities()
+        self.assertIs(provider.get_cities(), cities)
+        with self.assertRaises(TypeError):
+            cities[0]["cityName"] = "changed"
+        self.assertEqual(json.loads(json.dumps(cities))[0]["cityId"], cities[0]["cityId"])
+
+        data = json.loads((self.path / "cities.json").read_text(encoding="utf-8"))
+        data.append({"cityId": "yazd", "cityName": "Yazd", "coordinates": [31.89, 54.36]})
+        (self.path / "cities.json").write_text(json.dumps(data), encoding="utf-8")
+        self.assertEqual(provider.get_cities()[-1]["cityId"], "yazd")
+
+    def test_compiled_sidecar_matches_json_until_sources_change(self):
+        expected = MockProvider(self.path)
+        compile_mock_catalog(self.path)
+        provider = MockProvider(self.path)
+        self.assertTrue(provider.is_compiled())
+        self.assertEqual(
+            [dict(place) for place in provider.get_city_places("tehran")],
+            [dict(place) for place in expected.get_city_places("tehran")],
+        )
+        self.assertEqual(json.loads(json.dumps(provider.get_media())), json.loads(json.dumps(expected.get_media())))
+        self.assertTrue(any(item["userRatings"] for item in provider.get_media()))
+        columns = provider.get_media_columns()
+        self.assertEqual(columns.media_ids, [item["mediaId"] for item in expected.get_media()])
+        self.assertEqual(columns.materialize([0])[0]["title"], expected.get_media()[0]["title"])
+
+        (self.path / "media_items.json").write_text("[]", encoding="utf-8")
+        self.assertFalse(provider.is_compiled())
+        self.assertEqual(provider.get_media(), ())
+
+
+class Team5RankingPipelineTests(SimpleTestCase):
+    def stats(self, media_id):
+        return {"a": (4.0, 10), "b": (4.5, 3), "c": (3.0, 1)}.get(media_id, (0.0, 0))
+
+    def test_rerank_orders_by_tier_and_keeps_best_reason(self):
+        pipeline = RankingPipeline(
+            [
+                PipelineStage("first", lambda context, deadline, cap: [Candidate("c", "low", 9.0)]),
+                PipelineStage(
+                    "second",
+                    lambda context, deadline, cap: [Candidate("a", "high", 1.0), Candidate("c", "high", 1.0)],
+                ),
+            ],
+            reason_tiers={"high": 0, "low": 1},
+        )
+        ranked, _ = pipeline.run(None, limit=5, stats=self.stats)
+        self.assertEqual([(c.media_id, c.reason) for c in ranked], [("a", "high"), ("c", "high")])
+
+    def test_failing_and_slow_sources_stay_within_budget(self):
+        now = [0.0]
+
+        def broken(context, deadline, cap):
+            raise RuntimeError("boom")
+
+        def slow(context, deadline, cap):
+            output = []
+            while not deadline.expired():
+                output.append(Candidate(f"x{len(output)}", "low", 0.0))
+                now[0] += 0.01
+            return output
+
+        pipeline = RankingPipeline(
+            [
+                PipelineStage("broken", broken),
+                PipelineStage("slow", slow, StageBudget(max_items=3)),
+                PipelineStage("late", lambda context, deadline, cap: [Candidate("a", "high", 1.0)]),
+            ],
+            reason_tiers={"high": 0, "low": 1},
+            total_budget_ms=50.0,
+            clock=lambda: now[0],
+        )
+        with self.assertLogs("team5.services.ranking_pipeline", level="ERROR"):
+            ranked, timings = pipeline.run(None, limit=5, stats=self.stats)
+
+        statuses = {timing.stage: timing.status for timing in timings}
+        self.assertEqual(statuses, {"broken": "failed", "slow": "over_budget", "late": "skipped", "rerank": "ok"})
+        self.assertEqual(len(ranked), 3)
+        self.assertEqual(timings[1].produced, 5)
+
+    def test_offline_feed_builds_run_without_time_budgets(self):
+        pipeline = rating_events.get_feed_service().recommendation_service.pipeline
+        self.assertIsNone(pipeline.total_budget_ms)
+        self.assertTrue(all(stage.budget.max_ms is None for stage in pipeline.stages))
+
+
+@override_settings(
+    TEAM_SHARDS={"team5.team5mediarating": {"key": "user_id", "aliases": ["team5_ratings_0", "team5_ratings_1"]}}
+)
+class Team5RatingShardTests(SimpleTestCase):
+    def test_ratings_route_to_one_stable_shard_per_user(self):
+        user_ids = [UUID(int=i) for i in range(1, 41)]
+        grouped = rating_shards.group_by_alias(user_ids)
+        self.assertEqual(set(grouped), {"team5_ratings_0", "team5_ratings_1"})
+        self.assertEqual(sum(len(users) for users in grouped.values()), len(user_ids))
+
+        shard = rating_shards.alias_for_user(user_ids[0])
+        rating = Team5MediaRating(user_id=user_ids[0], media_id="m3", rate=5.0)
+        self.assertEqual(router.db_for_write(Team5MediaRating, instance=rating), shard)
+        self.assertEqual(router.db_for_read(Team5MediaRating, instance=rating), shard)
+        self.assertEqual(rating_shards.user_ratings(user_ids[0]).db, shard)
+        self.assertEqual(router.db_for_write(Team5City), "team5")
+
+    def test_shards_migrate_only_sharded_models(self):
+        self.assertTrue(router.allow_migrate("team5_ratings_0", "team5", model_name="team5mediarating"))
+        self.assertFalse(router.allow_migrate("team5_ratings_0", "team5", model_name="team5city"))
+        self.assertFalse(router.allow_migrate("team5_ratings_0", "core", model_name="user"))
+        self.assertTrue(router.allow_migrate("team5", "team5", model_name="team5mediarating"))
+
+    def test_scatter_gathers_results_in_alias_order(self):
+        self.assertEqual(rating_shards.scatter(str.upper, ["default", "team5"]), ["DEFAULT", "TEAM5"])
+
+    def test_single_shard_counts_as_sharded(self):
+        self.assertTrue(rating_shards.is_sharded())
+        with self.settings(TEAM_SHARDS={"team5.team5mediarating": {"key": "user_id", "aliases": ["team5_ratings_0"]}}):
+            self.assertEqual(rating_shards.rating_aliases(), ["team5_ratings_0"])
+            self.assertTrue(rating_shards.is_sharded())
+        with self.settings(TEAM_SHARDS={}):
+            self.assertFalse(rating_shards.is_sharded())
+
+
+class Team5ProviderScopeTests(SimpleTestCase):
+    def test_reads_are_memoized_only_inside_a_scope(self):
+        provider = ScopedProvider(MockProvider())
+        with provider_scope() as scope:
+            first = provider.get_media()
+            self.assertIs(provider.get_media(), first)
+            provider.get_city_places("tehran")
+            provider.get_city_places("tehran")
+            provider.get_city_places("shiraz")
+            with provider_scope() as nested:
+                provider.get_media()
+            self.assertIs(nested, scope)
+
+        self.assertEqual(scope.calls["get_media"], 3)
+        self.assertEqual(scope.loads["get_media"], 1)
+        self.assertEqual(scope.loads["get_city_places"], 2)
+        self.assertEqual(scope.summary(), "get_city_places=2/3;get_media=1/3")
+        provider.get_media()
+        self.assertEqual(scope.calls["get_media"], 3)
+
+    def test_wrapper_delegates_other_attributes(self):
+        mock = MockProvider()
+        provider = ScopedProvider(mock)
+        self.assertEqual(provider.base_path, mock.base_path)
+        self.assertEqual(provider.is_compiled(), mock.is_compiled())
+        with self.assertRaises(AttributeError):
+            provider.missing_attribute
@@ -9,8 +9,13 @@ urlpatterns = [
     path("api/media/", views.get_media),
     path("api/users/", views.get_registered_users),
     path("api/users/<str:user_id>/ratings/", views.get_user_ratings),
+    path("api/ratings/bulk/", views.bulk_upsert_ratings),
+    path("api/export/ratings/", views.export_ratings),
+    path("api/export/catalog/", views.export_catalog),
     path("api/recommendations/popular/", views.get_popular_recommendations),
+    path("api/recommendations/trending/", views.get_trending_recommendations),
     path("api/recommendations/nearest/", views.get_nearest_recommendations),
     path("api/recommendations/personalized/", views.get_personalized_recommendations),
+    path("api/recommendations/personalized/batch/", views.get_personalized_recommendations_batch),
     path("api/users/<str:user_id>/interests/", views.get_user_interests),
 ]
\ No newline at end of file
@@ -1,18 +1,56 @@
-from django.http import JsonResponse
+import asyncio
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.views.decorators.http import require_GET
-from django.contrib.auth import get_user_model
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 
 from core.auth import api_login_required
-from .services.contracts import DEFAULT_LIMIT
-from .services.db_provider import DatabaseProvider
-from .services.location_service import get_client_ip, resolve_client_city
-from .services.recommendation_service import RecommendationService
+from .http_cache import versioned_response
+from .services import data_versions
+from .services.contracts import (
+    BATCH_PERSONALIZED_MAX_USERS,
+    BULK_RATINGS_MAX_ROWS,
+    DEFAULT_LIMIT,
+    NEAREST_PLACES_K,
+)
+from .services.data_provider import SyncProviderAdapter
+from .services.db_provider import AsyncDatabaseProvider, DatabaseProvider
+from .services.embedding_store import EmbeddingStore
+from .services.export_service import iter_catalog, iter_ratings, ndjson_lines, parse_watermark, ratings_watermark
+from .services.feed_service import FeedService
+from .services.location_service import get_client_ip, locate_ip, resolve_client_city
+from .services.provider_scope import ScopedAsyncProvider, ScopedProvider
+from .services.rating_ingestion import upsert_ratings
+from .services.recommendation_service import RecommendationService, decode_media_cursor
+from .services.shared_catalog_provider import SharedCatalogProvider
+from .services.user_directory import decode_user_cursor, get_users_page, iter_users
 
 TEAM_NAME = "team5"
-User = get_user_model()
-provider = DatabaseProvider()
-recommendation_service = RecommendationService(provider)
+# Reads are memoized per request by team5.middleware.provider_scope_middleware.
+provider = ScopedProvider(DatabaseProvider())
+async_provider = ScopedAsyncProvider(AsyncDatabaseProvider())
+if getattr(settings, "TEAM5_SHARED_CATALOG", False):
+    provider = ScopedProvider(SharedCatalogProvider(DatabaseProvider()))
+    async_provider = SyncProviderAdapter(provider)
+recommendation_service = RecommendationService(provider, embedding_store=EmbeddingStore())
+feed_service = FeedService(recommendation_service)
+
+
+def _require_get_async(view):
+    """`require_GET` for coroutine views; Django 4.2's decorator only wraps sync functions."""
+
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        if request.method != "GET":
+            return HttpResponseNotAllowed(["GET"])
+        return await view(request, *args, **kwargs)
+
+    return inner
 
 
 @api_login_required
@@ -25,23 +63,51 @@ def base(request):
 
 
 @require_GET
+@versioned_response(data_versions.CATALOG)
 def get_cities(request):
     return JsonResponse(provider.get_cities(), safe=False)
 
 
 @require_GET
+@versioned_response(data_versions.CATALOG)
 def get_city_places(request, city_id: str):
     return JsonResponse(provider.get_city_places(city_id), safe=False)
 
 
 @require_GET
+@versioned_response(data_versions.CATALOG, data_versions.RATINGS)
 def get_media(request):
     user_id = request.GET.get("userId")
+    cursor = request.GET.get("cursor")
+    page_size = request.GET.get("pageSize")
+    if cursor:
+        try:
+            decode_media_cursor(cursor)
+        except ValueError:
+            return JsonResponse({"detail": "cursor is invalid"}, status=400)
+
+    if request.GET.get("format") == "ndjson":
+        limit = _parse_limit(request, key="pageSize") if page_size else None
+        items = recommendation_service.iter_media_feed(user_id=user_id, cursor=cursor, limit=limit)
+        return StreamingHttpResponse(
+            (json.dumps(item, ensure_ascii=False) + "\n" for item in items),
+            content_type="application/x-ndjson",
+        )
+
+    if cursor or page_size:
+        page = recommendation_service.get_media_page(
+            user_id=user_id,
+            cursor=cursor,
+            page_size=_parse_limit(request, key="pageSize"),
+        )
+        return JsonResponse(page)
+
     feed = recommendation_service.get_media_feed(user_id=user_id)
     return JsonResponse(feed)
 
 
 @require_GET
+@versioned_response(data_versions.CATALOG, data_versions.RATINGS)
 def get_popular_recommendations(request):
     limit = _parse_limit(request)
     items = recommendation_service.get_popular(limit=limit)
@@ -56,16 +122,41 @@ def get_popular_recommendations(request):
 
 
 @require_GET
-def get_nearest_recommendations(request):
+def get_trending_recommendations(request):
     limit = _parse_limit(request)
+    items = recommendation_service.get_trending(limit=limit)
+    return JsonResponse(
+        {
+            "kind": "trending",
+            "limit": limit,
+            "count": len(items),
+            "items": items,
+        }
+    )
+
+
+@_require_get_async
+async def get_nearest_recommendations(request):
+    limit = _parse_limit(request)
+    if request.GET.get("lat") is not None or request.GET.get("lng") is not None:
+        return await sync_to_async(_nearest_by_coordinates)(request, limit)
+
     city_override = request.GET.get("cityId")
     ip_override = request.GET.get("ip")
 
     client_ip = get_client_ip(request, ip_override=ip_override)
+    # The geolocation lookup may leave the process, so it runs off the request thread alongside the catalog reads.
+    geo, cities, city_index = await asyncio.gather(
+        sync_to_async(locate_ip, thread_sensitive=False)(client_ip),
+        async_provider.get_cities(),
+        sync_to_async(recommendation_service.get_spatial_index)("cities"),
+    )
     resolved = resolve_client_city(
-        cities=provider.get_cities(),
+        cities=cities,
         client_ip=client_ip,
         preferred_city_id=city_override,
+        city_index=city_index,
+        geo=geo,
     )
     if not resolved:
         return JsonResponse(
@@ -82,7 +173,7 @@ def get_nearest_recommendations(request):
         )
 
     city = resolved["city"]
-    items = recommendation_service.get_nearest_by_city(city_id=city["cityId"], limit=limit)
+    items = await sync_to_async(recommendation_service.get_nearest_by_city)(city_id=city["cityId"], limit=limit)
     return JsonResponse(
         {
             "kind": "nearest",
@@ -98,6 +189,32 @@ def get_nearest_recommendations(request):
     )
 
 
+def _nearest_by_coordinates(request, limit: int):
+    try:
+        latitude = float(request.GET.get("lat", ""))
+        longitude = float(request.GET.get("lng", ""))
+    except ValueError:
+        return JsonResponse({"detail": "lat and lng must both be numbers"}, status=400)
+    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+        return JsonResponse({"detail": "lat/lng out of range"}, status=400)
+
+    k = _parse_limit(request, key="k", default=NEAREST_PLACES_K)
+    places, items = recommendation_service.get_nearest_by_coordinates(latitude, longitude, k=k, limit=limit)
+    return JsonResponse(
+        {
+            "kind": "nearest",
+            "title": "your nearest",
+            "source": "coordinates",
+            "coordinates": [latitude, longitude],
+            "k": k,
+            "places": places,
+            "limit": limit,
+            "count": len(items),
+            "items": items,
+        }
+    )
+
+
 @require_GET
 def get_personalized_recommendations(request):
     limit = _parse_limit(request)
@@ -107,7 +224,13 @@ def get_personalized_recommendations(request):
     if not user_id:
         return JsonResponse({"detail": "userId query param is required"}, status=400)
 
-    items = recommendation_service.get_personalized(user_id=user_id, limit=limit)
+    feed = feed_service.get_fresh_feed(user_id)
+    if feed is not None:
+        items = feed_service.materialize(feed, limit=limit)
+        feed_source = "materialized"
+    else:
+        items = recommendation_service.get_personalized(user_id=user_id, limit=limit)
+        feed_source = "live"
     similar_items = [item for item in items if item.get("matchReason") != "high_user_rating"]
     direct_items = [item for item in items if item.get("matchReason") == "high_user_rating"]
     source = "personalized"
@@ -121,6 +244,7 @@ def get_personalized_recommendations(request):
         {
             "kind": "personalized",
             "source": source,
+            "feed": feed_source,
             "userId": user_id,
             "limit": limit,
             "count": len(items),
@@ -131,27 +255,67 @@ def get_personalized_recommendations(request):
     )
 
 
+@csrf_exempt
+@require_POST
+@api_login_required
+def get_personalized_recommendations_batch(request):
+    if not request.user.is_staff:
+        return JsonResponse({"detail": "Staff access required"}, status=403)
+    try:
+        data = json.loads(request.body.decode("utf-8"))
+    except Exception:
+        return JsonResponse({"detail": "Invalid JSON"}, status=400)
+
+    user_ids = data.get("userIds") if isinstance(data, dict) else None
+    if not isinstance(user_ids, list) or not all(isinstance(user_id, str) for user_id in user_ids):
+        return JsonResponse({"detail": "userIds must be a list of strings"}, status=400)
+    if len(user_ids) > BATCH_PERSONALIZED_MAX_USERS:
+        return JsonResponse({"detail": f"at most {BATCH_PERSONALIZED_MAX_USERS} userIds per request"}, status=413)
+    try:
+        limit = max(1, min(int(data.get("limit", DEFAULT_LIMIT)), 100))
+    except (TypeError, ValueError):
+        limit = DEFAULT_LIMIT
+
+    def lines():
+        popular = None
+        for user_id, items in recommendation_service.iter_personalized_batch(list(dict.fromkeys(user_ids)), limit):
+            source = "personalized"
+            if not items:
+                if popular is None:
+                    popular = recommendation_service.get_popular(limit=limit)
+                items = popular
+                source = "fallback_popular"
+            payload = {"userId": user_id, "source": source, "count": len(items), "items": items}
+            yield json.dumps(payload, ensure_ascii=False) + "\n"
+
+    return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+
+
 @require_GET
 def get_user_interests(request, user_id: str):
-    interests = recommendation_service.get_user_interest_distribution(user_id=user_id)
+    top = _parse_limit(request, "top", default=None)
+    interests = recommendation_service.get_user_interest_distribution(user_id=user_id, top=top)
     return JsonResponse(interests)
 
 
 @require_GET
 def get_registered_users(request):
-    users = User.objects.filter(is_active=True).order_by("-date_joined")
-    payload = [
-        {
-            "userId": str(user.id),
-            "email": user.email,
-            "firstName": user.first_name,
-            "lastName": user.last_name,
-            "age": user.age,
-            "dateJoined": user.date_joined.isoformat(),
-        }
-        for user in users
-    ]
-    return JsonResponse({"count": len(payload), "items": payload})
+    cursor = request.GET.get("cursor")
+    if cursor:
+        try:
+            decode_user_cursor(cursor)
+        except ValueError:
+            return JsonResponse({"detail": "cursor is invalid"}, status=400)
+
+    if request.GET.get("format") == "ndjson":
+        limit = _parse_limit(request, key="pageSize") if request.GET.get("pageSize") else None
+        users = iter_users(cursor=cursor, limit=limit)
+        return StreamingHttpResponse(
+            (json.dumps(user, ensure_ascii=False) + "\n" for user in users),
+            content_type="application/x-ndjson",
+        )
+
+    return JsonResponse(get_users_page(cursor=cursor, page_size=_parse_limit(request, key="pageSize")))
 
 
 @require_GET
@@ -160,12 +324,59 @@ def get_user_ratings(request, user_id: str):
     return JsonResponse({"userId": user_id, "count": len(ratings), "items": ratings})
 
 
-def _parse_limit(request) -> int:
-    raw_limit = request.GET.get("limit")
+@csrf_exempt
+@require_POST
+@api_login_required
+def bulk_upsert_ratings(request):
+    if not request.user.is_staff:
+        return JsonResponse({"detail": "Staff access required"}, status=403)
+    try:
+        data = json.loads(request.body.decode("utf-8"))
+    except Exception:
+        return JsonResponse({"detail": "Invalid JSON"}, status=400)
+
+    ratings = data.get("ratings") if isinstance(data, dict) else data
+    if not isinstance(ratings, list):
+        return JsonResponse({"detail": "ratings must be a list"}, status=400)
+    if len(ratings) > BULK_RATINGS_MAX_ROWS:
+        return JsonResponse({"detail": f"at most {BULK_RATINGS_MAX_ROWS} ratings per request"}, status=413)
+
+    result = upsert_ratings(ratings)
+    return JsonResponse(result.as_dict())
+
+
+@require_GET
+@api_login_required
+def export_ratings(request):
+    if not request.user.is_staff:
+        return JsonResponse({"detail": "Staff access required"}, status=403)
+    raw_since = request.GET.get("since")
+    try:
+        since = parse_watermark(raw_since) if raw_since else None
+    except ValueError:
+        return JsonResponse({"detail": "since is invalid"}, status=400)
+
+    watermark = ratings_watermark()
+    records = iter_ratings(since=since, until=watermark) if watermark else iter(())
+    response = StreamingHttpResponse(ndjson_lines(records), content_type="application/x-ndjson")
+    response["X-Team5-Watermark"] = watermark.isoformat() if watermark else raw_since or ""
+    return response
+
+
+@require_GET
+@api_login_required
+def export_catalog(request):
+    if not request.user.is_staff:
+        return JsonResponse({"detail": "Staff access required"}, status=403)
+    return StreamingHttpResponse(ndjson_lines(iter_catalog()), content_type="application/x-ndjson")
+
+
+def _parse_limit(request, key: str = "limit", default: int = DEFAULT_LIMIT) -> int:
+    raw_limit = request.GET.get(key)
     if raw_limit is None:
-        return DEFAULT_LIMIT
+        return default
     try:
         parsed = int(raw_limit)
     except ValueError:
-        return DEFAULT_LIMIT
+        return default
     return max(1, min(parsed, 100))
\ No newline at end of file